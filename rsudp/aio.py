@@ -0,0 +1,236 @@
+import asyncio
+from rsudp import printM, printW, printE
+import rsudp.raspberryshake as RS
+from rsudp.p_producer import Producer
+from rsudp.test import TEST
+
+
+class AioProducer(Producer):
+	'''
+	.. versionadded:: 1.1.2
+
+	The :py:class:`rsudp.p_producer.Producer` as used by the asyncio runtime.
+	Its thread is never started: the runtime's :py:class:`rsudp.aio.DataProtocol`
+	receives the datagrams instead, and this object is only used for
+	its sender filtering and alarm notification logic.
+	Its "queue" is the :py:class:`rsudp.aio.Runtime`,
+	which passes anything put on it to the event loop.
+
+	:param rsudp.aio.Runtime runtime: the runtime to pass messages to
+	:param list threads: the list of modules to watch for alarm flags
+	'''
+
+	def __init__(self, runtime, threads, testing=False):
+		'''
+		Initializes the producer logic.
+		'''
+		self.runtime = runtime
+		super().__init__(runtime, threads, testing=testing)
+
+
+	def _notify(self, thread, flag, value):
+		'''
+		Sends the message for a flag (see :py:func:`rsudp.p_producer.Producer._notify`),
+		and tells the runtime to shut down if a module has stopped.
+		'''
+		super()._notify(thread, flag, value)
+		if self.stop and not self.runtime.loop.is_closed():
+			self.runtime.loop.call_soon_threadsafe(self.runtime.shutdown)
+
+
+class DataProtocol(asyncio.DatagramProtocol):
+	'''
+	.. versionadded:: 1.1.2
+
+	Receives datagrams on the event loop, taking the place of the
+	:py:class:`rsudp.p_producer.Producer` thread.
+
+	:param rsudp.aio.Runtime runtime: the runtime to pass data to
+	'''
+
+	def __init__(self, runtime):
+		self.runtime = runtime
+		self.producer = runtime.producer
+
+
+	def datagram_received(self, data, addr):
+		'''
+		Filters and parses a datagram and passes it on.
+		'''
+		p = self.producer._filter_sender(data, addr)
+		if p is not None:
+			self.runtime.dispatch(p)
+		if self.producer.stop:
+			self.runtime.shutdown()
+		elif self.producer.testing:
+			TEST['x_data'][1] = True
+
+
+	def error_received(self, exc):
+		printW('Socket error: %s' % (exc), sender='DataProtocol')
+
+
+class Runtime:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	An alternative to rsudp's thread-per-module model, enabled with the
+	:json:`"asyncio"` option in the settings file.
+
+	One event loop takes the place of the
+	:py:class:`rsudp.p_producer.Producer` and
+	:py:class:`rsudp.c_consumer.Consumer` threads: a
+	:py:class:`rsudp.aio.DataProtocol` receives and parses the data,
+	and writes it straight to the :py:class:`rsudp.ring.BroadcastRing`.
+	Lightweight modules (those with an :py:data:`aio` mode, see
+	:py:class:`rsudp.raspberryshake.ConsumerThread`) run as coroutines on the
+	same loop, so they use no thread of their own while waiting for an alarm.
+	Modules with an ``'executor'`` mode hand control messages to a worker thread,
+	since their actions (playing a sound, uploading to social media) may block.
+	Numerical modules such as :py:class:`rsudp.c_alert.Alert`
+	and :py:class:`rsudp.c_write.Write` still run in their own threads.
+
+	The runtime can be used anywhere the master queue is expected
+	(for example as :pycode:`Plot.master_queue`):
+	anything passed to :py:func:`rsudp.aio.Runtime.put`
+	from any thread is written to the ring by the event loop.
+
+	:param rsudp.ring.BroadcastRing ring: the ring that modules read from
+	:param list threads: the modules to run
+	:param bool testing: whether rsudp is running in testing mode
+	'''
+
+	def __init__(self, ring, threads, testing=False):
+		'''
+		Sets up the event loop.
+		'''
+		self.sender = 'Runtime'
+		self.ring = ring
+		self.threads = threads
+		self.testing = testing
+		self.loop = asyncio.new_event_loop()
+		self.done = False
+		if self.ring.overrun == 'block':
+			printW("The 'block' queue overrun policy can't be used with the asyncio runtime. Using 'drop'.",
+					sender=self.sender)
+			self.ring.overrun = 'drop'
+		self.coroutines = [t for t in threads if getattr(t, 'aio', False)]
+		self.producer = AioProducer(self, threads, testing=testing)
+
+
+	def put(self, item):
+		'''
+		Passes an item to the event loop to be written to the ring.
+		Can be called from any thread.
+
+		:param item: the message or list of messages to broadcast
+		'''
+		if not self.loop.is_closed():
+			self.loop.call_soon_threadsafe(self.dispatch, item)
+
+
+	def dispatch(self, item):
+		'''
+		Writes an item (or list of items) to the ring. Must be called on the event loop.
+
+		:param item: the message or list of messages to broadcast
+		'''
+		if self.done:
+			return
+		if isinstance(item, list):
+			self.ring.put_many(item)
+			item = item[-1]
+		else:
+			self.ring.put(item)
+		if isinstance(item, RS.Term):
+			self.done = True
+			self._finished.set()
+		elif self.testing:
+			TEST['x_masterqueue'][1] = True
+
+
+	def shutdown(self):
+		'''
+		Sends the ``TERM`` message to all modules, if it has not been sent already.
+		Must be called on the event loop.
+		'''
+		if not self.done:
+			print()
+			if RS.BADPKTS:
+				printW('%s malformed data packets were rejected.' % (RS.BADPKTS), self.sender)
+			printM('Sending TERM signal to threads...', self.sender)
+			self.dispatch(RS.Term())
+		self.producer.stop = True
+
+
+	async def _drive(self, module):
+		'''
+		Runs a module as a coroutine, handing it each item from its reader.
+		'''
+		q = module.queue
+		try:
+			module.setup()
+			while module.alive:
+				d = await q.aget()
+				if (module.aio == 'executor') and isinstance(d, RS.Message) and not isinstance(d, RS.Term):
+					await self.loop.run_in_executor(None, module.process, d)
+				else:
+					module.process(d)
+		except Exception as e:
+			printE('%s' % (e), sender=module.sender)
+			module.alive = False
+		module.detach()
+		printM('Exiting.', module.sender)
+
+
+	async def _watch(self):
+		'''
+		Checks for a keyboard interrupt or a closed plot,
+		both of which set :pycode:`rsudp.raspberryshake.producer` to ``False``,
+		and for flags raised by threads that cannot notify the producer.
+		'''
+		while RS.producer and not self.done:
+			if self.producer.polled:
+				self.producer._tasks()
+				if self.producer.stop:
+					break
+			await asyncio.sleep(0.5)
+		self.shutdown()
+
+
+	async def main(self):
+		'''
+		Starts the threaded modules, the receiving endpoint, and the coroutines,
+		and waits for them all to finish.
+		'''
+		self._finished = asyncio.Event()
+		for thread in self.threads:
+			if thread not in self.coroutines:
+				thread.start()
+		RS.producer = True
+		transport, protocol = await self.loop.create_datagram_endpoint(
+			lambda: DataProtocol(self), sock=RS.sock)
+		printM('Running %s modules on the event loop and %s in their own threads.'
+			   % (len(self.coroutines), len(self.threads) - len(self.coroutines)), self.sender)
+		tasks = [self.loop.create_task(self._drive(m)) for m in self.coroutines]
+		watcher = self.loop.create_task(self._watch())
+		await self._finished.wait()
+		await asyncio.gather(*tasks)
+		watcher.cancel()
+		transport.close()
+		if self.ring.dropped:
+			printW('%s messages were skipped by consumers that fell behind.'
+					% (self.ring.dropped), self.sender)
+
+
+	def run(self):
+		'''
+		Runs the event loop until rsudp shuts down.
+		'''
+		try:
+			self.loop.run_until_complete(self.main())
+		finally:
+			self.loop.close()
@@ -0,0 +1,258 @@
+import numpy as np
+from obspy import UTCDateTime
+from obspy.core.stream import Stream
+from obspy.core.trace import Trace
+import rsudp.raspberryshake as rs
+
+
+class ChannelBuffer:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A fixed-capacity ring buffer holding the most recent samples of a single channel.
+
+	Samples are indexed by their time: the first sample ever appended has
+	index 0, and every later sample is placed at
+	``round((t - t0) * sps)``, so packets that arrive late or out of order
+	land in the right place and missing packets leave masked gaps.
+	Appending a packet costs the same no matter how long the buffer is,
+	which replaces the :py:func:`obspy.core.stream.Stream.merge` call that
+	:py:func:`rsudp.raspberryshake.update_stream` makes on every packet
+	(and the periodic :py:func:`rsudp.raspberryshake.copy` needed to keep it fast).
+
+	The storage is mirrored (every sample is written twice, ``capacity`` samples apart)
+	so that any window of up to ``capacity`` samples is a contiguous slice,
+	and :py:func:`rsudp.buffer.ChannelBuffer.trace` can wrap it as an
+	:py:class:`obspy.core.trace.Trace` without copying.
+
+	.. code-block:: python
+
+		>>> import rsudp.raspberryshake as rs
+		>>> from rsudp.buffer import ChannelBuffer
+		>>> buf = ChannelBuffer('EHZ', seconds=30, sps=100)
+		>>> buf.append_packet(rs.parse_packet(d))
+		True
+		>>> print(buf.trace())
+		AM.R3BCF.00.EHZ | 2020-02-21T19:58:50.292000Z - 2020-02-21T19:58:50.532000Z | 100.0 Hz, 25 samples
+
+	.. warning::
+
+		Traces and arrays returned by this class share memory with the buffer
+		and will change as new data arrives. Copy them before modifying them
+		in place (for example with :py:func:`obspy.core.trace.Trace.filter`).
+
+	:param str cha: the channel name (for example ``'EHZ'``)
+	:param float seconds: the length of the buffer in seconds
+	:param int sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	:param numpy.dtype dtype: the numpy data type to store samples as (defaults to :py:class:`numpy.int32`, i.e. counts)
+	'''
+
+	def __init__(self, cha, seconds, sps=None, dtype=np.int32):
+		'''
+		Allocates the buffer storage.
+		'''
+		self.cha = cha
+		self.sps = sps if sps else rs.sps
+		self.delta = 1. / self.sps
+		self.capacity = max(int(round(seconds * self.sps)), 1)
+		self._data = np.zeros(2 * self.capacity, dtype=dtype)
+		self._mask = np.ones(2 * self.capacity, dtype=bool)	# True where there is no data
+		self.t0 = None		# time of sample index 0
+		self.first = None	# index of the oldest sample ever received
+		self.head = 0		# index one past the newest sample
+		self.dropped = 0	# samples that arrived too late to fit in the buffer
+
+
+	def _write(self, start, end, values=None):
+		'''
+		Writes ``values`` (or a masked gap, if ``values`` is ``None``)
+		to both copies of the storage for sample indices ``start`` to ``end``.
+		'''
+		cap = self.capacity
+		if end - start > cap:
+			# only the newest capacity samples can be kept
+			if values is not None:
+				values = values[(end - start) - cap:]
+			start = end - cap
+		pos = start % cap
+		n = end - start
+		k = min(n, cap - pos)	# samples before the storage wraps
+		for (a, b, lo, hi) in ((pos, pos + k, 0, k), (0, n - k, k, n)):
+			if b <= a:
+				continue
+			if values is None:
+				self._mask[a:b] = True
+				self._mask[a+cap:b+cap] = True
+			else:
+				self._data[a:b] = values[lo:hi]
+				self._data[a+cap:b+cap] = values[lo:hi]
+				self._mask[a:b] = False
+				self._mask[a+cap:b+cap] = False
+
+
+	def append(self, t, data):
+		'''
+		Adds samples to the buffer.
+
+		:param float t: timestamp of the first sample in decimal seconds since 1970-01-01 00:00:00Z
+		:param numpy.ndarray data: the samples to add
+		:rtype: bool
+		:return: ``True`` if any of the samples were stored, ``False`` if they were too old to fit
+		'''
+		n = len(data)
+		if self.t0 is None:
+			self.t0 = t
+		start = int(round((t - self.t0) * self.sps))
+		end = start + n
+		if self.first is None:
+			self.first, self.head = start, start
+		oldest = self.head - self.capacity
+		if end <= oldest:
+			self.dropped += n
+			return False
+		if start < oldest:
+			self.dropped += oldest - start
+			data = data[oldest - start:]
+			start = oldest
+		if start > self.head:
+			self._write(self.head, start)	# mask the gap
+		if end > self.head:
+			self.head = end
+		self.first = min(self.first, start)
+		self._write(start, end, data)
+		return True
+
+
+	def append_packet(self, p):
+		'''
+		Adds a packet parsed by :py:func:`rsudp.raspberryshake.parse_packet` to the buffer.
+
+		:param rsudp.raspberryshake.Packet p: the parsed data packet
+		:rtype: bool
+		:return: ``True`` if any of the samples were stored, ``False`` otherwise
+		'''
+		return self.append(p.time, p.data)
+
+
+	@property
+	def tail(self):
+		'''
+		The index of the oldest sample still held in the buffer.
+
+		:rtype: int
+		'''
+		if self.first is None:
+			return self.head
+		return max(self.first, self.head - self.capacity)
+
+
+	def __len__(self):
+		'''
+		The number of samples (including masked gaps) currently held in the buffer.
+		'''
+		return self.head - self.tail
+
+
+	def index(self, t):
+		'''
+		Returns the sample index corresponding to a time.
+
+		:param t: the time to convert
+		:type t: float or obspy.core.utcdatetime.UTCDateTime
+		:rtype: int
+		'''
+		return int(round((float(t) - self.t0) * self.sps))
+
+
+	def time(self, i):
+		'''
+		Returns the time of the sample at index ``i``.
+
+		:param int i: the sample index
+		:rtype: float
+		:return: timestamp in decimal seconds since 1970-01-01 00:00:00Z
+		'''
+		return self.t0 + i * self.delta
+
+
+	def view(self, start=None, end=None):
+		'''
+		Returns zero-copy views of the samples and gap mask
+		between sample indices ``start`` and ``end``,
+		clipped to what the buffer currently holds.
+		By default, the whole buffer is returned.
+
+		:param int start: the index of the first sample
+		:param int end: the index one past the last sample
+		:rtype: numpy.ndarray, numpy.ndarray, int
+		:return: the samples, the mask (``True`` where data is missing), and the index of the first sample returned
+		'''
+		start = self.tail if start is None else max(start, self.tail)
+		end = self.head if end is None else min(end, self.head)
+		if end < start:
+			end = start
+		p = self.head % self.capacity + self.capacity	# one past the newest sample in the upper copy
+		a, b = p - (self.head - start), p - (self.head - end)
+		return self._data[a:b], self._mask[a:b], start
+
+
+	def trace(self, seconds=None, start=None, end=None, fill_value=None):
+		'''
+		Wraps the buffer contents as an :py:class:`obspy.core.trace.Trace`.
+		Unless there are gaps to fill, the trace data is a view into the buffer.
+
+		:param float seconds: return only the most recent ``seconds`` of data (ignored if ``start`` is given)
+		:param int start: the index of the first sample to return
+		:param int end: the index one past the last sample to return
+		:param fill_value: how to treat gaps: ``None`` returns a masked array, ``'latest'`` repeats the last good sample (a gap at the start takes the first good sample, and if there are none, the array is masked), and a number fills gaps with that value
+		:type fill_value: NoneType, str, int, or float
+		:rtype: obspy.core.trace.Trace
+		'''
+		if (start is None) and seconds:
+			start = self.head - int(round(seconds * self.sps))
+		data, mask, i = self.view(start, end)
+		if mask.any():
+			if fill_value is None:
+				data = np.ma.masked_array(data, mask=mask, copy=False)
+			elif fill_value == 'latest':
+				if mask.all():
+					# there is no good sample to repeat
+					data = np.ma.masked_array(data, mask=mask, copy=False)
+				else:
+					# a gap at the start has no earlier sample, so it takes the first good one
+					first = int(np.argmin(mask))
+					idx = np.where(mask, first, np.arange(len(data)))
+					data = data[np.maximum.accumulate(idx)]
+			else:
+				data = np.where(mask, fill_value, data).astype(data.dtype)
+		tr = Trace(data=data)
+		tr.stats.network = rs.net
+		tr.stats.location = '00'
+		tr.stats.station = rs.stn
+		tr.stats.channel = self.cha
+		tr.stats.sampling_rate = self.sps
+		tr.stats.starttime = UTCDateTime(self.time(i), precision=3)
+		return tr
+
+
+def to_stream(buffers, seconds=None, fill_value=None):
+	'''
+	.. versionadded:: 1.1.2
+
+	Wraps several :py:class:`rsudp.buffer.ChannelBuffer` objects as an
+	:py:class:`obspy.core.stream.Stream` with one trace per channel.
+	Buffers that have not received data yet are skipped.
+
+	:param buffers: the channel buffers to wrap, in the order the traces should appear
+	:type buffers: list or dict
+	:param float seconds: return only the most recent ``seconds`` of data
+	:param fill_value: how to treat gaps (see :py:func:`rsudp.buffer.ChannelBuffer.trace`)
+	:rtype: obspy.core.stream.Stream
+	'''
+	if isinstance(buffers, dict):
+		buffers = buffers.values()
+	return Stream([b.trace(seconds=seconds, fill_value=fill_value)
+				   for b in buffers if b.t0 is not None])
@@ -1,7 +1,10 @@
 import sys
-from datetime import timedelta
 import rsudp.raspberryshake as rs
-from obspy.signal.trigger import recursive_sta_lta, trigger_onset
+from rsudp.buffer import ChannelBuffer
+from rsudp.stalta import Detector
+from rsudp.response import StreamDeconvolver
+from rsudp import filters
+from obspy import UTCDateTime
 from rsudp import printM, printW, printE
 from rsudp import COLOR, helpers
 from rsudp.test import TEST
@@ -24,6 +27,35 @@ class Alert(rs.ConsumerThread):
 	:py:class:`obspy.core.utcdatetime.UTCDateTime`,
 	the Producer will send a :code:`RESET` message to the queues.
 
+	.. versionchanged:: 1.1.2 the STA/LTA is calculated by a streaming
+		:py:class:`rsudp.stalta.StaLta` trigger, which carries its averages
+		over from one packet to the next and only processes the new samples,
+		instead of recalculating the ratio over the whole LTA window for every packet.
+		Trigger and reset times are those of the exact samples that crossed the thresholds.
+
+	.. versionchanged:: 1.1.2 if ``coinc`` lists other channels, a separate STA/LTA
+		runs on each of them as well, and the alarm is only raised when enough
+		channels trigger at around the same time (see :py:class:`rsudp.stalta.Coincidence`).
+		This helps avoid false alarms from footsteps and other disturbances
+		that only show up on one sensor.
+
+	.. versionchanged:: 1.1.2 Alert is a detector bank: besides the main trigger,
+		it can run any number of named :py:class:`rsudp.stalta.Detector` configurations
+		(``detectors``) with their own STA/LTA lengths, thresholds, and filter bands,
+		on the same data. Each filter band is calculated once per packet
+		and shared by every detector that uses it.
+		Named detectors raise ``ALARM`` and ``RESET`` messages that carry their name
+		(see :py:class:`rsudp.raspberryshake.Alarm`).
+
+	.. versionchanged:: 1.1.2 if ``deconv`` is set, each channel is converted to physical units
+		by a :py:class:`rsudp.response.StreamDeconvolver`, which carries its state from one packet
+		to the next, so the filters and triggers see one continuous series.
+		(Deconvolving a window of data for every packet and using its newest samples
+		made the data jump at packet boundaries, which could cause false triggers.)
+		Trigger times are those of a deconvolution of the whole record,
+		but alarms are raised about 5 seconds later than on raw counts,
+		since the deconvolution filter needs data from both sides of each sample.
+
 	:param float sta: short term average (STA) duration in seconds.
 	:param float lta: long term average (LTA) duration in seconds.
 	:param float thresh: threshold for STA/LTA trigger.
@@ -32,6 +64,11 @@ class Alert(rs.ConsumerThread):
 	:param bool debug: whether or not to display max STA/LTA calculation live to the console.
 	:param str cha: listening channel (defaults to [S,E]HZ)
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
+	:param list coinc: other channels that must trigger together with ``cha`` (an empty list or ``None`` to use ``cha`` alone)
+	:param float coinc_sum: the sum of channel weights needed to raise an alarm
+	:param float coinc_window: the minimum number of seconds a channel's trigger counts towards the sum
+	:param dict coinc_weights: the weight of each channel's trigger (channels not listed have a weight of 1)
+	:param list detectors: extra named detectors, as dictionaries with a ``name`` and any of the keys ``sta``, ``lta``, ``threshold``, ``reset``, ``highpass``, and ``lowpass`` (missing keys are the same as the main trigger's)
 
 	"""
 
@@ -41,6 +78,9 @@ class Alert(rs.ConsumerThread):
 		Set to a boolean if not filtering, or ``[highpass, lowpass]``
 		if filtering.
 
+		.. versionchanged:: 1.1.2 also sets up the :py:class:`rsudp.filters.StreamFilter`
+			that the data is filtered with.
+
 		:param bp: bandpass filter parameters. if set, should be in the format ``[highpass, lowpass]``
 		:type bp: :py:class:`bool` or :py:class:`list`
 		'''
@@ -74,6 +114,9 @@ class Alert(rs.ConsumerThread):
 		- ``'DISP'`` - displacement (m)
 		- ``'CHAN'`` - channel-specific unit calculation, i.e. ``'VEL'`` for geophone channels and ``'ACC'`` for accelerometer channels
 
+		.. versionchanged:: 1.1.2 sets up a :py:class:`rsudp.response.StreamDeconvolver`
+			for each geophone and accelerometer channel the detectors use.
+
 		:param str deconv: ``'VEL'``, ``'ACC'``, ``'GRAV'``, ``'DISP'``, or ``'CHAN'``
 		'''
 		deconv = deconv.upper() if deconv else False
@@ -85,6 +128,23 @@ class Alert(rs.ConsumerThread):
 			self.units = rs.UNITS['CHAN'][1]
 			self.deconv = False
 		printM('Alert stream units are %s' % (self.units.strip(' ').lower()), self.sender)
+		self.deconvolvers = {}
+		for cha in (self.chans if self.deconv else []):
+			if cha in ['EHE', 'EHN', 'EHZ', 'SHZ']:		# geophone channels
+				output = 'VEL' if self.deconv == 'CHAN' else self.deconv
+			elif cha in ['ENE', 'ENN', 'ENZ']:			# accelerometer channels
+				output = 'ACC' if self.deconv == 'CHAN' else self.deconv
+			else:
+				continue									# the Boom is not deconvolved
+			try:
+				# a short impulse response and one packet per block keep the delay to about 5 seconds
+				self.deconvolvers[cha] = StreamDeconvolver('%s.%s.00.%s' % (rs.net, rs.stn, cha),
+														   output=output, sps=self.sps, seconds=10,
+														   block=(rs.tf / 1000.) if rs.tf else 0.25,
+														   inventory=rs.inv)
+			except Exception as e:
+				printW('Could not find the response of %s, so it will not be deconvolved (%s)'
+					   % (cha, e), self.sender)
 
 
 	def _find_chn(self):
@@ -118,6 +178,104 @@ class Alert(rs.ConsumerThread):
 			sys.exit(2)
 
 
+	def _set_coincidence(self, coinc, coinc_sum, coinc_window, coinc_weights):
+		'''
+		.. versionadded:: 1.1.2
+
+		Sets the list of channels to run triggers on, and the coincidence vote if there is more than one.
+
+		:param list coinc: other channels that must trigger together with the main channel
+		:param float coinc_sum: the sum of channel weights needed to raise an alarm
+		:param float coinc_window: the minimum number of seconds a channel's trigger counts towards the sum
+		:param dict coinc_weights: the weight of each channel's trigger
+		'''
+		self.chans = [self.cha]
+		self.coinc_weights = {}
+		self.coinc_sum, self.coinc_window = coinc_sum, coinc_window
+		names = {}
+		for c in (coinc if coinc else []):
+			match = [chn for chn in rs.chns if c.upper() in chn]
+			if not match:
+				printE('Could not find coincidence channel %s in list of channels! Please correct and restart.' % c,
+						self.sender)
+				sys.exit(2)
+			names[c] = match[-1]
+			if match[-1] not in self.chans:
+				self.chans.append(match[-1])
+		if len(self.chans) > 1:
+			for c, w in (coinc_weights.items() if coinc_weights else []):
+				self.coinc_weights[names.get(c, self.cha if c in self.cha else c)] = w
+			printM('Alarms need a coincidence sum of %s on channels %s (weights: %s) within %s seconds'
+					% (coinc_sum, ', '.join(self.chans),
+					   ', '.join('%s' % self.coinc_weights.get(c, 1) for c in self.chans), coinc_window),
+					self.sender)
+
+
+	def _add_detector(self, name, sta, lta, thresh, reset, bp):
+		'''
+		.. versionadded:: 1.1.2
+
+		Adds a detector to the bank, along with the filters for its band
+		if no other detector uses the same band.
+
+		:param str name: the detector's name
+		:param float sta: short term average duration in seconds
+		:param float lta: long term average duration in seconds
+		:param float thresh: threshold for STA/LTA trigger
+		:param float reset: the ratio below which the trigger resets
+		:param bp: filter parameters in the format ``[highpass, lowpass]``, or ``False``
+		:rtype: rsudp.stalta.Detector
+		'''
+		f = filters.from_bp(bp, sps=self.sps)
+		band = (f.kind, f.freq) if f else None
+		if band not in self.bands:
+			self.bands[band] = {c: filters.from_bp(bp, sps=self.sps) for c in self.chans}
+		det = Detector(name, self.chans, sta=sta, lta=lta, thresh=thresh, reset=reset,
+					   sps=self.sps, band=band, coinc_sum=self.coinc_sum,
+					   coinc_window=self.coinc_window, coinc_weights=self.coinc_weights)
+		self.detectors.append(det)
+		return det
+
+
+	def _set_detectors(self, detectors, bp):
+		'''
+		.. versionadded:: 1.1.2
+
+		Sets up the detector bank: the main detector, then any extra named ones.
+
+		:param list detectors: extra named detectors (see :py:class:`rsudp.c_alert.Alert`)
+		:param bp: the main detector's filter parameters
+		'''
+		self.bands = {}			# band: {channel: StreamFilter}, shared by the detectors using that band
+		self.detectors = []
+		self.detector = self._add_detector('', self.sta, self.lta, self.thresh, self.reset,
+										   bp if self.filt else False)
+		for i, d in enumerate(detectors if detectors else []):
+			name = str(d.get('name', 'detector %s' % (i + 1)))
+			if (not name) or (name in [det.name for det in self.detectors]):
+				printW('Detector names must be unique and not empty (found "%s"). Skipping this detector.' % (name),
+						self.sender)
+				continue
+			if ('highpass' in d) or ('lowpass' in d):
+				dbp = [d.get('highpass', 0), d.get('lowpass', self.sps / 2.)]
+			else:
+				dbp = bp if self.filt else False
+			det = self._add_detector(name, d.get('sta', self.sta), d.get('lta', self.lta),
+									 d.get('threshold', self.thresh), d.get('reset', self.reset), dbp)
+			printM('Detector %s: sta=%ss, lta=%ss, threshold=%s, reset=%s, %s'
+					% (det.name, det.sta, det.lta, det.thresh, det.reset,
+					   self.bands[det.band][self.cha] if det.band else 'unfiltered'), self.sender)
+		if len(self.detectors) > 1:
+			printM('Running %s detectors on %s filter bands' % (len(self.detectors), len(self.bands)),
+					self.sender)
+		# the main detector's parts, by their earlier names
+		self.triggers = self.detector.triggers
+		self.trigger = self.detector.trigger
+		self.coincidence = self.detector.coincidence
+		self.filters = self.bands[self.detector.band]
+		self.streamfilter = self.filters[self.cha]
+
+
 	def _print_filt(self):
 		'''
 		Prints stream filtering information.
@@ -133,7 +291,8 @@ class Alert(rs.ConsumerThread):
 
 	def __init__(self, q, sta=5, lta=30, thresh=1.6, reset=1.55, bp=False,
 				 debug=True, cha='HZ', sound=False, deconv=False, testing=False,
-				 *args, **kwargs):
+				 coinc=None, coinc_sum=2, coinc_window=5, coinc_weights=None,
+				 detectors=None, *args, **kwargs):
 		"""
 		Initializing the alert thread with parameters to set up the recursive
 		STA-LTA trigger, filtering, and the channel used for listening.
@@ -153,14 +312,14 @@ class Alert(rs.ConsumerThread):
 		self.debug = debug
 		self.args = args
 		self.kwargs = kwargs
-		self.raw = rs.Stream()
 		self.stream = rs.Stream()
 
 		self._set_channel(cha)
+		self._set_coincidence(coinc, coinc_sum, coinc_window, coinc_weights)
 
 		self.sps = rs.sps
 		self.inv = rs.inv
-		self.stalta = np.ndarray(1)
+		self.stalta = np.zeros(1)
 		self.maxstalta = 0
 		self.units = 'counts'
 		
@@ -171,6 +330,17 @@ class Alert(rs.ConsumerThread):
 		
 		self._set_filt(bp)
 		self._print_filt()
+		self._set_detectors(detectors, bp)
+
+		self.buffers = {c: ChannelBuffer(c, seconds=max(d.lta for d in self.detectors) + 10)
+						for c in self.chans}
+		self.buffer = self.buffers[self.cha]
+		# what the detectors read: the deconvolved data of the channels that have it, otherwise counts
+		self.inputs = dict(self.buffers)
+		for c, sd in self.deconvolvers.items():
+			self.inputs[c] = ChannelBuffer(c, seconds=max(d.lta for d in self.detectors) + 10 + sd.block / self.sps,
+										   dtype=np.float64)
+		self.last_heads = {c: 0 for c in self.chans}
 
 
 	def _getq(self):
@@ -182,10 +352,12 @@ class Alert(rs.ConsumerThread):
 		'''
 		d = self.queue.get(True, timeout=None)
 		self.queue.task_done()
-		if self.cha in str(d):
-			self.raw = rs.update_stream(stream=self.raw, d=d, fill_value='latest')
-			return True
-		elif 'TERM' in str(d):
+		if isinstance(d, rs.Packet):
+			if d.cha in self.buffers:
+				self._append(d.cha, d.time, d.data)
+				return True
+			return False
+		elif isinstance(d, rs.Term):
 			self.alive = False
 			printM('Exiting.', self.sender)
 			sys.exit()
@@ -193,17 +365,34 @@ class Alert(rs.ConsumerThread):
 			return False
 
 
-	def _deconvolve(self):
+	def _append(self, cha, t, data):
 		'''
-		Deconvolves the stream associated with this class.
+		.. versionadded:: 1.1.2
+
+		Adds samples to a channel's buffer, and passes them through the channel's
+		:py:class:`rsudp.response.StreamDeconvolver` (if it has one).
+
+		:param str cha: the channel
+		:param float t: time of the first sample in decimal seconds since 1970-01-01 00:00:00Z
+		:param numpy.ndarray data: the samples
 		'''
-		if self.deconv:
-			helpers.deconvolve(self)
+		self.buffers[cha].append(t, data)
+		if cha in self.deconvolvers:
+			try:
+				out = self.deconvolvers[cha].process(data, t)
+			except Exception as e:
+				printW('Could not find the response of %s at %s, so counts will be used for it (%s)'
+					   % (cha, UTCDateTime(t), e), self.sender)
+				del self.deconvolvers[cha]
+				self.inputs[cha] = self.buffers[cha]
+				return
+			for ts, y in out:
+				self.inputs[cha].append(ts, y)
 
 
 	def _subloop(self):
 		'''
-		Gets the queue and figures out whether or not the specified channel is in the packet.
+		Gets the queue and figures out whether or not one of the specified channels is in the packet.
 		'''
 		while True:
 			if self.queue.qsize() > 0:
@@ -213,67 +402,160 @@ class Alert(rs.ConsumerThread):
 					break
 
 
-	def _filter(self):
+	def _filter(self, data, cha=None, band=None):
 		'''
-		Filters the stream associated with this class.
+		Filters new samples of the stream associated with this class.
+
+		.. versionchanged:: 1.1.2 filters only the samples passed to it, using a
+			:py:class:`rsudp.filters.StreamFilter` that carries its state from
+			one packet to the next, instead of refiltering a copy of the whole window.
+
+		:param numpy.ndarray data: the samples received since the last call
+		:param str cha: the channel the samples are from (defaults to the main channel)
+		:param band: the filter band (defaults to the main detector's)
+		:rtype: numpy.ndarray
+		:return: the filtered samples
 		'''
-		if self.filt:
-			if self.filt in 'bandpass':
-				self.stalta = recursive_sta_lta(
-							self.stream[0].copy().filter(type=self.filt,
-							freqmin=self.freqmin, freqmax=self.freqmax),
-							int(self.sta * self.sps), int(self.lta * self.sps))
-			else:
-				self.stalta = recursive_sta_lta(
-							self.stream[0].copy().filter(type=self.filt,
-							freq=self.freq),
-							int(self.sta * self.sps), int(self.lta * self.sps))
-		else:
-			self.stalta = recursive_sta_lta(self.stream[0],
-					int(self.sta * self.sps), int(self.lta * self.sps))
+		f = self.bands[band if band else self.detector.band][cha if cha else self.cha]
+		if f:
+			return f.filter(data)
+		return data
 
 
-	def _is_trigger(self):
+	def _update_stalta(self, news):
 		'''
-		Figures out it there's a trigger active.
+		.. versionadded:: 1.1.2
+
+		Filters the newest samples of each trace in the stream once for each band,
+		and passes them to the STA/LTA trigger of each detector that uses that band.
+
+		:param dict news: the number of samples received on each channel since the last update
+		:rtype: dict
+		:return: for each :py:class:`rsudp.stalta.Detector`, a dictionary with the
+			:py:class:`rsudp.stalta.Trigger` state changes of each channel
+		'''
+		triggers = {det: {} for det in self.detectors}
+		for tr in self.stream:
+			cha = tr.stats.channel
+			new = news[cha]
+			if new > len(tr.data):
+				# samples were lost, so the filters can't carry on from where they left off
+				new = len(tr.data)
+				for fs in self.bands.values():
+					if fs[cha]:
+						fs[cha].reset()
+			if new <= 0:
+				continue
+			data = tr.data[-new:]
+			t = float(tr.stats.endtime) - (new - 1) * tr.stats.delta
+			for band in self.bands:
+				filtered = self._filter(data, cha, band)
+				for det in self.detectors:
+					if det.band == band:
+						triggers[det][cha] = det.update(cha, filtered, t)
+		if self.cha in triggers[self.detector]:
+			self.stalta = self.trigger.ratio
+		return triggers
+
+
+	def _vote(self, triggers):
 		'''
-		if self.stalta.max() > self.thresh:
-			if not self.exceed:
-				# raise a flag that the Producer can read and modify 
-				self.alarm = helpers.fsec(self.stream[0].stats.starttime + timedelta(seconds=
-										trigger_onset(self.stalta, self.thresh,
-										self.reset)[-1][0] * self.stream[0].stats.delta))
-				self.exceed = True	# the state machine; this one should not be touched from the outside, otherwise bad things will happen
+		.. versionadded:: 1.1.2
+
+		Decides which channel trigger state changes are alarms or resets for each detector
+		(see :py:func:`rsudp.stalta.Detector.vote`).
+
+		:param dict triggers: the state changes for each detector and channel, from :py:func:`_update_stalta`
+		:rtype: dict
+		:return: a list of :py:class:`rsudp.stalta.Trigger` state changes for each detector
+		'''
+		now = None
+		if len(self.chans) > 1 and all(b.t0 is not None for b in self.inputs.values()):
+			# votes can be counted out once every channel has data past the end of their window
+			now = min(b.time(b.head - 1) for b in self.inputs.values())
+		return {det: det.vote(triggers[det], now=now) for det in self.detectors}
+
+
+	def _is_trigger(self, events, det=None):
+		'''
+		Acts on trigger state changes.
+
+		.. versionchanged:: 1.1.2 takes the state changes found by :py:func:`rsudp.stalta.StaLta.update`
+			(or by the coincidence vote, see :py:func:`_vote`), and the detector they are from.
+
+		:param list events: a list of :py:class:`rsudp.stalta.Trigger` state changes
+		:param rsudp.stalta.Detector det: the detector (defaults to the main one)
+		'''
+		if not events:
+			return
+		det = det if det else self.detector
+		prefix = ('Detector %s: ' % det.name) if det.name else ''
+		for ev in events:
+			if ev.on:
+				event_time = helpers.fsec(UTCDateTime(ev.time))
+				# raise a flag that the Producer can read and modify (it may be cleared at any time after this)
+				self.alarm = rs.Alarm(event_time, det.name) if det.name else event_time
+				det.exceed = True	# the state machine; this one should not be touched from the outside, otherwise bad things will happen
 				print()
-				printM('Trigger threshold of %s exceeded at %s'
-						% (self.thresh, self.alarm.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
-				printM('Trigger will reset when STA/LTA goes below %s...' % self.reset, sender=self.sender)
-				COLOR['current'] = COLOR['purple']
+				if det.coincidence:
+					printM('%sCoincidence sum of %s reached on channels %s at %s'
+							% (prefix, det.coincidence.thresh, ', '.join(det.coincidence.voting),
+							   event_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
+				else:
+					printM('%sTrigger threshold of %s exceeded at %s'
+							% (prefix, det.thresh, event_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
+				printM('%sTrigger will reset when STA/LTA goes below %s...' % (prefix, det.reset), sender=self.sender)
 				if self.testing:
 					TEST['c_alerton'][1] = True
 			else:
-				pass
-
-			if self.stalta.max() > self.maxstalta:
-				self.maxstalta = self.stalta.max()
-		else:
-			if self.exceed:
-				if self.stalta[-1] < self.reset:
-					self.alarm_reset = helpers.fsec(self.stream[0].stats.endtime)	# lazy; effective
-					self.exceed = False
-					print()
-					printM('Max STA/LTA ratio reached in alarm state: %s' % (round(self.maxstalta, 3)),
-							self.sender)
-					printM('Earthquake trigger reset and active again at %s' % (
-							self.alarm_reset.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]),
-							self.sender)
-					self.maxstalta = 0
-					COLOR['current'] = COLOR['green']
+				self.maxstalta = det.max
+				reset_time = helpers.fsec(UTCDateTime(ev.time))
+				self.alarm_reset = rs.Reset(reset_time, det.name) if det.name else reset_time
+				det.exceed = False
+				print()
+				printM('%sMax STA/LTA ratio reached in alarm state: %s' % (prefix, round(self.maxstalta, 3)),
+						self.sender)
+				printM('%sEarthquake trigger reset and active again at %s' % (prefix,
+						reset_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]),
+						self.sender)
+				self.maxstalta = 0
 				if self.testing:
 					TEST['c_alertoff'][1] = True
+		self.exceed = any(d.exceed for d in self.detectors)
+		COLOR['current'] = COLOR['purple'] if self.exceed else COLOR['green']
 
-			else:
-				pass
+
+	def _compute(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Runs the detectors on everything the buffers have received since the last call,
+		and raises or resets alarms accordingly.
+		This is what :py:func:`rsudp.c_alert.Alert.run` does after reading from the queue,
+		and what :py:mod:`rsudp.evaluate` calls after each block of archived data.
+
+		:rtype: dict
+		:return: the number of new samples on each channel (empty if there were none)
+		'''
+		# everything received on each channel since the last calculation
+		# (already deconvolved, if it needs to be)
+		traces, news = [], {}
+		for cha in self.chans:
+			buf = self.inputs[cha]
+			if buf.head > self.last_heads[cha]:
+				traces.append(buf.trace(start=self.last_heads[cha], fill_value='latest'))
+				news[cha] = buf.head - self.last_heads[cha]
+				self.last_heads[cha] = buf.head
+		if not traces:
+			return news
+		self.stream = rs.Stream(traces)
+		# the filters and triggers keep their state between packets, so they must see every sample
+		events = self._vote(self._update_stalta(news))
+		# figure out if any of the triggers have gone off
+		# (each trigger's ratio stays at zero until its own lta has passed)
+		for det in self.detectors:
+			self._is_trigger(events[det], det)
+		return news
 
 
 	def _print_stalta(self):
@@ -282,8 +564,7 @@ class Alert(rs.ConsumerThread):
 		'''
 		if self.debug:
 			msg = '\r%s [%s] Threshold: %s; Current max STA/LTA: %.4f' % (
-					(self.stream[0].stats.starttime + timedelta(seconds=
-					 len(self.stream[0].data) * self.stream[0].stats.delta)).strftime('%Y-%m-%d %H:%M:%S'),
+					UTCDateTime(self.buffer.time(self.buffer.head)).strftime('%Y-%m-%d %H:%M:%S'),
 					self.sender,
 					self.thresh,
 					round(np.max(self.stalta[-50:]), 4)
@@ -294,7 +575,8 @@ class Alert(rs.ConsumerThread):
 	def run(self):
 		"""
 		Reads data from the queue into a :class:`obspy.core.stream.Stream` object,
-		then runs a :func:`obspy.signal.trigger.recursive_sta_lta` function to
+		then passes the new samples to a streaming recursive STA/LTA
+		(:py:class:`rsudp.stalta.StaLta`) to
 		determine whether to raise an alert flag (:py:data:`rsudp.c_alert.Alert.alarm`).
 		The producer reads this flag and uses it to notify other consumers.
 		"""
@@ -310,27 +592,16 @@ class Alert(rs.ConsumerThread):
 		while True:
 			self._subloop()
 
-			self.raw = rs.copy(self.raw)	# necessary to avoid memory leak
-			self.stream = self.raw.copy()
-			self._deconvolve()
+			news = self._compute()
+			if not news:
+				continue
 
 			if n > wait_pkts:
-				# if the trigger is activated
-				obstart = self.stream[0].stats.endtime - timedelta(seconds=self.lta)	# obspy time
-				self.raw = self.raw.slice(starttime=obstart)		# slice the stream to the specified length (seconds variable)
-				self.stream = self.stream.slice(starttime=obstart)	# slice the stream to the specified length (seconds variable)
-
-				# filter
-				self._filter()
-				# figure out if the trigger has gone off
-				self._is_trigger()
-
-				# copy the stream (necessary to avoid memory leak)
-				self.stream = rs.copy(self.stream)
-
 				# print the current STA/LTA calculation
 				self._print_stalta()
 
+			elif self.cha not in news:
+				continue	# warmup is counted in packets of the main channel
 			elif n == 0:
 				printM('Starting Alert trigger with sta=%ss, lta=%ss, and threshold=%s on channel=%s'
 					   % (self.sta, self.lta, self.thresh, self.cha), self.sender)
@@ -1,5 +1,5 @@
 import sys, os
-from rsudp.raspberryshake import ConsumerThread
+from rsudp.raspberryshake import ConsumerThread, Alarm, Term
 from rsudp import printM, printW, printE
 from rsudp.test import TEST
 import subprocess
@@ -30,6 +30,8 @@ class AlertSound(ConsumerThread):
 
 	"""
 
+	aio = 'executor'	# see rsudp.raspberryshake.ConsumerThread
+
 	def _load_sound(self):
 		'''
 		Loads MP3 sound if possible, then writes to wav.
@@ -129,14 +131,28 @@ class AlertSound(ConsumerThread):
 		Reads data from the queue and plays self.sound if it sees an ``ALARM`` message.
 		Quits if it sees a ``TERM`` message.
 		"""
-		while True:
+		while self.alive:
 			d = self.queue.get()
 			self.queue.task_done()
-			if 'TERM' in str(d):
-				self.alive = False
-				self.devnull.close()
-				printM('Exiting.', self.sender)
-				sys.exit()
-			elif 'ALARM' in str(d):
-				if self.sound and pydub_exists:
-					self._play()
+			self.process(d)
+
+		printM('Exiting.', self.sender)
+		sys.exit()
+
+	def process(self, d):
+		"""
+		.. versionadded:: 1.1.2
+
+		Plays self.sound if ``d`` is an ``ALARM`` message.
+		Sets ``self.alive`` to ``False`` if it is a ``TERM`` message.
+
+		:param d: the queue item
+		:type d: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+		"""
+		if isinstance(d, Term):
+			self.alive = False
+			self.devnull.close()
+		elif isinstance(d, Alarm):
+			if self.sound and pydub_exists:
+				printM('Alarm-to-sound latency: %.3f s' % (d.latency()), sender=self.sender)
+				self._play()
@@ -1,6 +1,7 @@
 import sys
 from threading import Thread
 from rsudp import printM, printW, printE
+import rsudp.raspberryshake as RS
 from rsudp.test import TEST
 
 
@@ -9,9 +10,18 @@ class Consumer(Thread):
 	The main consumer process. This consumer reads
 	queue messages from the :class:`rsudp.p_producer.Producer`
 	and distributes those messages to each sub-consumer in ``destinations``.
+	Data arrives already parsed (as :py:class:`rsudp.raspberryshake.Packet` records),
+	and the same record object is passed to every destination.
+
+	.. versionchanged:: 1.1.2 messages are written once to a
+		:py:class:`rsudp.ring.BroadcastRing` which every sub-consumer reads from,
+		instead of being copied into one queue per sub-consumer.
+		This thread is the ring's only writer.
+		The Producer passes packets in batches (lists), which are written
+		to the ring in one go.
 
 	:param queue.Queue queue: queue of data and messages sent by :class:`rsudp.p_producer.Producer`
-	:param list destinations: list of :py:class:`queue.Queue` objects to pass data to
+	:param rsudp.ring.BroadcastRing destinations: the ring that sub-consumers read from
 	"""
 
 
@@ -41,10 +51,17 @@ class Consumer(Thread):
 				p = self.queue.get()
 				self.queue.task_done()
 
-				for q in self.destinations:
-					q.put(p)
+				if isinstance(p, list):
+					# a batch of packets received in one go by the Producer
+					self.destinations.put_many(p)
+					p = p[-1]
+				else:
+					self.destinations.put(p)
 
-				if 'TERM' in str(p):
+				if isinstance(p, RS.Term):
+					if self.destinations.dropped:
+						printW('%s messages were skipped by consumers that fell behind.'
+								% (self.destinations.dropped), self.sender)
 					printM('Exiting.', self.sender)
 					break
 
@@ -1,6 +1,6 @@
 import sys, os
 from rsudp import printM, printW, printE
-from rsudp.raspberryshake import ConsumerThread
+from rsudp.raspberryshake import ConsumerThread, Alarm, Term
 from rsudp.test import TEST
 
 
@@ -41,6 +41,8 @@ class Custom(ConsumerThread):
 
 	"""
 
+	aio = 'executor'	# see rsudp.raspberryshake.ConsumerThread
+
 	def __init__(self, q=False, codefile=False, win_ovr=False, testing=False):
 		"""
 		Initializes the custom code execution thread.
@@ -106,15 +108,27 @@ class Custom(ConsumerThread):
 		Reads data from the queue and executes self.codefile if it sees an ``ALARM`` message.
 		Quits if it sees a ``TERM`` message.
 		"""
-		while True:
+		while self.alive:
 			d = self.queue.get()
 			self.queue.task_done()
-			if 'TERM' in str(d):
-				self.alive = False
-				printM('Exiting.', self.sender)
-				sys.exit()
-			elif 'ALARM' in str(d):
-				printM('Got ALARM message...', sender=self.sender)
-				self.exec_code()
-
-		self.alive = False
+			self.process(d)
+
+		printM('Exiting.', self.sender)
+		sys.exit()
+
+	def process(self, d):
+		"""
+		.. versionadded:: 1.1.2
+
+		Executes self.codefile if ``d`` is an ``ALARM`` message.
+		Sets ``self.alive`` to ``False`` if it is a ``TERM`` message.
+
+		:param d: the queue item
+		:type d: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+		"""
+		if isinstance(d, Term):
+			self.alive = False
+		elif isinstance(d, Alarm):
+			printM('Got ALARM message (alarm-to-action latency: %.3f s)...' % (d.latency()),
+				   sender=self.sender)
+			self.exec_code()
@@ -28,6 +28,8 @@ class Forward(rs.ConsumerThread):
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
 	"""
 
+	aio = 'inline'	# see rsudp.raspberryshake.ConsumerThread
+
 	def __init__(self, num, addr, port, fwd_data, fwd_alarms, cha, q, testing=False):
 		"""
 		Initializes data forwarding module.
@@ -69,19 +71,21 @@ class Forward(rs.ConsumerThread):
 		sys.exit()
 
 
-	def run(self):
-		"""
-		Gets and distributes queue objects to another address and port on the network.
-		"""
+	def setup(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Opens the socket to forward messages through.
+		'''
 		printM('Opening socket...', sender=self.sender)
 		
 		# Set the socket type correctly for macOS compatibility
 		socket_type = s.SOCK_DGRAM
-		sock = s.socket(s.AF_INET, socket_type)
+		self.sock = s.socket(s.AF_INET, socket_type)
 		
 		# Set SO_REUSEADDR option separately if not on Windows
 		if os.name != 'nt':
-			sock.setsockopt(s.SOL_SOCKET, s.SO_REUSEADDR, 1)
+			self.sock.setsockopt(s.SOL_SOCKET, s.SO_REUSEADDR, 1)
 
 		msg_data = '%s data' % (self.chans) if self.fwd_data else ''
 		msg_and = ' and ' if (self.fwd_data and self.fwd_alarms) else ''
@@ -89,28 +93,49 @@ class Forward(rs.ConsumerThread):
 
 		printM('Forwarding %s%s%s to %s:%s' % (msg_data, msg_and, msg_alarms, self.addr, self.port), sender=self.sender)
 
-		try:
-			while self.running:
-				p = self.queue.get()    # get a packet
-				self.queue.task_done()  # close the queue
 
-				if 'TERM' in str(p):    # shutdown if there's a TERM message on the queue
-					self._exit()
+	def process(self, p):
+		'''
+		.. versionadded:: 1.1.2
+
+		Forwards one item from the queue, if it should be forwarded.
+		Sets ``self.alive`` to ``False`` if it is a ``TERM`` message.
+		Requires the socket to be open (see :py:func:`rsudp.c_forward.Forward.setup`).
+
+		:param p: the queue item
+		:type p: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+		'''
+		if isinstance(p, rs.Packet):
+			if (self.fwd_data) and (p.cha in self.chans):
+				self.sock.sendto(p.raw, (self.addr, self.port))
 
-				if 'IMGPATH' in str(p):
-					continue
+		elif isinstance(p, rs.Term):    # shutdown if there's a TERM message on the queue
+			self.alive = False
+			return
+
+		elif isinstance(p, rs.ImgPath):
+			return
+
+		elif isinstance(p, (rs.Alarm, rs.Reset)):
+			if self.fwd_alarms:
+				self.sock.sendto(bytes(p), (self.addr, self.port))
+			return
 
-				if ('ALARM' in str(p)) or ('RESET' in str(p)):
-					if self.fwd_alarms:
-						sock.sendto(p, (self.addr, self.port))
-					continue
+		if self.testing:
+			TEST['c_forward'][1] = True
 
-				if "{'" in str(p):
-					if (self.fwd_data) and (rs.getCHN(p) in self.chans):
-						sock.sendto(p, (self.addr, self.port))
 
-				if self.testing:
-					TEST['c_forward'][1] = True
+	def run(self):
+		"""
+		Gets and distributes queue objects to another address and port on the network.
+		"""
+		self.setup()
+
+		try:
+			while self.running and self.alive:
+				p = self.queue.get()    # get a packet
+				self.queue.task_done()  # close the queue
+				self.process(p)
 
 		except Exception as e:
 			self.alive = False
@@ -119,3 +144,4 @@ class Forward(rs.ConsumerThread):
 				TEST['c_forward'][1] = False
 			sys.exit(2)
 
+		self._exit()
@@ -0,0 +1,353 @@
+import sys, os
+import socket as s
+import numpy as np
+from obspy import UTCDateTime
+import rsudp.raspberryshake as rs
+from rsudp import printM, printW, printE
+from rsudp import helpers
+from rsudp.filters import StreamFilter, Integrator, Differentiator
+from rsudp.test import TEST
+
+
+VEL_CHANNELS = ['EHE', 'EHN', 'EHZ', 'SHZ']	# geophone channels
+ACC_CHANNELS = ['ENE', 'ENN', 'ENZ']		# accelerometer channels
+METRICS = ('PGA', 'PGV', 'PGD', 'MMI')		# the quantities that can raise an alarm
+
+
+def intensity(pga, pgv):
+	'''
+	.. versionadded:: 1.1.2
+
+	Estimates the instrumental (Modified Mercalli) intensity from peak ground
+	acceleration and velocity, using the ground motion to intensity conversion
+	equations of Worden et al. (2012) that USGS ShakeMap uses.
+	The larger of the two estimates is returned.
+
+	:param float pga: peak ground acceleration in m/s\\ :sup:`2`
+	:param float pgv: peak ground velocity in m/s
+	:rtype: float
+	:return: the intensity, between 1 and 10
+	'''
+	mmi = 1.
+	if pga > 0:
+		la = np.log10(pga * 100.)	# the equations use cm/s2 and cm/s
+		mmi = max(mmi, (1.78 + 1.55 * la) if la <= 1.57 else (-1.60 + 3.70 * la))
+	if pgv > 0:
+		lv = np.log10(pgv * 100.)
+		mmi = max(mmi, (3.78 + 1.47 * lv) if lv <= 0.53 else (2.89 + 3.16 * lv))
+	return float(min(mmi, 10.))
+
+
+class ChannelMotion:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	Converts one channel to acceleration, velocity, and displacement
+	one packet at a time, and keeps track of their peaks.
+
+	Counts are scaled to physical units by the channel's overall sensitivity
+	(the flat part of its response), which is accurate for the frequencies that
+	dominate peak ground motion, and much cheaper than a full deconvolution.
+	Geophone channels are differentiated to get acceleration,
+	and integrated to get displacement;
+	accelerometer channels are integrated once for velocity and twice for displacement.
+	Each integration is followed by a highpass filter
+	(a :py:class:`rsudp.filters.StreamFilter`) to stop it from drifting.
+	All stages keep their state between packets, so every sample is processed once.
+	If a packet does not follow on from the previous one, the stages start again.
+
+	:param str cha: the channel name
+	:param float sensitivity: counts per m/s (geophones) or per m/s\\ :sup:`2` (accelerometers)
+	:param str kind: ``'VEL'`` for a geophone channel or ``'ACC'`` for an accelerometer channel
+	:param float sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	:param float highpass: the corner frequency of the highpass filters in Hz
+	'''
+
+	def __init__(self, cha, sensitivity, kind='VEL', sps=None, highpass=0.1):
+		'''
+		Sets up the filter stages.
+		'''
+		self.cha = cha
+		self.sensitivity = sensitivity
+		self.kind = kind
+		self.sps = sps if sps else rs.sps
+		hp = lambda: StreamFilter('highpass', highpass, sps=self.sps, corners=2)
+		self._hp = hp()
+		self._diff = Differentiator(self.sps)
+		self._int1, self._hp1 = Integrator(self.sps), hp()
+		self._int2, self._hp2 = Integrator(self.sps), hp()
+		self.peaks = [0., 0., 0.]		# the peaks of the latest packet (acceleration, velocity, displacement)
+		self.next = None				# the time the next packet should start at
+		self.clear()
+
+
+	def clear(self):
+		'''
+		Resets the running peaks (but not the filter states).
+		'''
+		self.pga, self.pgv, self.pgd = 0., 0., 0.
+
+
+	def reset(self):
+		'''
+		Resets the filter states, for example after a gap in the data.
+		'''
+		for stage in (self._hp, self._diff, self._int1, self._hp1, self._int2, self._hp2):
+			stage.reset()
+
+
+	def update(self, data, t=None):
+		'''
+		Processes the next packet of counts.
+
+		:param numpy.ndarray data: the new samples
+		:param float t: time of the first sample in decimal seconds since 1970-01-01 00:00:00Z (used to detect gaps)
+		:rtype: list
+		:return: the peak absolute acceleration (m/s\\ :sup:`2`), velocity (m/s), and displacement (m) in the packet
+		'''
+		if t is not None:
+			if (self.next is not None) and (abs(t - self.next) > 0.5 / self.sps):
+				self.reset()
+			self.next = t + len(data) / self.sps
+		x = self._hp.filter(np.asarray(data, dtype=np.float64) / self.sensitivity)
+		if self.kind == 'ACC':
+			acc = x
+			vel = self._hp1.filter(self._int1.filter(acc))
+		else:
+			vel = x
+			acc = self._diff.filter(vel)
+		disp = self._hp2.filter(self._int2.filter(vel))
+		self.peaks = [float(np.abs(acc).max()), float(np.abs(vel).max()), float(np.abs(disp).max())]
+		self.pga = max(self.pga, self.peaks[0])
+		self.pgv = max(self.pgv, self.peaks[1])
+		self.pgd = max(self.pgd, self.peaks[2])
+		return self.peaks
+
+
+class GroundMotion(rs.ConsumerThread):
+	"""
+	.. versionadded:: 1.1.2
+
+	A consumer class that computes running peak ground acceleration (PGA),
+	velocity (PGV), and displacement (PGD), and an instrumental intensity estimate
+	(see :py:func:`rsudp.c_groundmotion.intensity`), for each geophone and accelerometer channel.
+	Each packet is processed once by a :py:class:`rsudp.c_groundmotion.ChannelMotion`,
+	so this is cheap enough to run alongside :py:class:`rsudp.c_alert.Alert` on a Raspberry Pi.
+
+	Every ``interval`` seconds of data, the peaks of that interval are printed
+	(unless ``quiet`` is set) and optionally forwarded to an IP address and port,
+	like :py:class:`rsudp.c_rsam.RSAM` does, in ``'LITE'``, ``'JSON'``, or ``'CSV'`` format.
+
+	If one of the ``thresholds`` is exceeded on any channel, the
+	:py:data:`alarm` flag is set (with the metric that was exceeded as its name,
+	for example ``'PGV'``), so that the Producer sends an ``ALARM`` message.
+	When no threshold has been exceeded for ``reset`` seconds, an alarm reset is sent.
+	Thresholds are only checked once the filters have settled, ``warmup`` seconds after the start,
+	and only if the channels' sensitivities could be found in the inventory
+	(otherwise, the peaks are given in counts and there is no intensity estimate).
+
+	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
+	:param cha: channel(s) to use (see :py:func:`rsudp.helpers.set_channels`)
+	:type cha: str or list
+	:param float interval: the number of seconds of data to report the peaks of
+	:param float highpass: the corner frequency of the highpass filters in Hz
+	:param dict thresholds: thresholds for ``'PGA'`` (m/s\\ :sup:`2`), ``'PGV'`` (m/s), ``'PGD'`` (m), and ``'MMI'``; missing or zero thresholds are not checked
+	:param float reset: the number of seconds without an exceedance after which the alarm resets
+	:param float warmup: the number of seconds to wait before checking thresholds
+	:param str fwaddr: Specify a forwarding address to send the peaks in a UDP packet
+	:param str fwport: Specify a forwarding port to send the peaks in a UDP packet
+	:param str fwformat: Specify a format for the forwarded packet: ``'LITE'``, ``'JSON'``, or ``'CSV'``
+	:param bool quiet: ``True`` to suppress printing the peaks to the console
+	"""
+
+	aio = 'inline'	# see rsudp.raspberryshake.ConsumerThread
+
+	def __init__(self, q=False, cha='all', interval=1, highpass=0.1, thresholds=None,
+				 reset=10, warmup=30, fwaddr=False, fwport=False, fwformat='LITE',
+				 quiet=False, testing=False):
+		"""
+		Initializes the ground motion thread.
+		"""
+		super().__init__()
+		self.sender = 'GroundMotion'
+		self.alive = True
+		self.testing = testing
+		self.quiet = quiet
+		self.stn = rs.stn
+		self.interval = interval
+		self.highpass = highpass
+		self.reset = reset
+		self.warmup = warmup
+		self.fwaddr = fwaddr
+		self.fwport = fwport
+		self.fwformat = fwformat.upper()
+		self.sock = False
+		thresholds = thresholds if thresholds else {}
+		self.thresholds = {m.upper(): v for m, v in thresholds.items()
+						   if (m.upper() in METRICS) and v}
+
+		self.chans = []
+		helpers.set_channels(self, cha)
+		self._set_motions()
+
+		self.start_time = None		# time of the first sample
+		self.next_report = None		# data time of the next report
+		self.exceed = False			# whether a threshold is exceeded
+		self.alarm_name = None		# the metric that raised the current alarm
+		self.last_exceed = 0		# time of the latest exceedance
+		self.mmi = 1.				# the highest intensity in the current interval
+
+		if q:
+			self.queue = q
+		else:
+			printE('no queue passed to the consumer thread! We will exit now!',
+				   self.sender)
+			sys.stdout.flush()
+			self.alive = False
+			sys.exit()
+
+		printM('Starting.', self.sender)
+
+
+	def _set_motions(self):
+		'''
+		Sets up a :py:class:`rsudp.c_groundmotion.ChannelMotion` for each
+		geophone and accelerometer channel, using sensitivities from the inventory.
+		'''
+		self.motions = {}
+		self.calibrated = True
+		for cha in self.chans:
+			kind = 'VEL' if cha in VEL_CHANNELS else ('ACC' if cha in ACC_CHANNELS else None)
+			if not kind:
+				continue
+			sens = None
+			if rs.inv:
+				try:
+					sens = rs.inv.get_response('%s.%s.00.%s' % (rs.net, rs.stn, cha),
+											   UTCDateTime.now()).instrument_sensitivity.value
+				except Exception as e:
+					printW('Could not find the sensitivity of %s (%s)' % (cha, e), self.sender)
+			if not sens:
+				sens = 1.
+				self.calibrated = False
+			self.motions[cha] = ChannelMotion(cha, sens, kind=kind, highpass=self.highpass)
+		if not self.motions:
+			printW('None of the channels %s are geophone or accelerometer channels.' % (self.chans), self.sender)
+		if not self.calibrated:
+			printW('No inventory found, so peaks will be in counts and no alarms will be raised.', self.sender)
+		else:
+			printM('Computing ground motion on channels %s' % (list(self.motions)), self.sender)
+
+
+	def setup(self):
+		'''
+		Opens the socket to forward the peaks through, if there is one.
+		'''
+		if self.fwaddr and self.fwport:
+			printM('Opening socket...', sender=self.sender)
+			self.sock = s.socket(s.AF_INET, s.SOCK_DGRAM)
+			if os.name != 'nt':
+				self.sock.setsockopt(s.SOL_SOCKET, s.SO_REUSEADDR, 1)
+
+
+	def _check(self, m, t):
+		'''
+		Checks the peaks of the latest packet against the thresholds,
+		and raises or resets the alarm.
+
+		:param rsudp.c_groundmotion.ChannelMotion m: the channel that just processed a packet
+		:param float t: the time of the packet
+		'''
+		if (not self.calibrated) or (t - self.start_time < self.warmup):
+			return
+		values = dict(zip(METRICS[:3], m.peaks))
+		if 'MMI' in self.thresholds:
+			values['MMI'] = intensity(m.peaks[0], m.peaks[1])
+		over = [k for k, v in self.thresholds.items() if values[k] >= v]
+		if over:
+			self.last_exceed = t
+			if not self.exceed:
+				self.exceed = True
+				self.alarm_name = over[0]
+				self.alarm = rs.Alarm(helpers.fsec(UTCDateTime(t)), self.alarm_name)
+				printM('%s threshold of %s exceeded on %s (%s)'
+					   % (over[0], self.thresholds[over[0]], m.cha, round(values[over[0]], 6)),
+					   self.sender)
+		elif self.exceed and (t - self.last_exceed > self.reset):
+			self.exceed = False
+			self.alarm_reset = rs.Reset(helpers.fsec(UTCDateTime(t)), self.alarm_name)
+			printM('Ground motion below thresholds for %s seconds, alarm reset.' % (self.reset), self.sender)
+
+
+	def _message(self, m, mmi):
+		'''
+		Formats the peaks of a channel for forwarding.
+		'''
+		mmi = round(mmi, 2) if self.calibrated else ('null' if self.fwformat == 'JSON' else '')
+		if self.fwformat == 'JSON':
+			return '{"station":"%s","channel":"%s","pga":%s,"pgv":%s,"pgd":%s,"mmi":%s}' \
+				   % (self.stn, m.cha, m.pga, m.pgv, m.pgd, mmi)
+		elif self.fwformat == 'CSV':
+			return '%s,%s,%s,%s,%s,%s' % (self.stn, m.cha, m.pga, m.pgv, m.pgd, mmi)
+		return 'stn:%s|ch:%s|pga:%s|pgv:%s|pgd:%s|mmi:%s' % (self.stn, m.cha, m.pga, m.pgv, m.pgd, mmi)
+
+
+	def _report(self, t):
+		'''
+		Prints and forwards the peaks of the last interval, then clears them.
+
+		:param float t: the end of the interval
+		'''
+		for m in self.motions.values():
+			mmi = intensity(m.pga, m.pgv) if self.calibrated else 0
+			if not self.quiet:
+				printM('%s %s peaks: acc %.3e vel %.3e disp %.3e%s'
+					   % (UTCDateTime(t).strftime('%Y-%m-%d %H:%M:%S'), m.cha, m.pga, m.pgv, m.pgd,
+						  (' intensity %.1f' % mmi) if self.calibrated else ' (counts)'),
+					   self.sender)
+			if self.sock:
+				self.sock.sendto(bytes(self._message(m, mmi), 'utf-8'), (self.fwaddr, self.fwport))
+			m.clear()
+		if self.testing:
+			TEST['c_groundmotion'][1] = True
+
+
+	def process(self, d):
+		'''
+		Processes one item from the queue.
+		Sets ``self.alive`` to ``False`` if it is a ``TERM`` message.
+
+		:param d: the queue item
+		:type d: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+		'''
+		if isinstance(d, rs.Packet):
+			m = self.motions.get(d.cha)
+			if not m:
+				return
+			if self.start_time is None:
+				self.start_time = d.time
+				self.next_report = d.time + self.interval
+			m.update(d.data, d.time)
+			self._check(m, d.time)
+			if d.time >= self.next_report:
+				self._report(self.next_report)
+				self.next_report += self.interval * (1 + int((d.time - self.next_report) // self.interval))
+		elif isinstance(d, rs.Term):
+			self.alive = False
+
+
+	def run(self):
+		"""
+		Reads data from the queue and processes it until a ``TERM`` message arrives.
+		"""
+		self.setup()
+		while self.alive:
+			d = self.queue.get()
+			self.queue.task_done()
+			self.process(d)
+
+		printM('Exiting.', self.sender)
+		sys.exit()
@@ -5,6 +5,7 @@ import math
 import numpy as np
 from datetime import datetime, timedelta
 import rsudp.raspberryshake as rs
+from rsudp.buffer import ChannelBuffer, to_stream
 from rsudp import printM, printW, printE, get_scap_dir, helpers
 from rsudp.test import TEST
 import linecache
@@ -143,6 +144,7 @@ class Plot:
 		self.totchns = rs.numchns
 
 		self.seconds = seconds
+		self.buffers = {c: ChannelBuffer(c, seconds=self.seconds) for c in self.chans}
 		self.pkts_in_period = rs.tr * rs.numchns * self.seconds	# theoretical number of packets received in self.seconds
 		self.spectrogram = spectrogram
 
@@ -186,18 +188,22 @@ class Plot:
 		'''
 		d = self.queue.get()
 		self.queue.task_done()
-		if 'TERM' in str(d):
+		if isinstance(d, rs.Packet):
+			if d.cha in self.chans:
+				self.buffers[d.cha].append_packet(d)
+				return True
+			return False
+
+		elif isinstance(d, rs.Term):
 			plt.close()
-			if 'SELF' in str(d):
-				printM('Plot has been closed, plot thread will exit.', self.sender)
 			self.alive = False
 			rs.producer = False
 
-		elif 'ALARM' in str(d):
+		elif isinstance(d, rs.Alarm):
 			self.events += 1		# add event to count
 			self.save_timer -= 1	# don't push the save time forward if there are a large number of alarm events
 			event = [self.save_timer + int(self.save_pct*self.pkts_in_period),
-					 helpers.fsec(helpers.get_msg_time(d))]	# event = [save after count, datetime]
+					 helpers.fsec(d.time)]	# event = [save after count, datetime]
 			self.last_event_str = '%s UTC' % (event[1].strftime('%Y-%m-%d %H:%M:%S.%f')[:22])
 			printM('Event time: %s' % (self.last_event_str), sender=self.sender)		# show event time in the logs
 			if self.screencap:
@@ -208,12 +214,7 @@ class Plot:
 							fontsize=14, color=self.fgcolor, x=0.52)
 			self.fig.canvas.set_window_title('(%s) %s.%s - Raspberry Shake Monitor' % (self.events, self.net, self.stn))
 
-		if rs.getCHN(d) in self.chans:
-			self.raw = rs.update_stream(
-				stream=self.raw, d=d, fill_value='latest')
-			return True
-		else:
-			return False
+		return False
 		
 	def set_sps(self):
 		'''
@@ -250,7 +251,7 @@ class Plot:
 		Handles a plot close event.
 		This will trigger a full shutdown of all other processes related to rsudp.
 		'''
-		self.master_queue.put(helpers.msg_term())
+		self.master_queue.put(rs.Term())
 
 	def handle_resize(self, evt=False):
 		'''
@@ -307,7 +308,7 @@ class Plot:
 		printM('Saved %s' % (figname), sender=self.sender)
 		printM('%s thread has saved an image, sending IMGPATH message to queues' % self.sender, sender=self.sender)
 		# imgpath requires a UTCDateTime and a string figure path
-		self.master_queue.put(helpers.msg_imgpath(event_time, figname))
+		self.master_queue.put(rs.ImgPath(event_time, figname))
 
 
 	def _set_fig_title(self):
@@ -619,8 +620,7 @@ class Plot:
 			i = 0
 		else:
 			i += 1
-		self.stream = rs.copy(self.stream)	# essential, otherwise the stream has a memory leak
-		self.raw = rs.copy(self.raw)		# and could eventually crash the machine
+		self.raw = to_stream(self.buffers, fill_value='latest')
 		self.deconvolve()
 		self.update_plot()
 		if u >= 0:				# avoiding a matplotlib broadcast error
@@ -661,6 +661,7 @@ class Plot:
 		for i in range((self.totchns)*2): # fill up a stream object
 			self.getq()
 		self.set_sps()
+		self.raw = to_stream(self.buffers, fill_value='latest')
 		self.deconvolve()
 		self.setup_plot()
 
@@ -1,5 +1,5 @@
 import sys
-from rsudp.raspberryshake import ConsumerThread
+from rsudp.raspberryshake import ConsumerThread, Packet, Message, Alarm, Term
 from rsudp import printM, printW, printE
 from rsudp.test import TEST
 
@@ -14,6 +14,8 @@ class PrintRaw(ConsumerThread):
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
 	"""
 
+	aio = 'inline'	# see rsudp.raspberryshake.ConsumerThread
+
 	def __init__(self, q=False, testing=False):
 		"""
 		Initializing the data printing process.
@@ -34,24 +36,39 @@ class PrintRaw(ConsumerThread):
 
 		printM('Starting.', self.sender)
 
+	def process(self, d):
+		"""
+		.. versionadded:: 1.1.2
+
+		Prints one item from the queue to stdout.
+		Sets ``self.alive`` to ``False`` if it is a ``TERM`` message.
+
+		:param d: the queue item
+		:type d: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+		"""
+		if isinstance(d, Packet):
+			d = d.raw			# print the packet as it was received
+		elif isinstance(d, Term):
+			self.alive = False
+			return
+		elif isinstance(d, Alarm):
+			return
+		elif isinstance(d, Message):
+			d = bytes(d)
+		if not self.testing:
+			print(str(d))
+		else:
+			TEST['c_print'][1] = True
+		sys.stdout.flush()
+
 	def run(self):
 		"""
 		Reads data from the queue and print to stdout.
 		"""
-		while True:
+		while self.alive:
 			d = self.queue.get()
 			self.queue.task_done()
-			if 'TERM' in str(d):
-				self.alive = False
-				printM('Exiting.', self.sender)
-				sys.exit()
-			elif 'ALARM' in str(d):
-				pass
-			else:
-				if not self.testing:
-					print(str(d))
-				else:
-					TEST['c_print'][1] = True
-			sys.stdout.flush()
+			self.process(d)
 
-		self.alive = False
\ No newline at end of file
+		printM('Exiting.', self.sender)
+		sys.exit()
\ No newline at end of file
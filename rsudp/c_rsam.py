@@ -1,16 +1,78 @@
 import sys, os, time
 import socket as s
 from datetime import timedelta
-import statistics
+import numpy as np
 from rsudp import printM, printW, printE
 from rsudp import helpers
 import rsudp.raspberryshake as rs
+from rsudp.buffer import ChannelBuffer
+from rsudp.rsam_store import RSAMStore
 from rsudp import COLOR
 from rsudp.test import TEST
 
 # set the terminal text color to green
 COLOR['current'] = COLOR['green']
 
+
+class SpectralBands:
+	'''
+	.. versionadded:: 1.1.2
+
+	Band-limited amplitudes (spectral seismic amplitude measurement, or SSAM)
+	from one real FFT of a window of data.
+
+	The taper, the frequency of each FFT bin, and which bins fall in each band
+	are worked out once for a given window length, so each call is a taper,
+	one :py:func:`numpy.fft.rfft`, and one matrix product
+	however many bands there are, rather than one bandpass filter per band.
+	Each band's value is the RMS amplitude of the part of the signal in that band
+	(by Parseval's theorem, corrected for the Hann taper), in the same units as the data.
+
+	:param list bands: frequency bands in Hz, each in the format ``[low, high]``
+	:param float sps: samples per second
+	'''
+	def __init__(self, bands, sps):
+		'''
+		Sets up the bands.
+		'''
+		self.bands = [(float(b[0]), float(b[1])) for b in bands]
+		self.names = ['%g-%g' % b for b in self.bands]
+		self.sps = sps
+		self.n = 0
+
+
+	def _setup(self, n):
+		'''
+		Precomputes the taper and the band weights of each FFT bin for windows of ``n`` samples.
+		'''
+		self.n = n
+		self.taper = np.hanning(n)
+		freqs = np.fft.rfftfreq(n, 1. / self.sps)
+		# one-sided spectrum: every bin but zero (and Nyquist, for even lengths) stands for two
+		fold = np.full(len(freqs), 2.)
+		fold[0] = 1.
+		if n % 2 == 0:
+			fold[-1] = 1.
+		self.weights = np.array([((freqs >= lo) & (freqs < hi)) * fold for lo, hi in self.bands])
+		self.weights /= n * np.sum(self.taper ** 2)
+
+
+	def amplitudes(self, data):
+		'''
+		Returns the RMS amplitude in each band.
+
+		:param numpy.ndarray data: the window of data
+		:rtype: list
+		:return: the amplitude in each band, in the order the bands were given
+		'''
+		if len(data) != self.n:
+			self._setup(len(data))
+		x = np.asarray(data, dtype=np.float64)
+		spec = np.fft.rfft((x - x.mean()) * self.taper)
+		power = spec.real ** 2 + spec.imag ** 2
+		return np.sqrt(self.weights @ power).tolist()
+
+
 class RSAM(rs.ConsumerThread):
 	"""
 	.. versionadded:: 1.0.1
@@ -29,11 +91,17 @@ class RSAM(rs.ConsumerThread):
 	:param str fwaddr: Specify a forwarding address to send RSAM in a UDP packet
 	:param str fwport: Specify a forwarding port to send RSAM in a UDP packet
 	:param str fwformat: Specify a format for the forwarded packet: ``'LITE'``, ``'JSON'``, or ``'CSV'``
+	:param list bands: frequency bands in Hz (each in the format ``[low, high]``) to also measure the amplitude of (see :py:class:`rsudp.c_rsam.SpectralBands`)
+	:param str store: a directory to keep RSAM values in (see :py:class:`rsudp.rsam_store.RSAMStore`), or ``False``
+
+	.. versionchanged:: 1.1.2 if ``bands`` are given, the RMS amplitude in each band
+		is calculated from one FFT of each interval's data, and added to the
+		printed and forwarded RSAM values.
 	"""
 
 	def __init__(self, q=False, interval=5, cha='HZ', deconv=False,
 				 fwaddr=False, fwport=False, fwformat='LITE', quiet=False,
-				 testing=False,
+				 testing=False, bands=None, store=False,
 				 *args, **kwargs):
 		"""
 		Initializes the RSAM analysis thread.
@@ -59,8 +127,16 @@ class RSAM(rs.ConsumerThread):
 		self._set_deconv(deconv)
 
 		self._set_channel(cha)
+		self.buffer = ChannelBuffer(self.cha, seconds=self.interval)
 
 		self.rsam = [1, 1, 1]
+		self.ssam = SpectralBands(bands, self.buffer.sps) if bands else None
+		self.bandrsam = []
+		if self.ssam:
+			printM('Also measuring amplitudes in frequency bands %s Hz' % (', '.join(self.ssam.names)), self.sender)
+		self.store = RSAMStore(store, self.stn, self.cha) if store else None
+		if self.store:
+			printM('Storing RSAM values in %s' % (self.store.directory), self.sender)
 
 		if q:
 			self.queue = q
@@ -139,11 +215,15 @@ class RSAM(rs.ConsumerThread):
 		"""
 		d = self.queue.get(True, timeout=None)
 		self.queue.task_done()
-		if self.cha in str(d):
-			self.raw = rs.update_stream(stream=self.raw, d=d, fill_value='latest')
-			return True
-		elif 'TERM' in str(d):
+		if isinstance(d, rs.Packet):
+			if d.cha == self.cha:
+				self.buffer.append_packet(d)
+				return True
+			return False
+		elif isinstance(d, rs.Term):
 			self.alive = False
+			if self.store:
+				self.store.close()
 			printM('Exiting.', self.sender)
 			sys.exit()
 		else:
@@ -173,13 +253,26 @@ class RSAM(rs.ConsumerThread):
 	def _rsam(self):
 		"""
 		Run the RSAM analysis
+
+		.. versionchanged:: 1.1.2 the absolute values are summarized with vectorized numpy functions
+			instead of with the :py:mod:`statistics` module over a list of every sample,
+			and gaps in the buffer are left out of the statistics when using counts.
 		"""
-		arr = [abs(el) for el in self.stream[0].data]
-		meanv = statistics.mean(arr)
-		medianv = statistics.median(arr)
-		minv = min(arr)
-		maxv = max(arr)
-		self.rsam = [meanv, medianv, minv, maxv]
+		if self.deconv:
+			arr = np.abs(self.stream[0].data)
+		else:
+			data, mask, start = self.buffer.view()
+			arr = np.abs(data[~mask].astype(np.int64))
+		c = len(arr)
+		if c:
+			arr = np.sort(arr)
+			total = arr.sum().item()
+			# like the statistics module, counts keep an exact mean or middle value as an integer
+			meanv = total // c if (total % c == 0) and not self.deconv else total / c
+			medianv = arr[c // 2].item() if c % 2 else (arr[c // 2 - 1].item() + arr[c // 2].item()) / 2
+			self.rsam = [meanv, medianv, arr[0].item(), arr[-1].item()]
+		if self.ssam:
+			self.bandrsam = self.ssam.amplitudes(self.stream[0].data)
 
 
 	def _print_rsam(self):
@@ -195,20 +288,43 @@ class RSAM(rs.ConsumerThread):
 				self.rsam[2],
 				self.rsam[3]
 			)
+			if self.ssam:
+				msg += ' bands (Hz) %s' % (' '.join('%s %s' % (name, v) for name, v in zip(self.ssam.names, self.bandrsam)))
 			printM(msg, self.sender)
 
+	def _store_rsam(self):
+		"""
+		.. versionadded:: 1.1.2
+
+		Adds the current RSAM analysis to the on-disk store, if there is one,
+		at the time of the end of the analysis window.
+		"""
+		if self.store:
+			self.store.append(self.stream[0].stats.endtime, self.rsam)
+
+
 	def _forward_rsam(self):
 		"""
 		Send the RSAM analysis via UDP to another destination in a lightweight format
+
+		.. versionchanged:: 1.1.2 band amplitudes, if any, are added to the end of the message:
+			as ``|<low>-<high>:<value>`` fields in LITE format, as a ``"bands"`` object in JSON format,
+			and as extra columns in CSV format.
 		"""
 		if self.sock:
+			bands = list(zip(self.ssam.names, self.bandrsam)) if self.ssam else []
 			msg = 'stn:%s|ch:%s|mean:%s|med:%s|min:%s|max:%s' % (self.stn, self.cha, self.rsam[0], self.rsam[1], self.rsam[2], self.rsam[3])
-			if self.fwformat is 'JSON':
-				msg = '{"station":"%s","channel":"%s","mean":%s,"median":%s,"min":%s,"max":%s}' \
+			msg += ''.join('|%s:%s' % b for b in bands)
+			if self.fwformat == 'JSON':
+				msg = '{"station":"%s","channel":"%s","mean":%s,"median":%s,"min":%s,"max":%s' \
 					  % (self.stn, self.cha, self.rsam[0], self.rsam[1], self.rsam[2], self.rsam[3])
-			elif self.fwformat is 'CSV':
+				if bands:
+					msg += ',"bands":{%s}' % (','.join('"%s":%s' % b for b in bands))
+				msg += '}'
+			elif self.fwformat == 'CSV':
 				msg = '%s,%s,%s,%s,%s,%s' \
 					  % (self.stn, self.cha, self.rsam[0], self.rsam[1], self.rsam[2], self.rsam[3])
+				msg += ''.join(',%s' % b[1] for b in bands)
 			packet = bytes(msg, 'utf-8')
 			self.sock.sendto(packet, (self.fwaddr, self.fwport))
 
@@ -242,20 +358,15 @@ class RSAM(rs.ConsumerThread):
 		while True:
 			self._subloop()
 
-			self.raw = rs.copy(self.raw)  # necessary to avoid memory leak
-			self.stream = self.raw.copy()
-			self._deconvolve()
-
 			if n > wait_pkts:
-				# if the trigger is activated
-				obstart = self.stream[0].stats.endtime - timedelta(seconds=self.interval)  # obspy time
-				self.raw = self.raw.slice(starttime=obstart)  # slice the stream to the specified length (seconds variable)
-				self.stream = self.stream.slice(starttime=obstart)  # slice the stream to the specified length (seconds variable)
-
 				# run rsam analysis
 				if time.time() > next_int:
+					# the buffer only ever holds the last interval, so no slicing or copying is needed
+					self.raw = rs.Stream([self.buffer.trace(fill_value='latest')])
+					self.stream = self.raw
+					self._deconvolve()
 					self._rsam()
-					self.stream = rs.copy(self.stream)  # prevent mem leak
+					self._store_rsam()
 					self._forward_rsam()
 					self._print_rsam()
 					next_int = time.time() + self.interval
@@ -30,6 +30,9 @@ class Telegrammer(rs.ConsumerThread):
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
 
 	'''
+
+	aio = 'executor'	# see rsudp.raspberryshake.ConsumerThread
+
 	def __init__(self, token, chat_id, testing=False,
 				 q=False, send_images=False, extra_text=False,
 				 sender='Telegram'):
@@ -71,10 +74,8 @@ class Telegrammer(rs.ConsumerThread):
 		d = self.queue.get()
 		self.queue.task_done()
 
-		if 'TERM' in str(d):
-			self.alive = False
-			printM('Exiting.', self.sender)
-			sys.exit()
+		if isinstance(d, rs.Packet):
+			return None		# data packets are of no use to this module
 		else:
 			return d
 
@@ -83,9 +84,9 @@ class Telegrammer(rs.ConsumerThread):
 		'''
 		Send a telegram in an alert scenario.
 
-		:param bytes d: queue message
+		:param rsudp.raspberryshake.Message d: queue message
 		'''
-		event_time = helpers.fsec(helpers.get_msg_time(d))
+		event_time = helpers.fsec(d.time)
 		self.last_event_str = '%s' % (event_time.strftime(self.fmt)[:22])
 		message = '%s %s UTC%s - %s' % (self.message0, self.last_event_str, self.extra_text, self.livelink)
 		response = None
@@ -112,6 +113,7 @@ class Telegrammer(rs.ConsumerThread):
 			except Exception as e:
 				printE('Could not send alert - %s' % (e))
 				response = None
+		printM('Alarm-to-notification latency: %.3f s' % (d.latency()), sender=self.sender)
 		self.last_message = message
 
 
@@ -119,10 +121,10 @@ class Telegrammer(rs.ConsumerThread):
 		'''
 		Send a telegram image in when you get an ``IMGPATH`` message.
 
-		:param bytes d: queue message
+		:param rsudp.raspberryshake.Message d: queue message
 		'''
 		if self.send_images:
-			imgpath = helpers.get_msg_path(d)
+			imgpath = d.path
 			response = None
 			if os.path.exists(imgpath):
 				with open(imgpath, 'rb') as image:
@@ -158,11 +160,28 @@ class Telegrammer(rs.ConsumerThread):
 		"""
 		Reads data from the queue and sends a message if it sees an ALARM or IMGPATH message
 		"""
-		while True:
-			d = self.getq()
+		while self.alive:
+			self.process(self.getq())
+
+		printM('Exiting.', self.sender)
+		sys.exit()
+
+	def process(self, d):
+		'''
+		.. versionadded:: 1.1.2
+
+		Acts on one item from the queue: sends a message for ``ALARM``
+		and ``IMGPATH`` messages, and sets ``self.alive`` to ``False``
+		for a ``TERM`` message.
+
+		:param d: the queue item
+		:type d: rsudp.raspberryshake.Message or NoneType
+		'''
+		if isinstance(d, rs.Term):
+			self.alive = False
 
-			if 'ALARM' in str(d):
-				self._when_alarm(d)
+		elif isinstance(d, rs.Alarm):
+			self._when_alarm(d)
 
-			elif 'IMGPATH' in str(d):
-				self._when_img(d)
+		elif isinstance(d, rs.ImgPath):
+			self._when_img(d)
@@ -68,8 +68,9 @@ class Testing(rs.ConsumerThread):
 		'''
 		d = self._getq()
 
-		if rs.getCHN(d) in self.cha:
-			self.stream = rs.update_stream(stream=self.stream, d=d, fill_value='latest')
+		if isinstance(d, rs.Packet):
+			if d.cha in self.cha:
+				self.stream = rs.update_stream(stream=self.stream, d=d, fill_value='latest')
 		else:
 			self._messagetests(d)
 
@@ -78,11 +79,11 @@ class Testing(rs.ConsumerThread):
 		Run tests on a data packet to see if it can be processed into a stream object.
 		If so, mark the data and processing tests passed.
 
-		:param bytes d: a data packet from the queue
+		:param rsudp.raspberryshake.Packet d: a data packet from the queue
 
 		'''
 
-		if rs.getCHN(d) in self.cha:
+		if isinstance(d, rs.Packet) and (d.cha in self.cha):
 			self.stream = rs.update_stream(stream=self.stream, d=d, fill_value='latest')
 			t.TEST['x_processing'][1] = True
 
@@ -91,32 +92,32 @@ class Testing(rs.ConsumerThread):
 		Run tests on a message to see if a specific one has been passed.
 		If so, mark the test passed.
 
-		:param bytes d: a data packet from the queue
+		:param rsudp.raspberryshake.Message d: a message from the queue
 
 		'''
 		global IMGPATH
-		if 'TERM' in str(d):
+		if isinstance(d, rs.Term):
 			printM('Got TERM message...', sender=self.sender)
 			t.TEST['x_TERM'][1] = True
 			self.alive = False
 	
-		elif 'ALARM' in str(d):
+		elif isinstance(d, rs.Alarm):
 			printM('Got ALARM message with time %s' % (
-				   helpers.fsec(helpers.get_msg_time(d))
+				   helpers.fsec(d.time)
 				   ), sender=self.sender)
 			t.TEST['x_ALARM'][1] = True
 
-		elif 'RESET' in str(d):
+		elif isinstance(d, rs.Reset):
 			printM('Got RESET message with time %s' % (
-				   helpers.fsec(helpers.get_msg_time(d))
+				   helpers.fsec(d.time)
 				   ), sender=self.sender)
 			t.TEST['x_RESET'][1] = True
 
-		elif 'IMGPATH' in str(d):
+		elif isinstance(d, rs.ImgPath):
 			printM('Got IMGPATH message with time %s' % (
-				   helpers.fsec(helpers.get_msg_time(d))
+				   helpers.fsec(d.time)
 				   ), sender=self.sender)
-			IMGPATH = helpers.get_msg_path(d)
+			IMGPATH = d.path
 			printM('and path %s' % (IMGPATH), sender=self.sender)
 			t.TEST['x_IMGPATH'][1] = True
 
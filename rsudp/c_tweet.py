@@ -62,6 +62,9 @@ class Tweeter(rs.ConsumerThread):
 
 
 	'''
+
+	aio = 'executor'	# see rsudp.raspberryshake.ConsumerThread
+
 	def __init__(self, consumer_key, consumer_secret, access_token, access_token_secret,
 				 q=False, tweet_images=False, extra_text=False, testing=False,
 				 ):
@@ -110,10 +113,8 @@ class Tweeter(rs.ConsumerThread):
 		d = self.queue.get()
 		self.queue.task_done()
 
-		if 'TERM' in str(d):
-			self.alive = False
-			printM('Exiting.', self.sender)
-			sys.exit()
+		if isinstance(d, rs.Packet):
+			return None		# data packets are of no use to this module
 		else:
 			return d
 
@@ -122,9 +123,9 @@ class Tweeter(rs.ConsumerThread):
 		'''
 		Send a tweet when you get an ``ALARM`` message.
 
-		:param bytes d: queue message
+		:param rsudp.raspberryshake.Message d: queue message
 		'''
-		event_time = helpers.fsec(helpers.get_msg_time(d))
+		event_time = helpers.fsec(d.time)
 		self.last_event_str = '%s' % (event_time.strftime(self.fmt)[:22])
 		message = '%s %s UTC%s - %s' % (self.message0, self.last_event_str, self.extra_text, self.livelink)
 		response = None
@@ -158,6 +159,7 @@ class Tweeter(rs.ConsumerThread):
 				printE('could not send alert tweet - %s' % (e))
 				response = None
 
+		printM('Alarm-to-notification latency: %.3f s' % (d.latency()), sender=self.sender)
 		self.last_message = message
 
 
@@ -166,11 +168,11 @@ class Tweeter(rs.ConsumerThread):
 		'''
 		Send a tweet with an image in when you get an ``IMGPATH`` message.
 
-		:param bytes d: queue message
+		:param rsudp.raspberryshake.Message d: queue message
 		'''
 		if self.tweet_images:
-			imgpath = helpers.get_msg_path(d)
-			imgtime = helpers.fsec(helpers.get_msg_time(d))
+			imgpath = d.path
+			imgtime = helpers.fsec(d.time)
 			message = '%s %s UTC%s' % (self.message1, imgtime.strftime(self.fmt)[:22], self.extra_text)
 			response = None
 			printM('Image tweet: %s' % (message), sender=self.sender)
@@ -220,11 +222,28 @@ class Tweeter(rs.ConsumerThread):
 		"""
 		Reads data from the queue and tweets a message if it sees an ALARM or IMGPATH message
 		"""
-		while True:
-			d = self.getq()
+		while self.alive:
+			self.process(self.getq())
+
+		printM('Exiting.', self.sender)
+		sys.exit()
+
+	def process(self, d):
+		'''
+		.. versionadded:: 1.1.2
+
+		Acts on one item from the queue: sends a message for ``ALARM``
+		and ``IMGPATH`` messages, and sets ``self.alive`` to ``False``
+		for a ``TERM`` message.
+
+		:param d: the queue item
+		:type d: rsudp.raspberryshake.Message or NoneType
+		'''
+		if isinstance(d, rs.Term):
+			self.alive = False
 
-			if 'ALARM' in str(d):
-				self._when_alarm(d)
+		elif isinstance(d, rs.Alarm):
+			self._when_alarm(d)
 
-			elif 'IMGPATH' in str(d):
-				self._when_img(d)
+		elif isinstance(d, rs.ImgPath):
+			self._when_img(d)
@@ -1,11 +1,16 @@
 import sys, os
 import time
-from datetime import timedelta
+import math
 from obspy import UTCDateTime
 import rsudp.raspberryshake as rs
+from rsudp.buffer import ChannelBuffer
+from rsudp.response import StreamDeconvolver
+from rsudp.mseed import FileWriter
 from rsudp import printM, printW, printE, helpers
 from rsudp.test import TEST
 
+DAY_TOL = 1e-3	# the fraction of a sample by which a timestamp may be early and still count as midnight
+
 class Write(rs.ConsumerThread):
 	"""
 	A simple routine to write daily miniSEED data to :code:`output_dir/data`.
@@ -14,8 +19,29 @@ class Write(rs.ConsumerThread):
 	:type cha: str or list
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
 	:param bool debug: whether or not to display messages when writing data to disk.
+	:param deconv: whether to also write the data converted to physical units (see :py:func:`rsudp.c_write.Write._set_deconv`). Defaults to False.
+	:type deconv: str or bool
+	:param float flush: how often to flush the open files, in seconds (0 to flush after every write)
+	:param bool fsync: whether to also sync the files to disk when flushing them
+
+	.. versionchanged:: 1.1.2 added the ``deconv`` parameter.
+
+	.. versionchanged:: 1.1.2 data is encoded by a :py:class:`rsudp.mseed.RecordEncoder`
+		per channel, which appends only full 512-byte records to the file
+		(the last record of each day, or before a gap, is written at the end of the day
+		or when the program exits), instead of writing a new set of partly filled records
+		every few seconds. Gaps in the data are left as gaps rather than written as zeros.
+
+	.. versionchanged:: 1.1.2 encoding and disk writes are done by a :py:class:`rsudp.mseed.FileWriter`
+		thread, which keeps the day's files open (until the end of the day) and flushes them
+		every ``flush`` seconds, so that a slow disk does not hold up reading from the queue.
+
+	.. versionchanged:: 1.1.2 the day each sample is written to is that of its own timestamp,
+		and files are split exactly at UTC midnight, so late data and quickly replayed backlogs
+		end up in the right files.
 	"""
-	def __init__(self, q, data_dir, testing=False, debug=False, cha='all'):
+	def __init__(self, q, data_dir, testing=False, debug=False, cha='all', deconv=False,
+				 flush=10, fsync=False):
 		"""
 		Initialize the process
 		"""
@@ -29,7 +55,6 @@ class Write(rs.ConsumerThread):
 
 		self.queue = q
 
-		self.stream = rs.Stream()
 		self.outdir = os.path.join(data_dir, 'data')
 		self.outfiles = []
 
@@ -41,9 +66,122 @@ class Write(rs.ConsumerThread):
 		self.stime = 1/rs.sps
 		self.inv = rs.inv
 
+		# one buffer per channel, long enough to hold several unwritten write cycles
+		self.buffers = {c: ChannelBuffer(c, seconds=60) for c in self.chans}
+		self.written = {}	# index of the next sample to write, per channel
+		self.late = 0		# samples that filled gaps in data that had already been written
+		self.writer = FileWriter(flush=flush, fsync=fsync, sender=self.sender, debug=self.debug)	# started by run()
+		self._set_deconv(deconv)
+
 		printM('Starting.', self.sender)
 
 
+	def _set_deconv(self, deconv):
+		'''
+		.. versionadded:: 1.1.2
+
+		This function sets the units of the physical unit files that are written alongside the counts.
+		Allowed values are as follows:
+
+		.. |ms2| replace:: m/s\ :sup:`2`\
+
+		- ``'VEL'`` - velocity (m/s)
+		- ``'ACC'`` - acceleration (|ms2|)
+		- ``'GRAV'`` - fraction of acceleration due to gravity (g, or 9.81 |ms2|)
+		- ``'DISP'`` - displacement (m)
+		- ``'CHAN'`` - channel-specific unit calculation, i.e. ``'VEL'`` for geophone channels and ``'ACC'`` for accelerometer channels
+
+		Each geophone and accelerometer channel is converted by a
+		:py:class:`rsudp.response.StreamDeconvolver`, which processes each sample once
+		and produces a continuous series (about 20 to 30 seconds behind the counts).
+
+		:param str deconv: ``'VEL'``, ``'ACC'``, ``'GRAV'``, ``'DISP'``, or ``'CHAN'``
+		'''
+		deconv = deconv.upper() if deconv else False
+		self.deconv = deconv if (deconv in rs.UNITS) else False
+		self.deconvolvers = {}
+		self.dbuffers = {}
+		self.dwritten = {}
+		if self.deconv and not rs.inv:
+			printW('No inventory found, so only counts will be written.', self.sender)
+			self.deconv = False
+		if not self.deconv:
+			return
+		for cha in self.chans:
+			if cha in ['EHE', 'EHN', 'EHZ', 'SHZ']:		# geophone channels
+				output = 'VEL' if self.deconv == 'CHAN' else self.deconv
+			elif cha in ['ENE', 'ENN', 'ENZ']:			# accelerometer channels
+				output = 'ACC' if self.deconv == 'CHAN' else self.deconv
+			else:
+				continue
+			try:
+				self.deconvolvers[cha] = StreamDeconvolver('%s.%s.00.%s' % (rs.net, rs.stn, cha),
+														   output=output, inventory=rs.inv)
+			except Exception as e:
+				printW('Could not find the response of %s, so only counts will be written for it (%s)'
+					   % (cha, e), self.sender)
+				continue
+			# long enough to hold a whole block of output on top of the unwritten samples
+			self.dbuffers[cha] = ChannelBuffer(cha, seconds=60 + self.deconvolvers[cha].block / rs.sps,
+											   dtype=rs.np.float64)
+			printM('Also writing %s in %s' % (cha, output), self.sender)
+
+
+	def _deconvolve(self, d):
+		'''
+		.. versionadded:: 1.1.2
+
+		Passes a packet to its channel's :py:class:`rsudp.response.StreamDeconvolver`
+		and stores any output that is ready.
+
+		:param rsudp.raspberryshake.Packet d: the data packet
+		'''
+		if d.cha in self.deconvolvers:
+			try:
+				out = self.deconvolvers[d.cha].process(d.data, d.time)
+			except Exception as e:
+				printW('Could not find the response of %s at %s, so only counts will be written for it (%s)'
+					   % (d.cha, UTCDateTime(d.time), e), self.sender)
+				del self.deconvolvers[d.cha], self.dbuffers[d.cha]
+				return
+			for t, data in out:
+				self.dbuffers[d.cha].append(t, data)
+
+
+	def _append(self, d):
+		'''
+		.. versionadded:: 1.1.2
+
+		Adds a packet to its channel's buffer.
+		Samples that fill a gap in data that has already been written
+		are written straight away (the :py:class:`rsudp.mseed.RecordEncoder` ends a record
+		at each discontinuity, so they go in records of their own) and counted in ``late``;
+		samples that were already written are not written again.
+
+		:param rsudp.raspberryshake.Packet d: the data packet
+		'''
+		buf = self.buffers[d.cha]
+		written = self.written.get(d.cha)
+		if written is None:
+			buf.append_packet(d)
+			return
+		start = max(buf.index(d.time), buf.tail)
+		end = min(buf.index(d.time) + len(d.data), written)
+		gaps = buf.view(start, end)[1].copy() if end > start else None
+		buf.append_packet(d)
+		if (gaps is None) or (not gaps.any()):
+			return
+		n = int(gaps.sum())
+		if self.late == 0:
+			printW('Writing samples that arrived after the data around them was written '
+				   '(further late samples will be counted silently).', self.sender)
+		self.late += n
+		for a, b in self._days(buf, max(start, buf.tail), end):
+			tr = buf.trace(start=a, end=b)
+			tr.data = rs.np.ma.masked_array(rs.np.ma.getdata(tr.data), mask=~gaps[a-start:b-start])
+			self._tracewrite(tr)
+
+
 	def getq(self):
 		'''
 		Reads data from the queue and updates the stream.
@@ -53,113 +191,190 @@ class Write(rs.ConsumerThread):
 		'''
 		d = self.queue.get(True, timeout=None)
 		self.queue.task_done()
-		if 'TERM' in str(d):
-			self.alive = False
-			printM('Exiting.', self.sender)
-			sys.exit()
-		elif str(d.decode('UTF-8')).split(' ')[0] in ['ALARM', 'RESET', 'IMGPATH']:
-			pass
-		else:
-			if rs.getCHN(d) in self.chans:
-				self.stream = rs.update_stream(
-					stream=self.stream, d=d, fill_value=None)
+		if isinstance(d, rs.Packet):
+			if d.cha in self.chans:
+				self._append(d)
+				self._deconvolve(d)
 				return True
 			else:
 				return False
+		elif isinstance(d, rs.Term):
+			self.alive = False
+			# the deconvolvers hold back their last few seconds of output until they are flushed
+			for cha, sd in self.deconvolvers.items():
+				for t, data in sd.flush():
+					self.dbuffers[cha].append(t, data)
+			self.write(flush=True)
+			if self.late:
+				printW('%s samples arrived after the data around them was written, '
+					   'and were written in records of their own.' % (self.late), self.sender)
+			printM('Exiting.', self.sender)
+			sys.exit()
 	
 	def set_sps(self):
 		'''
 		Sets samples per second.
 		'''
-		self.sps = self.stream[0].stats.sampling_rate
+		self.sps = rs.sps
 
-	def elapse(self, new=False):
+	def _outfile(self, net, stn, cha, t, unit=None):
 		'''
-		Ticks self variables over into a new day for file naming purposes.
+		.. versionadded:: 1.1.2
 
-		:param bool new: If ``False``, the program is starting. If ``True``, the UTC date just elapsed.
-		'''
-		self.st = UTCDateTime.now()
-		self.y, self.m, self.d = self.st.year, self.st.month, self.st.day
-		self.j = self.st.strftime('%j')
-		self.newday = UTCDateTime(self.y, self.m, self.d, 0, 0) + timedelta(days=1.1)
-		self.newday = UTCDateTime(self.newday.year, self.newday.month, self.newday.day, 0, 0)
-		if new:
-			self.last = self.newday
-		else:
-			self.last = self.st
+		Returns the name of the file for a channel's data on the UTC day of a sample.
 
-	def slicestream(self):
-		'''
-		Causes the stream to slice down to the time the last write operation was made.
+		:param str net: the network code
+		:param str stn: the station code
+		:param str cha: the channel code
+		:param float t: the time of the sample
+		:param str unit: the physical unit of the data, if it is not in counts
+		:rtype: str
 		'''
-		self.stream.slice(starttime=self.last)
+		day = UTCDateTime(t)
+		outfile = self.outdir + '/%s.%s.00.%s.D.%s.%s' % (net, stn, cha, day.year, day.strftime('%j'))
+		if unit:
+			outfile += '.%s' % (unit)
+		if not outfile in self.outfiles:
+			self.outfiles.append(outfile)
+		return outfile
 
-	def _tracewrite(self, t):
+
+	def _tracewrite(self, t, unit=None):
 		'''
 		Processing for the :py:func:`rsudp.c_write.Write.write` function.
-		Writes an input trace to disk.
+		Queues an input trace to be written to disk.
+
+		.. versionchanged:: 1.1.2 added the ``unit`` parameter.
+
+		.. versionchanged:: 1.1.2 the trace is passed to the :py:class:`rsudp.mseed.FileWriter` thread
+			to be encoded and written, and masked gaps are skipped instead of being filled with zeros.
 
 		:type t: obspy.core.trace.Trace
 		:param t: The trace segment to write to disk.
+		:param str unit: if the trace is in physical units, the unit (for example ``'VEL'``), which is appended to the file name. The data is then written as 32-bit floats.
 
 		'''
-		enc = 'STEIM2'	# encoding
-		if isinstance(t.data, rs.np.ma.masked_array):
-			t.data = t.data.filled(fill_value=0) # fill array (to avoid obspy write error)
-		outfile = self.outdir + '/%s.%s.00.%s.D.%s.%s' % (t.stats.network,
-							t.stats.station, t.stats.channel, self.y, self.j)
-		if not outfile in self.outfiles:
-			self.outfiles.append(outfile)
-		if os.path.exists(os.path.abspath(outfile)):
-			with open(outfile, 'ab') as fh:
-				t.write(fh, format='MSEED', encoding=enc)
-				if self.debug:
-					printM('%s records to %s'
-							% (len(t.data), outfile), self.sender)
+		key = (t.stats.channel, unit)
+		header = {'network': t.stats.network, 'station': t.stats.station, 'location': '00',
+				  'channel': t.stats.channel, 'sampling_rate': t.stats.sampling_rate}
+		enc = 'FLOAT32' if unit else 'STEIM2'
+		outfile = self._outfile(t.stats.network, t.stats.station, t.stats.channel,
+								float(t.stats.starttime) + t.stats.delta * DAY_TOL, unit)
+		# the trace is a view of the buffer, so the writer thread gets copies
+		data = rs.np.ma.getdata(t.data)
+		valid = ~rs.np.ma.getmaskarray(t.data)
+		t0 = float(t.stats.starttime)
+		if valid.all():
+			self.writer.add(key, outfile, header, enc, t0, data.copy())
 		else:
-			t.write(outfile, format='MSEED', encoding=enc)
-			if self.debug:
-				printM('%s records to new file %s'
-						% (len(t.data), outfile), self.sender)
+			# the starts and ends of each run of data between gaps
+			edges = rs.np.flatnonzero(rs.np.diff(rs.np.concatenate(([0], valid.view(rs.np.int8), [0]))))
+			for a, b in zip(edges[::2], edges[1::2]):
+				self.writer.add(key, outfile, header, enc, t0 + a * t.stats.delta, data[a:b].copy())
 
 
-	def write(self, stream=False):
+	@staticmethod
+	def _days(buf, start, end):
 		'''
-		Writes a segment of the stream to disk as miniSEED, and appends it to the
-		file in question. If there is no file (i.e. if the program is just starting
-		or a new UTC day has just started, then this function writes to a new file).
+		.. versionadded:: 1.1.2
 
-		:type stream: obspy.core.stream.Stream or bool
-		:param stream: The stream segment to write. If ``False``, the program has just started.
+		Splits a range of buffer indices at UTC midnight,
+		so that each sample goes in the file for the day of its own timestamp.
+
+		:param rsudp.buffer.ChannelBuffer buf: the buffer
+		:param int start: the index of the first sample
+		:param int end: the index one past the last sample
+		:rtype: list
+		:return: ``(start, end)`` index ranges, one for each UTC day
+		'''
+		tol = buf.delta * DAY_TOL
+		days = []
+		while start < end:
+			midnight = (math.floor((buf.time(start) + tol) / 86400.) + 1) * 86400.
+			# the first sample at or after midnight
+			split = max(min(math.ceil((midnight - tol - buf.t0) * buf.sps), end), start + 1)
+			days.append((start, split))
+			start = split
+		return days
+
+
+	def write(self, endtime=False, flush=False):
 		'''
-		if not stream:
-			self.last = self.stream[0].stats.endtime - timedelta(seconds=5)
-			stream = self.stream.copy().slice(
-						endtime=self.last, nearest_sample=False)
+		Writes the samples received since the last write operation to disk as miniSEED,
+		and appends them to the file in question. If there is no file (i.e. if the program
+		is just starting or a new UTC day has just started, then this function writes to a new file).
 
-		for t in stream:
-			self._tracewrite(t)
+		.. versionchanged:: 1.1.2 added the ``flush`` parameter.
+
+		.. versionchanged:: 1.1.2 samples are split at UTC midnight by their own timestamps
+			(see :py:func:`_days`), so each one goes in the file for its day
+			instead of by the computer's clock. Samples that arrive after this has written
+			the data around them are written by :py:func:`_append`.
+
+		:type endtime: obspy.core.utcdatetime.UTCDateTime or bool
+		:param endtime: Write samples up to (not including) this time. If ``False``, write up to 5 seconds before the newest sample (or up to the newest sample, if flushing).
+		:param bool flush: whether to also write the last, partly filled records and close the files (when exiting)
+		'''
+		for cha, buf in self.buffers.items():
+			if buf.t0 is None:
+				continue
+			if endtime:
+				end = min(buf.index(endtime), buf.head)
+			else:
+				end = buf.head if flush else buf.head - int(5 * buf.sps)
+			start = max(self.written.get(cha, buf.tail), buf.tail)
+			if end > start:
+				for a, b in self._days(buf, start, end):
+					self._tracewrite(buf.trace(start=a, end=b))
+				self.written[cha] = end
+		for cha, buf in self.dbuffers.items():
+			if buf.t0 is None:
+				continue
+			# deconvolved samples are final as soon as they are output
+			end = min(buf.index(endtime), buf.head) if endtime else buf.head
+			start = max(self.dwritten.get(cha, buf.tail), buf.tail)
+			if end > start:
+				for a, b in self._days(buf, start, end):
+					self._tracewrite(buf.trace(start=a, end=b), unit=self.deconvolvers[cha].output)
+				self.dwritten[cha] = end
+		if flush:
+			self.writer.flush_records()
+			self.writer.close_files()
 		if self.testing:
 			TEST['c_write'][1] = True
 
 	def run(self):
 		"""
 		Reads packets and coordinates write operations.
+
+		.. versionchanged:: 1.1.2 files are switched to the next day by the data's timestamps
+			(see :py:func:`write`), not by the computer's clock.
+
+		.. versionchanged:: 1.1.2 the :py:class:`rsudp.mseed.FileWriter` thread is started here,
+			and stopped (after writing everything still queued) when this thread exits for any reason.
 		"""
-		self.elapse()
+		self.writer.start()
+		try:
+			self._run()
+		finally:
+			self.writer.stop()
 
+
+	def _run(self):
+		"""
+		.. versionadded:: 1.1.2
+
+		The read and write loop of :py:func:`run`.
+		"""
 		self.getq()
 		self.set_sps()
 		self.getq()
 		printM('miniSEED output directory: %s' % (self.outdir), self.sender)
 		if self.inv:
 			printM('Writing inventory file: %s/%s.%s.00.xml' % (self.outdir,
-					self.stream[0].stats.network,
-					self.stream[0].stats.station), self.sender)
+					rs.net, rs.stn), self.sender)
 			self.inv.write('%s/%s.%s.00.xml' % (self.outdir,
-					self.stream[0].stats.network,
-					self.stream[0].stats.station),
+					rs.net, rs.stn),
 					format='STATIONXML')
 		printM('Beginning miniSEED output.', self.sender)
 		wait_pkts = (self.numchns * 10) / (rs.tf / 1000) 	# comes out to 10 seconds (tf is in ms)
@@ -176,17 +391,7 @@ class Write(rs.ConsumerThread):
 					n += 1
 					break
 			if n >= wait_pkts:
-				if self.newday < UTCDateTime.now(): # end of previous day and start of new day
-					self.write(self.stream.slice(
-								endtime=self.newday, nearest_sample=False))
-					self.stream = self.stream.slice(
-								starttime=self.newday, nearest_sample=False)
-					self.elapse(new=True)
-				else:
-					self.write()
-					self.stream = self.stream.slice(
-								starttime=self.last, nearest_sample=False)
-				self.stream = rs.copy(self.stream)
+				self.write()
 				n = 0
 
 				self.getq()
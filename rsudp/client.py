@@ -5,14 +5,17 @@ import time
 import json
 import traceback
 from queue import Queue
+from threading import Thread
 from rsudp import printM, printW, printE, default_loc, init_dirs, settings_loc, add_debug_handler, start_logging
 from rsudp import COLOR
 import rsudp.helpers as H
 import rsudp.test as T
 import rsudp.raspberryshake as rs
 from rsudp.packetize import packetize
+from rsudp.ring import BroadcastRing, RingReader
 from rsudp.c_consumer import Consumer
 from rsudp.p_producer import Producer
+from rsudp.aio import Runtime
 from rsudp.c_printraw import PrintRaw
 from rsudp.c_write import Write
 from rsudp.c_plot import Plot, MPL
@@ -23,12 +26,15 @@ from rsudp.c_custom import Custom
 from rsudp.c_tweet import Tweeter
 from rsudp.c_telegram import Telegrammer
 from rsudp.c_rsam import RSAM
+from rsudp.c_groundmotion import GroundMotion
 from rsudp.c_testing import Testing
 from rsudp.t_testdata import TestData
 import pkg_resources as pr
 
 
 DESTINATIONS, THREADS = [], []
+RING = False
+ASYNC = False
 PROD = False
 PLOTTER = False
 TELEGRAM = False
@@ -76,16 +82,63 @@ def test_mode(mode=None):
 	return TESTING
 
 
-def mk_q():
+def mk_ring():
 	'''
-	Makes a queue and appends it to the :py:data:`destinations`
-	variable to be passed to the master consumer thread
-	:py:class:`rsudp.c_consumer.Consumer`.
+	.. versionadded:: 1.1.2
 
-	:rtype: queue.Queue
-	:return: Returns the queue to pass to the sub-consumer.
+	Makes the :py:class:`rsudp.ring.BroadcastRing` that the master consumer
+	thread :py:class:`rsudp.c_consumer.Consumer` writes to,
+	if it does not already exist.
+
+	:rtype: rsudp.ring.BroadcastRing
+	:return: Returns the ring.
+	'''
+	global RING
+	if not RING:
+		RING = BroadcastRing(rs.qsize, overrun=rs.overrun)
+	return RING
+
+def _match_channels(cha):
+	'''
+	Finds the available channels matching a channel setting,
+	the same way :py:func:`rsudp.helpers.set_channels` does.
+	Returns ``None`` (meaning all channels) if the setting is ``"all"``
+	or nothing matches, since modules fall back to all channels in that case.
+	'''
+	if (cha is None) or ('all' in cha):
+		return None
+	cha = [cha] if isinstance(cha, str) else cha
+	chans = [c for c in rs.chns if any(uch.upper() in c for uch in cha)]
+	return chans if chans else None
+
+def mk_q(channels=None, messages=None):
 	'''
-	q = Queue(rs.qsize)
+	Makes a reader on the master consumer thread's
+	(:py:class:`rsudp.c_consumer.Consumer`) broadcast ring,
+	and appends it to the :py:data:`destinations` variable.
+
+	.. versionchanged:: 1.1.2 returns a :py:class:`rsudp.ring.RingReader`
+		instead of a :py:class:`queue.Queue`. Readers work like queues
+		for the purposes of a sub-consumer.
+
+	.. versionchanged:: 1.1.2 added the ``channels`` and ``messages`` subscription
+		parameters, so that a module is only woken up by packets and messages it uses.
+
+	.. code-block:: python
+
+		>>> # a module that uses vertical channel data and ALARM messages
+		>>> q = mk_q(channels=['HZ'], messages=(rs.Alarm,))
+
+	:param channels: the channel setting of the module (as in the settings file; ``None`` or ``"all"`` for all channels, an empty list for no data)
+	:type channels: list or str or NoneType
+	:param messages: the control message types the module uses (``None`` for all). ``TERM`` is always delivered.
+	:type messages: tuple or NoneType
+	:rtype: rsudp.ring.RingReader
+	:return: Returns the reader to pass to the sub-consumer.
+	'''
+	if channels != []:
+		channels = _match_channels(channels)
+	q = mk_ring().reader(channels=channels, messages=messages)
 	DESTINATIONS.append(q)
 	return q
 
@@ -95,6 +148,8 @@ def mk_p(proc):
 
 	:param threading.Thread proc: The process thread to append to the list of threads.
 	'''
+	if isinstance(getattr(proc, 'queue', None), RingReader):
+		proc.queue.name = proc.sender	# so that overrun warnings name the consumer
 	THREADS.append(proc)
 
 
@@ -103,9 +158,11 @@ def start():
 	Start Consumer, Threads, and Producer.
 	'''
 	global PROD, PLOTTER, THREADS, DESTINATIONS
+	if ASYNC:
+		return start_aio()
 	# master queue and consumer
 	queue = Queue(rs.qsize)
-	cons = Consumer(queue, DESTINATIONS, testing=TESTING)
+	cons = Consumer(queue, mk_ring(), testing=TESTING)
 	cons.start()
 
 	for thread in THREADS:
@@ -129,6 +186,33 @@ def start():
 	PROD.stop = True
 
 
+def start_aio():
+	'''
+	.. versionadded:: 1.1.2
+
+	Start the asyncio runtime (:py:class:`rsudp.aio.Runtime`) in place of
+	the Consumer and Producer threads. Lightweight modules run on the
+	runtime's event loop, and the rest are started as threads.
+	'''
+	global PROD
+	rt = Runtime(mk_ring(), THREADS, testing=TESTING)
+	PROD = rt.producer
+
+	if PLOTTER and MPL:
+		# the plotter must have the main thread, so the event loop gets its own
+		loop = Thread(target=rt.run, name='Runtime')
+		loop.start()
+		# the runtime takes the place of the master queue
+		PLOTTER.master_queue = rt
+		PLOTTER.run()
+		loop.join()
+	else:
+		rt.run()
+
+	time.sleep(0.5) # give threads time to exit
+	PROD.stop = True
+
+
 def run(settings, debug):
 	'''
 	Main setup function. Takes configuration values and passes them to
@@ -137,7 +221,7 @@ def run(settings, debug):
 	:param dict settings: settings dictionary (see :ref:`defaults` for guidance)
 	:param bool debug: whether or not to show debug output (should be turned off if starting as daemon)
 	'''
-	global PLOTTER, SOUND
+	global PLOTTER, SOUND, ASYNC
 	# handler for the exit signal
 	signal.signal(signal.SIGINT, handler)
 
@@ -149,8 +233,12 @@ def run(settings, debug):
 		tdata.start()
 
 	# initialize the central library
+	try:
+		rbuf = settings['settings']['rcvbuf']
+	except KeyError:
+		rbuf = 0	# settings files from before 1.1.2 do not have this
 	rs.initRSlib(dport=settings['settings']['port'],
-				 rsstn=settings['settings']['station'])
+				 rsstn=settings['settings']['station'], rbuf=rbuf)
 
 	H.conn_stats(TESTING)
 	if TESTING:
@@ -163,6 +251,15 @@ def run(settings, debug):
 
 
 	output_dir = settings['settings']['output_dir']
+	try:
+		rs.overrun = settings['settings']['queue_overrun']
+	except KeyError:
+		pass	# settings files from before 1.1.2 do not have this
+	try:
+		ASYNC = settings['settings']['asyncio']
+	except KeyError:
+		pass	# settings files from before 1.1.2 do not have this
+	mk_ring()
 
 
 	if settings['printdata']['enabled']:
@@ -175,9 +272,24 @@ def run(settings, debug):
 		global WRITER
 		# set up queue and process
 		cha = settings['write']['channels']
-		q = mk_q()
+		try:
+			if settings['write']['deconvolve']:
+				if settings['write']['units'].upper() in rs.UNITS:
+					deconv = settings['write']['units'].upper()
+				else:
+					deconv = 'CHAN'
+			else:
+				deconv = False
+		except KeyError:
+			deconv = False	# settings files from before 1.1.2 do not have this
+		try:
+			flush, fsync = settings['write']['flush'], settings['write']['fsync']
+		except KeyError:
+			flush, fsync = 10, False	# settings files from before 1.1.2 do not have these
+		q = mk_q(channels=cha, messages=())
 		WRITER = Write(q=q, data_dir=output_dir,
-					   cha=cha, testing=TESTING)
+					   cha=cha, deconv=deconv, testing=TESTING,
+					   flush=flush, fsync=fsync)
 		mk_p(WRITER)
 
 	if settings['plot']['enabled'] and MPL:
@@ -201,7 +313,7 @@ def run(settings, debug):
 				deconv = 'CHAN'
 		else:
 			deconv = False
-		pq = mk_q()
+		pq = mk_q(channels=cha, messages=(rs.Alarm,))
 		PLOTTER = Plot(cha=cha, seconds=sec, spectrogram=spec,
 						fullscreen=full, kiosk=kiosk, deconv=deconv, q=pq,
 						screencap=screencap, alert=alert, testing=TESTING)
@@ -218,7 +330,8 @@ def run(settings, debug):
 		if len(addr) == len(port):
 			printM('Initializing %s Forward threads' % (len(addr)), sender=SENDER)
 			for i in range(len(addr)):
-				q = mk_q()
+				q = mk_q(channels=cha if fwd_data else [],
+						 messages=(rs.Alarm, rs.Reset) if fwd_alarms else ())
 				forward = Forward(num=i, addr=addr[i], port=int(port[i]), cha=cha,
 								  fwd_data=fwd_data, fwd_alarms=fwd_alarms,
 								  q=q, testing=TESTING)
@@ -244,11 +357,26 @@ def run(settings, debug):
 		else:
 			deconv = False
 
+		try:
+			coinc = settings['alert']['coincidence_channels']
+			coinc_sum = settings['alert']['coincidence_sum']
+			coinc_window = settings['alert']['coincidence_window']
+			coinc_weights = settings['alert']['coincidence_weights']
+		except KeyError:
+			# settings files from before 1.1.2 do not have these
+			coinc, coinc_sum, coinc_window, coinc_weights = [], 2, 5, {}
+		try:
+			detectors = settings['alert']['detectors']
+		except KeyError:
+			detectors = []	# settings files from before 1.1.2 do not have this
+
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(channels=[cha] + list(coinc), messages=())
 		alrt = Alert(sta=sta, lta=lta, thresh=thresh, reset=reset, bp=bp,
 					 cha=cha, debug=debug, q=q, testing=TESTING,
-					 deconv=deconv)
+					 deconv=deconv, coinc=coinc, coinc_sum=coinc_sum,
+					 coinc_window=coinc_window, coinc_weights=coinc_weights,
+					 detectors=detectors)
 		mk_p(alrt)
 
 	if settings['alertsound']['enabled']:
@@ -256,7 +384,7 @@ def run(settings, debug):
 		if soundloc in ['doorbell', 'alarm', 'beeps', 'sonar']:
 			soundloc = pr.resource_filename('rsudp', os.path.join('rs_sounds', '%s.mp3' % soundloc))
 
-		q = mk_q()
+		q = mk_q(channels=[], messages=(rs.Alarm,))
 		alsnd = AlertSound(q=q, testing=TESTING, soundloc=soundloc)
 		mk_p(alsnd)
 
@@ -281,7 +409,7 @@ def run(settings, debug):
 			raise KeyError(e)
 	if runcustom:
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(channels=[], messages=(rs.Alarm,))
 		cstm = Custom(q=q, codefile=f, win_ovr=win_ovr, testing=TESTING)
 		mk_p(cstm)
 
@@ -295,7 +423,7 @@ def run(settings, debug):
 		tweet_images = settings['tweets']['tweet_images']
 		extra_text = settings['tweets']['extra_text']
 
-		q = mk_q()
+		q = mk_q(channels=[], messages=(rs.Alarm, rs.ImgPath))
 		TWITTER = Tweeter(q=q, consumer_key=consumer_key, consumer_secret=consumer_secret,
 						access_token=access_token, access_token_secret=access_token_secret,
 						tweet_images=tweet_images, extra_text=extra_text, testing=TESTING)
@@ -310,7 +438,7 @@ def run(settings, debug):
 
 		for chat_id in chat_ids:
 			sender = "Telegram id %s" % (chat_id)
-			q = mk_q()
+			q = mk_q(channels=[], messages=(rs.Alarm, rs.ImgPath))
 			TELEGRAM = Telegrammer(q=q, token=token, chat_id=chat_id,
 								   send_images=send_images, extra_text=extra_text,
 								   sender=sender, testing=TESTING)
@@ -331,15 +459,38 @@ def run(settings, debug):
 				deconv = 'CHAN'
 		else:
 			deconv = False
+		try:
+			bands = settings['rsam']['bands']
+		except KeyError:
+			bands = []	# settings files from before 1.1.2 do not have this
+		try:
+			store = os.path.join(output_dir, 'rsam') if settings['rsam']['store'] else False
+		except KeyError:
+			store = False	# settings files from before 1.1.2 do not have this
 
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(channels=[cha], messages=())
 		rsam = RSAM(q=q, interval=interval, cha=cha, deconv=deconv,
 					fwaddr=fwaddr, fwport=fwport, fwformat=fwformat,
-					quiet=quiet, testing=TESTING)
+					quiet=quiet, testing=TESTING, bands=bands, store=store)
 
 		mk_p(rsam)
 
+	try:
+		gm = settings['groundmotion']
+	except KeyError:
+		gm = {'enabled': False}	# settings files from before 1.1.2 do not have this
+	if gm['enabled']:
+		# set up queue and process
+		cha = gm['channels']
+		q = mk_q(channels=cha, messages=())
+		groundmotion = GroundMotion(q=q, cha=cha, interval=gm['interval'],
+									highpass=gm['highpass'], thresholds=gm['thresholds'],
+									reset=gm['reset'], fwaddr=gm['fwaddr'], fwport=gm['fwport'],
+									fwformat=gm['fwformat'], quiet=gm['quiet'], testing=TESTING)
+
+		mk_p(groundmotion)
+
 
 	# start additional modules here!
 	################################
@@ -0,0 +1,450 @@
+import os, sys
+import io
+import json
+import getopt
+import itertools
+import logging
+import contextlib
+import time
+from multiprocessing import Pool
+from obspy import read, read_inventory, Stream, UTCDateTime
+import rsudp.raspberryshake as rs
+from rsudp import printM, printW, printE, add_debug_handler, start_logging, settings_loc
+from rsudp import helpers
+from rsudp.c_alert import Alert
+
+SENDER = 'Evaluate'
+MAX_BLOCK = 10		# seconds; Alert's buffers hold lta + 10 s
+
+
+def scan(paths, channels=None):
+	'''
+	Finds miniSEED files, or every file in a directory,
+	and reads their headers (not their data) to find the time span of each.
+
+	:param list paths: files and directories to read
+	:param list channels: channels to keep (all of them if empty)
+	:rtype: list, obspy.core.stream.Stream
+	:return: the files with data on the channels, as ``(start, end, file)`` in time order,
+		and a stream of the headers of their traces (with no data)
+	'''
+	names = []
+	for p in paths:
+		p = os.path.expanduser(p)
+		if os.path.isdir(p):
+			names += sorted(os.path.join(p, f) for f in os.listdir(p)
+							if os.path.isfile(os.path.join(p, f)) and not f.endswith('.xml'))
+		else:
+			names.append(p)
+	files, headers = [], Stream()
+	for f in names:
+		try:
+			st = read(f, headonly=True)
+		except Exception as e:
+			printW('Could not read %s (%s), skipping' % (f, e), SENDER)
+			continue
+		if channels:
+			st = Stream([tr for tr in st if any(c.upper() in tr.stats.channel for c in channels)])
+		if st:
+			files.append((min(tr.stats.starttime for tr in st), max(tr.stats.endtime for tr in st), f))
+			headers += st
+	files.sort(key=lambda f: f[0])
+	return files, headers
+
+
+def days(files, channels=None):
+	'''
+	Reads the data one UTC day at a time, so that replaying days or weeks of archive
+	only ever holds one day of it in memory.
+
+	:param list files: the files, from :py:func:`scan`
+	:param list channels: channels to keep (all of them if empty)
+	:rtype: generator
+	:return: a stream of contiguous traces for each day that has data
+	'''
+	if not files:
+		return
+	day = UTCDateTime(files[0][0].date)
+	last = max(f[1] for f in files)
+	while day <= last:
+		end = day + 86400
+		st = Stream()
+		for start, stop, f in files:
+			if (start < end) and (stop >= day):
+				try:
+					st += read(f, starttime=day, endtime=end)
+				except Exception as e:
+					printW('Could not read %s (%s), skipping' % (f, e), SENDER)
+		if channels:
+			st = Stream([tr for tr in st if any(c.upper() in tr.stats.channel for c in channels)])
+		# samples at midnight belong to the next day
+		st.trim(day, end - 1e-6, nearest_sample=False)
+		st.merge(method=1)
+		st = st.split()
+		if st:
+			yield st.sort(keys=['starttime', 'channel'])
+		day = end
+
+
+def setup(st, inv=None):
+	'''
+	Sets the :py:mod:`rsudp.raspberryshake` globals that consumers read
+	(channels, sampling rate, station) from the archived data,
+	as :py:func:`rsudp.raspberryshake.initRSlib` would from the live stream.
+
+	:param obspy.core.stream.Stream st: the archived data (or just its headers, see :py:func:`scan`)
+	:param obspy.core.inventory.inventory.Inventory inv: the station inventory, if the detectors should deconvolve
+	'''
+	tr = st[0]
+	rs.chns = sorted(set(t.stats.channel for t in st))
+	rs.numchns = len(rs.chns)
+	rs.sps = tr.stats.sampling_rate
+	rs.tf = 250
+	rs.tr = rs.sps * rs.tf / 1000.
+	rs.net, rs.stn = tr.stats.network, tr.stats.station
+	rs.inv = inv
+
+
+def blocks(st, seconds=MAX_BLOCK):
+	'''
+	Cuts the data into blocks of at most ``seconds``, in time order.
+
+	:param obspy.core.stream.Stream st: contiguous traces (see :py:func:`days`)
+	:param float seconds: block length
+	:rtype: list
+	:return: a list of ``(time, channel, data)``
+	'''
+	out = []
+	for tr in st:
+		n = max(1, int(seconds * tr.stats.sampling_rate))
+		t0 = float(tr.stats.starttime)
+		for i in range(0, tr.stats.npts, n):
+			out.append((t0 + i * tr.stats.delta, tr.stats.channel, tr.data[i:i+n]))
+	out.sort(key=lambda b: (b[0], b[1]))
+	return out
+
+
+def run(data, params, block=MAX_BLOCK):
+	'''
+	Runs an :py:class:`rsudp.c_alert.Alert` with the given parameters over the data.
+
+	:param data: the archived data: the files from :py:func:`scan` (read one day at a time),
+		or a stream of contiguous traces
+	:type data: list or obspy.core.stream.Stream
+	:param dict params: keyword arguments to :py:class:`rsudp.c_alert.Alert` (``sta``, ``lta``, ``thresh``, etc.)
+	:param float block: the number of seconds of data passed to the detectors at once
+	:rtype: dict
+	:return: ``params``, the ``triggers`` (dictionaries with the detector ``name``,
+		and ``on`` and ``off`` times), the number of ``samples``,
+		the ``seconds`` of data, and the ``elapsed`` processing time
+	'''
+	flags = []
+	def notify(thread, flag, value):
+		flags.append((flag, value))
+		setattr(thread, '_%s' % flag, False)	# what the Producer does once it has read a flag
+
+	with contextlib.redirect_stdout(io.StringIO()):
+		alert = Alert(q=None, debug=False, **params)
+	alert.notifier = notify
+	samples, seconds = 0, 0.
+	start = time.perf_counter()
+	with contextlib.redirect_stdout(io.StringIO()):	# Alert prints a blank line before each trigger
+		for st in ([data] if isinstance(data, Stream) else days(data, list(alert.buffers))):
+			for t, cha, d in blocks(st, min(block, MAX_BLOCK)):
+				if cha not in alert.buffers:
+					continue
+				alert._append(cha, t, d)
+				alert._compute()
+				samples += len(d)
+				if cha == alert.cha:
+					seconds += len(d) / alert.sps
+	elapsed = time.perf_counter() - start
+
+	triggers, on = [], {}
+	for flag, value in flags:
+		name, t = (value.name or '', value.time) if isinstance(value, (rs.Alarm, rs.Reset)) else ('', value)
+		if flag == 'alarm':
+			on[name] = {'name': name, 'on': UTCDateTime(t), 'off': None}
+			triggers.append(on[name])
+		elif name in on:
+			on.pop(name)['off'] = UTCDateTime(t)
+	return {'params': params, 'triggers': triggers, 'samples': samples,
+			'seconds': seconds, 'elapsed': elapsed}
+
+
+def read_events(loc):
+	'''
+	Reads a reference event list: one event per line, starting with its time
+	(in any format :py:class:`obspy.core.utcdatetime.UTCDateTime` understands)
+	and optionally followed by a description. Blank lines and lines starting with ``#`` are skipped.
+
+	:param str loc: location of the event list
+	:rtype: list
+	:return: a list of ``(time, description)``, in time order
+	'''
+	events = []
+	with open(os.path.expanduser(loc), 'r') as f:
+		for line in f:
+			line = line.strip()
+			if (not line) or line.startswith('#'):
+				continue
+			parts = line.replace(',', ' ').split(None, 1)
+			events.append((UTCDateTime(parts[0]), parts[1] if len(parts) > 1 else ''))
+	return sorted(events, key=lambda e: e[0])
+
+
+def compare(triggers, events, before=10, after=60):
+	'''
+	Matches triggers to reference events. A trigger detects an event if it turns on
+	between ``before`` seconds before and ``after`` seconds after the event time;
+	each trigger can detect one event at most.
+
+	:param list triggers: triggers from :py:func:`run`
+	:param list events: reference events from :py:func:`read_events`
+	:param float before: seconds a trigger may come before the event time
+	:param float after: seconds a trigger may come after the event time (the travel time from the source)
+	:rtype: dict
+	:return: the ``detected`` events (with their triggers), the ``missed`` events,
+		the ``false`` triggers, and the ``precision`` and ``recall``
+	'''
+	free = sorted(triggers, key=lambda tr: tr['on'])
+	detected, missed = [], []
+	for ev in events:
+		match = None
+		for tr in free:
+			if ev[0] - before <= tr['on'] <= ev[0] + after:
+				match = tr
+				break
+		if match:
+			free.remove(match)
+			detected.append((ev, match))
+		else:
+			missed.append(ev)
+	n = len(triggers)
+	return {'detected': detected, 'missed': missed, 'false': free,
+			'precision': (len(detected) / n) if n else 0.,
+			'recall': (len(detected) / len(events)) if events else 0.}
+
+
+def _init_worker(files, headers, inv, block):
+	global _files, _block
+	_files, _block = files, block
+	setup(headers, inv)
+	# only the summary of each run is printed, by the parent process
+	log = logging.getLogger('main')
+	for h in list(log.handlers):
+		if type(h) is logging.StreamHandler:
+			log.removeHandler(h)
+
+
+def _run_worker(params):
+	return run(_files, params, _block)
+
+
+def sweep(files, headers, grid, base=None, processes=None, block=MAX_BLOCK):
+	'''
+	Runs the detectors once for every combination of parameter values,
+	spread over the computer's cores.
+
+	:param list files: the archived data files, from :py:func:`scan` (each worker reads them one day at a time)
+	:param obspy.core.stream.Stream headers: the headers of their traces, from :py:func:`scan`
+	:param dict grid: lists of values to try for each :py:class:`rsudp.c_alert.Alert` keyword argument,
+		for example ``{'sta': [3, 6], 'thresh': [1.6, 2.0]}``
+	:param dict base: values of the keyword arguments that are not swept
+	:param int processes: the number of worker processes (defaults to the number of cores)
+	:param float block: the number of seconds of data passed to the detectors at once
+	:rtype: list
+	:return: the results of :py:func:`run` for each combination
+	'''
+	keys = list(grid)
+	runs = []
+	for values in itertools.product(*[grid[k] for k in keys]):
+		params = dict(base if base else {})
+		params.update(zip(keys, values))
+		runs.append(params)
+	with Pool(processes, initializer=_init_worker, initargs=(files, headers, rs.inv, block)) as pool:
+		return pool.map(_run_worker, runs)
+
+
+def params_from_settings(settings):
+	'''
+	Gets :py:class:`rsudp.c_alert.Alert` keyword arguments from the ``alert`` section of a settings dictionary.
+
+	:param dict settings: settings (see :py:func:`rsudp.helpers.read_settings`)
+	:rtype: dict
+	'''
+	a = settings['alert']
+	params = {'sta': a['sta'], 'lta': a['lta'], 'thresh': a['threshold'], 'reset': a['reset'],
+			  'bp': [a['highpass'], a['lowpass']], 'cha': a['channel']}
+	if a['deconvolve']:
+		params['deconv'] = a['units'].upper() if a['units'].upper() in rs.UNITS else 'CHAN'
+	for k, p in (('coincidence_channels', 'coinc'), ('coincidence_sum', 'coinc_sum'),
+				 ('coincidence_window', 'coinc_window'), ('coincidence_weights', 'coinc_weights'),
+				 ('detectors', 'detectors')):
+		if k in a:	# settings files from before 1.1.2 do not have these
+			params[p] = a[k]
+	return params
+
+
+def _fmt(t):
+	return t.strftime('%Y-%m-%d %H:%M:%S.%f')[:22] if t else '-'
+
+
+def report(result, events=None, before=10, after=60):
+	'''
+	Prints the triggers from a run, how fast it went,
+	and how they compare with a reference event list if there is one.
+
+	:param dict result: the result of :py:func:`run`
+	:param list events: reference events from :py:func:`read_events`
+	:param float before: seconds a trigger may come before the event time
+	:param float after: seconds a trigger may come after the event time
+	'''
+	printM('%s triggers:' % len(result['triggers']), SENDER)
+	for tr in result['triggers']:
+		printM('    on %s  off %s  %s' % (_fmt(tr['on']), _fmt(tr['off']), tr['name']), SENDER)
+	el = max(result['elapsed'], 1e-9)
+	printM('Processed %.0f seconds of data (%s samples) in %.2f seconds: %.0f samples/s, %.0fx real time'
+		   % (result['seconds'], result['samples'], el, result['samples'] / el, result['seconds'] / el), SENDER)
+	if events is None:
+		return
+	c = compare(result['triggers'], events, before, after)
+	for ev, tr in c['detected']:
+		printM('    detected %s %s (trigger at %+.1f s)' % (_fmt(ev[0]), ev[1], tr['on'] - ev[0]), SENDER)
+	for ev in c['missed']:
+		printM('    missed   %s %s' % (_fmt(ev[0]), ev[1]), SENDER)
+	printM('%s of %s events detected, %s false triggers: precision %.2f, recall %.2f'
+		   % (len(c['detected']), len(events), len(c['false']), c['precision'], c['recall']), SENDER)
+
+
+def parse_sweep(s):
+	'''
+	Parses a sweep specification like ``sta=3,5;thresh=1.6,2.0``.
+
+	:param str s: the specification
+	:rtype: dict
+	'''
+	grid = {}
+	for part in s.split(';'):
+		if part.strip():
+			k, v = part.split('=')
+			grid[k.strip()] = [float(x) for x in v.split(',')]
+	return grid
+
+
+def main():
+	'''
+	When run from the command line, evaluates the alert settings on archived miniSEED files or directories.
+
+	For example, to run the settings in the default settings file over a week of files
+	written by rsudp, and compare the triggers with a list of known earthquakes:
+
+	.. code-block:: bash
+
+		rs-evaluate -r quakes.txt ~/rsudp/data
+
+	To try every combination of three STA lengths and two thresholds on all cores:
+
+	.. code-block:: bash
+
+		rs-evaluate -r quakes.txt --sweep "sta=3,5,8;thresh=1.6,2.0" ~/rsudp/data
+
+	'''
+
+	hlp_txt = '''
+########################################################
+##            R A S P B E R R Y  S H A K E            ##
+##            Offline Detector Evaluation             ##
+##                                                    ##
+## Runs the alert settings over archived miniSEED     ##
+## files and reports the triggers, the processing     ##
+## rate, and matches against a reference event list.  ##
+##                                                    ##
+## Options:                                           ##
+##   -s  settings file (default: rsudp settings)      ##
+##   -r  reference event list (one time per line)     ##
+##   -i  station inventory (StationXML), needed if    ##
+##       the alert settings deconvolve                ##
+##   -b  seconds before an event a trigger may come   ##
+##       (default 10)                                 ##
+##   -a  seconds after an event a trigger may come    ##
+##       (default 60)                                 ##
+##   -j  number of processes for sweeps               ##
+##   --sweep  "sta=3,5;lta=20,30;thresh=1.6,2.0"      ##
+##                                                    ##
+########################################################
+##                                                    ##
+##    $ rs-evaluate -r quakes.txt ~/rsudp/data        ##
+##                                                    ##
+########################################################
+
+	'''
+
+	settings, ref, inv, jobs, grid = settings_loc, None, None, None, None
+	before, after = 10., 60.
+	try:
+		opts, args = getopt.getopt(sys.argv[1:], 'hs:r:i:b:a:j:',
+								   ['help', 'settings=', 'reference=', 'inventory=',
+									'before=', 'after=', 'jobs=', 'sweep='])
+		for o, a in opts:
+			if o in ('-h', '--help'):
+				print(hlp_txt)
+				exit(0)
+			if o in ('-s', '--settings'):
+				settings = a
+			if o in ('-r', '--reference'):
+				ref = a
+			if o in ('-i', '--inventory'):
+				inv = a
+			if o in ('-b', '--before'):
+				before = float(a)
+			if o in ('-a', '--after'):
+				after = float(a)
+			if o in ('-j', '--jobs'):
+				jobs = int(a)
+			if o == '--sweep':
+				grid = parse_sweep(a)
+	except (getopt.GetoptError, ValueError) as e:
+		print('ERROR: %s' % e)
+		print(hlp_txt)
+		exit(2)
+	if not args:
+		print(hlp_txt)
+		exit(2)
+
+	start_logging(log_name='rsudp-evaluate.log')
+	add_debug_handler()
+	s = helpers.read_settings(settings) if os.path.exists(os.path.expanduser(settings)) \
+		else helpers.default_settings(verbose=False)
+	if isinstance(s, str):
+		s = json.loads(s)
+	params = params_from_settings(s)
+
+	files, headers = scan(args)
+	if not files:
+		printE('No data found in %s' % ', '.join(args), SENDER)
+		exit(1)
+	setup(headers, read_inventory(os.path.expanduser(inv)) if inv else None)
+	printM('Found %s files on channels %s, %s to %s'
+		   % (len(files), ', '.join(rs.chns), _fmt(files[0][0]), _fmt(max(f[1] for f in files))), SENDER)
+	events = read_events(ref) if ref else None
+
+	if not grid:
+		report(run(files, params), events, before, after)
+		return
+
+	results = sweep(files, headers, grid, params, processes=jobs)
+	printM('%s parameter combinations:' % len(results), SENDER)
+	for r in results:
+		p = ', '.join('%s=%s' % (k, r['params'][k]) for k in grid)
+		if events is not None:
+			c = compare(r['triggers'], events, before, after)
+			printM('    %s: %s triggers, %s of %s events, %s false, precision %.2f, recall %.2f'
+				   % (p, len(r['triggers']), len(c['detected']), len(events), len(c['false']),
+					  c['precision'], c['recall']), SENDER)
+		else:
+			printM('    %s: %s triggers' % (p, len(r['triggers'])), SENDER)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,240 @@
+from functools import lru_cache
+import numpy as np
+from scipy.signal import iirfilter, sosfilt, sosfilt_zi, lfilter
+import rsudp.raspberryshake as rs
+
+
+KINDS = ('bandpass', 'highpass', 'lowpass')	# the filter types StreamFilter can apply
+
+
+@lru_cache(maxsize=32)
+def design(kind, freq, sps, corners=4):
+	'''
+	.. versionadded:: 1.1.2
+
+	Designs a Butterworth filter as second-order sections, the same way
+	:py:func:`obspy.core.trace.Trace.filter` does. Designs are cached,
+	so consumers asking for the same filter share one set of coefficients.
+
+	:param str kind: ``'bandpass'``, ``'highpass'``, or ``'lowpass'``
+	:param freq: the corner frequency in Hz, or ``(freqmin, freqmax)`` for a bandpass
+	:type freq: float or tuple
+	:param float sps: samples per second
+	:param int corners: the filter order
+	:rtype: numpy.ndarray
+	:return: the second-order sections (shared between callers, so do not modify them)
+	:raise ValueError: if the filter type or frequencies are not valid
+	'''
+	nyq = 0.5 * sps
+	if kind == 'bandpass':
+		wn = [freq[0] / nyq, freq[1] / nyq]
+		btype = 'band'
+	elif kind in ('highpass', 'lowpass'):
+		wn = freq / nyq
+		btype = kind[:-4]
+	else:
+		raise ValueError('filter type must be one of %s, not %s' % (KINDS, kind))
+	if not all(0 < w < 1 for w in np.atleast_1d(wn)):
+		raise ValueError('%s corner frequencies %s must be between 0 and the Nyquist frequency (%s Hz)'
+						 % (kind, freq, nyq))
+	return iirfilter(corners, wn, btype=btype, ftype='butter', output='sos')
+
+
+class StreamFilter:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A Butterworth filter stage that carries its state from one block of
+	samples to the next, so that a channel can be filtered one packet at a time.
+
+	This replaces copying and refiltering a whole window of data for every packet:
+	each sample is filtered exactly once, and there are no edge transients at
+	the start of each window. The filter starts in the steady state
+	for the first sample it receives, so the DC offset of raw counts does not
+	cause a transient either.
+
+	.. code-block:: python
+
+		>>> from rsudp.filters import StreamFilter
+		>>> bp = StreamFilter('bandpass', (0.7, 2.0), sps=100)
+		>>> filtered = bp.filter(p.data)
+
+	:param str kind: ``'bandpass'``, ``'highpass'``, or ``'lowpass'``
+	:param freq: the corner frequency in Hz, or ``(freqmin, freqmax)`` for a bandpass
+	:type freq: float or tuple
+	:param float sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	:param int corners: the filter order (4, as in obspy, by default)
+	:raise ValueError: if the filter type or frequencies are not valid
+	'''
+
+	def __init__(self, kind, freq, sps=None, corners=4):
+		'''
+		Looks up the filter design.
+		'''
+		self.kind = kind
+		self.freq = tuple(freq) if kind == 'bandpass' else freq
+		self.sps = sps if sps else rs.sps
+		self.corners = corners
+		self.sos = design(self.kind, self.freq, self.sps, corners)
+		self.zi = None
+
+
+	def reset(self):
+		'''
+		Forgets the filter state, for example after a gap in the data.
+		'''
+		self.zi = None
+
+
+	def filter(self, data):
+		'''
+		Filters the next block of samples.
+
+		:param numpy.ndarray data: the samples that follow the ones last filtered
+		:rtype: numpy.ndarray
+		:return: the filtered samples (as :py:class:`numpy.float64`)
+		'''
+		data = np.asarray(data, dtype=np.float64)
+		if not len(data):
+			return data
+		if self.zi is None:
+			self.zi = sosfilt_zi(self.sos) * data[0]
+		out, self.zi = sosfilt(self.sos, data, zi=self.zi)
+		return out
+
+
+	def __str__(self):
+		if self.kind == 'bandpass':
+			return 'bandpass %s-%s Hz' % self.freq
+		return '%s %s Hz' % (self.kind, self.freq)
+
+
+	def __repr__(self):
+		return 'StreamFilter(%s)' % (self)
+
+
+class Integrator:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	Integrates a stream one block at a time (with the trapezoidal rule),
+	carrying the running sum from one block to the next,
+	for example to turn acceleration into velocity packet by packet.
+	The integral starts at zero. Any offset in the input makes the output drift,
+	so it is usually followed by a highpass :py:class:`rsudp.filters.StreamFilter`.
+
+	:param float sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	'''
+
+	def __init__(self, sps=None):
+		'''
+		Sets the integration step.
+		'''
+		self.sps = sps if sps else rs.sps
+		self._ba = ([0.5 / self.sps, 0.5 / self.sps], [1., -1.])
+		self.zi = None
+
+
+	def reset(self):
+		'''
+		Starts the integral from zero again.
+		'''
+		self.zi = None
+
+
+	def filter(self, data):
+		'''
+		Integrates the next block of samples.
+
+		:param numpy.ndarray data: the samples that follow the ones last integrated
+		:rtype: numpy.ndarray
+		:return: the running integral at each sample (as :py:class:`numpy.float64`)
+		'''
+		data = np.asarray(data, dtype=np.float64)
+		if not len(data):
+			return data
+		if self.zi is None:
+			self.zi = np.array([-0.5 / self.sps * data[0]])	# so that the integral starts at zero
+		out, self.zi = lfilter(*self._ba, data, zi=self.zi)
+		return out
+
+
+class Differentiator:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	Differentiates a stream one block at a time (with a backward difference),
+	carrying the last sample from one block to the next,
+	for example to turn velocity into acceleration packet by packet.
+
+	:param float sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	'''
+
+	def __init__(self, sps=None):
+		'''
+		Sets the differentiation step.
+		'''
+		self.sps = sps if sps else rs.sps
+		self.last = None
+
+
+	def reset(self):
+		'''
+		Forgets the last sample.
+		'''
+		self.last = None
+
+
+	def filter(self, data):
+		'''
+		Differentiates the next block of samples.
+
+		:param numpy.ndarray data: the samples that follow the ones last differentiated
+		:rtype: numpy.ndarray
+		:return: the derivative at each sample (as :py:class:`numpy.float64`)
+		'''
+		data = np.asarray(data, dtype=np.float64)
+		if not len(data):
+			return data
+		last = data[0] if self.last is None else self.last
+		out = np.diff(data, prepend=last) * self.sps
+		self.last = data[-1]
+		return out
+
+
+def from_bp(bp, sps=None, corners=4):
+	'''
+	.. versionadded:: 1.1.2
+
+	Makes a :py:class:`rsudp.filters.StreamFilter` from a ``[highpass, lowpass]``
+	pair as found in the settings file. A corner at or below zero,
+	or at or above the Nyquist frequency, is left out;
+	if both are left out, no filter is needed.
+
+	:param list bp: the filter corners in the format ``[highpass, lowpass]``
+	:param float sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	:param int corners: the filter order
+	:rtype: rsudp.filters.StreamFilter or NoneType
+	:return: the filter, or ``None`` if no filtering is needed
+	'''
+	if not bp:
+		return None
+	sps = sps if sps else rs.sps
+	hp = bp[0] > 0
+	lp = bp[1] < (sps / 2.)
+	if hp and lp:
+		return StreamFilter('bandpass', (bp[0], bp[1]), sps=sps, corners=corners)
+	if hp:
+		return StreamFilter('highpass', bp[0], sps=sps, corners=corners)
+	if lp:
+		return StreamFilter('lowpass', bp[1], sps=sps, corners=corners)
+	return None
@@ -1,4 +1,5 @@
 import rsudp.raspberryshake as rs
+from rsudp.response import CACHE, DECONVOLVER
 from rsudp import COLOR, printM, printW
 import os
 import json
@@ -31,12 +32,19 @@ def default_settings(output_dir='%s/rsudp' % os.path.expanduser('~').replace('\\
     "port": 8888,
     "station": "Z0000",
     "output_dir": "%s",
-    "debug": true},
+    "debug": true,
+    "queue_overrun": "drop",
+    "rcvbuf": 0,
+    "asyncio": false},
 "printdata": {
     "enabled": false},
 "write": {
     "enabled": false,
-    "channels": ["all"]},
+    "channels": ["all"],
+    "deconvolve": false,
+    "units": "VEL",
+    "flush": 10,
+    "fsync": false},
 "plot": {
     "enabled": true,
     "duration": 90,
@@ -64,7 +72,12 @@ def default_settings(output_dir='%s/rsudp' % os.path.expanduser('~').replace('\\
     "highpass": 0.8,
     "lowpass": 9,
     "deconvolve": false,
-    "units": "VEL"},
+    "units": "VEL",
+    "coincidence_channels": [],
+    "coincidence_sum": 2,
+    "coincidence_window": 5,
+    "coincidence_weights": {},
+    "detectors": []},
 "alertsound": {
     "enabled": false,
     "mp3file": "doorbell"},
@@ -95,7 +108,20 @@ def default_settings(output_dir='%s/rsudp' % os.path.expanduser('~').replace('\\
     "channel": "HZ",
     "interval": 10,
     "deconvolve": false,
-    "units": "VEL"}
+    "units": "VEL",
+    "bands": [],
+    "store": false},
+"groundmotion": {
+    "enabled": false,
+    "quiet": true,
+    "channels": ["all"],
+    "interval": 1,
+    "highpass": 0.1,
+    "thresholds": {"PGA": 0, "PGV": 0, "PGD": 0, "MMI": 0},
+    "reset": 10,
+    "fwaddr": false,
+    "fwport": false,
+    "fwformat": "LITE"}
 }
 
 """ % (output_dir)
@@ -159,7 +185,7 @@ def set_channels(self, cha):
 	:type cha: list or str
 	'''
 	cha = rs.chns if ('all' in cha) else cha
-	cha = list(cha) if isinstance(cha, str) else cha
+	cha = [cha] if isinstance(cha, str) else cha
 	for c in rs.chns:
 		n = 0
 		for uch in cha:
@@ -259,8 +285,9 @@ def conn_stats(TESTING=False):
 def msg_alarm(event_time):
 	'''
 	This function constructs the ``ALARM`` message as a bytes object.
-	Currently this is only used by :py:class:`rsudp.p_producer.Producer`
-	to construct alarm queue messages.
+	It is the wire format of :py:class:`rsudp.raspberryshake.Alarm`,
+	which is what is passed along the queues since version 1.1.2,
+	so this is now only needed to send the message over the network.
 
 	For example:
 
@@ -273,16 +300,17 @@ def msg_alarm(event_time):
 
 	:param obspy.core.utcdatetime.UTCDateTime event_time: the datetime object to serialize and convert to bytes
 	:rtype: bytes
-	:return: the ``ALARM`` message, ready to be put on the queue
+	:return: the ``ALARM`` message, ready to be sent
 	'''
-	return b'ALARM %s' % bytes(str(event_time), 'utf-8')
+	return bytes(rs.Alarm(event_time))
 
 
 def msg_reset(reset_time):
 	'''
 	This function constructs the ``RESET`` message as a bytes object.
-	Currently this is only used by :py:class:`rsudp.p_producer.Producer`
-	to construct reset queue messages.
+	It is the wire format of :py:class:`rsudp.raspberryshake.Reset`,
+	which is what is passed along the queues since version 1.1.2,
+	so this is now only needed to send the message over the network.
 
 	For example:
 
@@ -295,16 +323,17 @@ def msg_reset(reset_time):
 
 	:param obspy.core.utcdatetime.UTCDateTime reset_time: the datetime object to serialize and convert to bytes
 	:rtype: bytes
-	:return: the ``RESET`` message, ready to be put on the queue
+	:return: the ``RESET`` message, ready to be sent
 	'''
-	return b'RESET %s' % bytes(str(reset_time), 'utf-8')
+	return bytes(rs.Reset(reset_time))
 
 
 def msg_imgpath(event_time, figname):
 	'''
 	This function constructs the ``IMGPATH`` message as a bytes object.
-	Currently this is only used by :py:class:`rsudp.c_plot.Plot`
-	to construct queue messages containing timestamp and saved image path.
+	It is the wire format of :py:class:`rsudp.raspberryshake.ImgPath`,
+	which is what is passed along the queues since version 1.1.2,
+	so this is now only needed to send the message over the network.
 
 	For example:
 
@@ -319,14 +348,15 @@ def msg_imgpath(event_time, figname):
 	:param obspy.core.utcdatetime.UTCDateTime event_time: the datetime object to serialize and convert to bytes
 	:param str figname: the figure path as a string
 	:rtype: bytes
-	:return: the ``IMGPATH`` message, ready to be put on the queue
+	:return: the ``IMGPATH`` message, ready to be sent
 	'''
-	return b'IMGPATH %s %s' % (bytes(str(event_time), 'utf-8'), bytes(str(figname), 'utf-8'))
+	return bytes(rs.ImgPath(event_time, figname))
 
 
 def msg_term():
 	'''
 	This function constructs the simple ``TERM`` message as a bytes object.
+	It is the wire format of :py:class:`rsudp.raspberryshake.Term`.
 
 	.. code-block:: python
 
@@ -337,7 +367,7 @@ def msg_term():
 	:rtype: bytes
 	:return: the ``TERM`` message
 	'''
-	return b'TERM'
+	return bytes(rs.Term())
 
 
 def get_msg_time(msg):
@@ -358,10 +388,13 @@ def get_msg_time(msg):
 		>>> get_msg_time(msg)
 		UTCDateTime(2020, 1, 1, 0, 0, 0, 599000)
 
-	:param bytes msg: the bytes-formatted queue message to decode
+	:param msg: the queue message to decode
+	:type msg: bytes or rsudp.raspberryshake.Message
 	:rtype: obspy.core.utcdatetime.UTCDateTime
 	:return: the time embedded in the message
 	'''
+	if isinstance(msg, rs.Message):
+		return msg.time
 	return rs.UTCDateTime.strptime(msg.decode('utf-8').split(' ')[1], '%Y-%m-%dT%H:%M:%S.%fZ')
 
 
@@ -382,10 +415,13 @@ def get_msg_path(msg):
 		>>> get_msg_path(msg)
 		'/home/pi/rsudp/screenshots/test.png'
 
-	:param bytes msg: the bytes-formatted queue message to decode
+	:param msg: the queue message to decode
+	:type msg: bytes or rsudp.raspberryshake.Message
 	:rtype: str
 	:return: the path embedded in the message
 	'''
+	if isinstance(msg, rs.Message):
+		return msg.path
 	return msg.decode('utf-8').split(' ')[2]
 
 
@@ -397,15 +433,19 @@ def deconv_vel_inst(self, trace, output):
 	A helper function for :py:func:`rsudp.raspberryshake.deconvolve`
 	for velocity channels.
 
+	.. versionchanged:: 1.1.2 uses the cached inverse responses in
+		:py:data:`rsudp.response.CACHE` instead of evaluating the
+		instrument response again for every window.
+
 	:param self self: The self object of the sub-consumer class calling this function.
 	:param obspy.core.trace.Trace trace: the trace object instance to deconvolve
 	'''
 	if self.deconv not in 'CHAN':
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
-								output=output, water_level=4.5, taper=False)
+		CACHE.remove_response(trace, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+							  output=output, water_level=4.5)
 	else:
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
-								output='VEL', water_level=4.5, taper=False)
+		CACHE.remove_response(trace, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+							  output='VEL', water_level=4.5)
 	if 'ACC' in self.deconv:
 		trace.data = rs.np.gradient(trace.data, 1)
 	elif 'GRAV' in self.deconv:
@@ -427,15 +467,19 @@ def deconv_acc_inst(self, trace, output):
 	A helper function for :py:func:`rsudp.raspberryshake.deconvolve`
 	for acceleration channels.
 
+	.. versionchanged:: 1.1.2 uses the cached inverse responses in
+		:py:data:`rsudp.response.CACHE` instead of evaluating the
+		instrument response again for every window.
+
 	:param self self: The self object of the sub-consumer class calling this function.
 	:param obspy.core.trace.Trace trace: the trace object instance to deconvolve
 	'''
 	if self.deconv not in 'CHAN':
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
-								output=output, water_level=4.5, taper=False)
+		CACHE.remove_response(trace, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+							  output=output, water_level=4.5)
 	else:
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
-								output='ACC', water_level=4.5, taper=False)
+		CACHE.remove_response(trace, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+							  output='ACC', water_level=4.5)
 	if 'VEL' in self.deconv:
 		trace.data = rs.np.cumsum(trace.data)
 		trace.detrend(type='demean')
@@ -483,31 +527,40 @@ def deconvolve(self):
 	if this library's :pycode:`rsudp.raspberryshake.inv` variable
 	contains a valid :py:class:`obspy.core.inventory.inventory.Inventory` object.
 
+	.. versionchanged:: 1.1.2 geophone and accelerometer channels are deconvolved by the
+		service in :py:data:`rsudp.response.DECONVOLVER`, which shares the work (and the resulting data)
+		between all the consumers that convert the same channel to the same units.
+		The data of the deconvolved traces is read-only.
+
 	:param self self: The self object of the sub-consumer class calling this function. Must contain :pycode:`self.stream` as a :py:class:`obspy.core.stream.Stream` object.
 	'''
 	acc_channels = ['ENE', 'ENN', 'ENZ']
 	vel_channels = ['EHE', 'EHN', 'EHZ', 'SHZ']
 	rbm_channels = ['HDF']
 
-	self.stream = self.raw.copy()
-	for trace in self.stream:
-		trace.stats.units = self.units
+	self.stream = rs.Stream()
+	for raw in self.raw:
 		output = 'ACC' if self.deconv == 'GRAV' else self.deconv	# if conversion is to gravity
-		if self.deconv:
-			if trace.stats.channel in vel_channels:
-				deconv_vel_inst(self, trace, output)	# geophone channels
+		if self.deconv and (raw.stats.channel in vel_channels):
+			# geophone channels
+			unit = 'VEL' if self.deconv == 'CHAN' else self.deconv
+			trace = DECONVOLVER.get(raw, unit, lambda tr: deconv_vel_inst(self, tr, output))
 
-			elif trace.stats.channel in acc_channels:
-				deconv_acc_inst(self, trace, output)	# accelerometer channels
+		elif self.deconv and (raw.stats.channel in acc_channels):
+			# accelerometer channels
+			unit = 'ACC' if self.deconv == 'CHAN' else self.deconv
+			trace = DECONVOLVER.get(raw, unit, lambda tr: deconv_acc_inst(self, tr, output))
 
-			elif trace.stats.channel in rbm_channels:
+		else:
+			trace = raw.copy()
+			if self.deconv and (raw.stats.channel in rbm_channels):
 				deconv_rbm_inst(self, trace, output)	# this is the Boom channel
-
 			else:
-				trace.stats.units = ' counts'	# this is a new one
+				trace.stats.units = ' counts'	# this is a new one, or it is not being deconvolved
 
-		else:
-			trace.stats.units = ' counts'		# this is not being deconvolved
+		if not trace.stats.units:
+			trace.stats.units = self.units
+		self.stream.append(trace)
 
 
 def resolve_extra_text(extra_text, max_len, sender='helpers'):
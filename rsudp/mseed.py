@@ -0,0 +1,328 @@
+import os
+import io
+import time
+from threading import Thread
+from queue import Queue, Full, Empty
+import numpy as np
+from obspy import UTCDateTime
+from obspy.core.trace import Trace
+from rsudp import printM, printW, printE
+
+
+class RecordEncoder:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A streaming miniSEED encoder for one channel, which only ever outputs full records.
+
+	Samples are added as they become ready to write. Each call to :py:func:`add`
+	returns the records (usually none, or a few) that have been completely filled,
+	and keeps the remaining samples until there are enough to fill another one,
+	so appending its output to a file gives the same well-filled
+	512-byte records as writing the whole day at once, however often it is called.
+	:py:func:`flush` returns the last, partly filled record (at the end of a day,
+	before a gap, or when the program exits).
+
+	The encoding is done by libmseed through :py:func:`obspy.core.trace.Trace.write`
+	with ``flush=False``, which packs full records only; the samples it leaves over
+	are counted from the headers of the records it did pack.
+	Record sequence numbers carry on from one call to the next.
+
+	.. code-block:: python
+
+		>>> enc = RecordEncoder('AM', 'R3BCF', '00', 'EHZ', 100)
+		>>> len(enc.add(UTCDateTime(2020, 2, 21, 19, 58, 50, 292000), data[:1000]))
+		512
+		>>> len(enc.pending)
+		588
+
+	:param str net: the network code
+	:param str stn: the station code
+	:param str loc: the location code
+	:param str cha: the channel code
+	:param float sps: samples per second
+	:param str encoding: the miniSEED encoding, ``'STEIM2'`` for counts or ``'FLOAT32'`` for physical units
+	:param int reclen: the record length in bytes
+	'''
+	def __init__(self, net, stn, loc, cha, sps, encoding='STEIM2', reclen=512):
+		'''
+		Sets up the encoder.
+		'''
+		self.header = {'network': net, 'station': stn, 'location': loc,
+					   'channel': cha, 'sampling_rate': sps}
+		self.delta = 1. / sps
+		self.encoding = encoding
+		self.dtype = np.float32 if encoding == 'FLOAT32' else np.int32
+		self.reclen = reclen
+		# the most samples one record's data section could hold (7 per 32-bit word for Steim2);
+		# libmseed won't pack a full record from fewer than this without flushing
+		self.fill = (reclen - 48) // 4 * (7 if encoding == 'STEIM2' else 1)
+		self.sequence = 1
+		self.pending = np.zeros(0, dtype=self.dtype)
+		self.t = None		# time of the first pending sample
+		self.records = 0	# records output so far
+
+
+	def _next(self):
+		'''
+		The time the next sample should have if it follows on from the pending ones.
+		'''
+		return self.t + len(self.pending) * self.delta
+
+
+	def _encode(self, flush):
+		'''
+		Packs the pending samples into records, and keeps the ones that weren't packed.
+		'''
+		if (not len(self.pending)) or ((not flush) and (len(self.pending) < self.fill)):
+			return b''
+		tr = Trace(data=self.pending, header=dict(self.header, starttime=UTCDateTime(self.t)))
+		out = io.BytesIO()
+		try:
+			tr.write(out, format='MSEED', encoding=self.encoding, reclen=self.reclen,
+					 byteorder='>', sequence_number=self.sequence, flush=flush)
+		except ValueError:
+			return b''		# obspy raises this if no record was full yet
+		recs = out.getvalue()
+		n = len(recs) // self.reclen
+		packed = sum(int.from_bytes(recs[i+30:i+32], 'big') for i in range(0, len(recs), self.reclen))
+		self.pending = self.pending[packed:]
+		self.t = (self.t + packed * self.delta) if len(self.pending) else None
+		self.sequence = (self.sequence + n - 1) % 999999 + 1
+		self.records += n
+		return recs
+
+
+	def add(self, t, data):
+		'''
+		Adds contiguous samples, and returns any records that are now full.
+		If the samples don't follow on from the pending ones, the pending ones are flushed first.
+
+		:param float t: the time of the first sample, in decimal seconds since 1970-01-01 00:00:00Z
+		:param numpy.ndarray data: the samples
+		:rtype: bytes
+		:return: zero or more complete records
+		'''
+		if not len(data):
+			return b''
+		out = b''
+		if (self.t is not None) and (abs(float(t) - self._next()) > self.delta / 2):
+			out = self.flush()		# a gap or an overlap
+		if self.t is None:
+			self.t = float(t)
+			self.pending = np.asarray(data, dtype=self.dtype)
+		else:
+			self.pending = np.concatenate((self.pending, np.asarray(data, dtype=self.dtype)))
+		return out + self._encode(flush=False)
+
+
+	def flush(self):
+		'''
+		Returns all the pending samples as records, the last one partly filled.
+
+		:rtype: bytes
+		'''
+		out = self._encode(flush=True)
+		self.pending = np.zeros(0, dtype=self.dtype)
+		self.t = None
+		return out
+
+
+class FileWriter(Thread):
+	'''
+	.. versionadded:: 1.1.2
+
+	A thread that encodes data as miniSEED (with a :py:class:`RecordEncoder` per channel and unit)
+	and appends it to files, so that slow disks (such as SD cards) hold up this thread
+	rather than the one reading data from the queue.
+
+	Data is handed over through a bounded queue of ``maxsize`` jobs;
+	if the disk is so slow that the queue fills up, the caller waits
+	(with a warning) until there is room again, rather than using more and more memory.
+	Files are kept open between writes, and are flushed to the operating system
+	every ``flush`` seconds (and synced to disk if ``fsync`` is ``True``).
+	When a channel's data moves on to a new file (at the end of a UTC day),
+	the last record goes in the old file, which is then closed;
+	all files are closed with :py:func:`close_files`.
+
+	:param int maxsize: the most jobs that can be waiting to be written
+	:param float flush: how often to flush open files, in seconds (0 to flush after every write)
+	:param bool fsync: whether to also sync files to disk when flushing them
+	:param str sender: the name to log messages under
+	:param bool debug: whether to log every write
+	'''
+	def __init__(self, maxsize=64, flush=10, fsync=False, sender='Write', debug=False):
+		'''
+		Sets up the thread (it is started by the caller).
+		'''
+		super().__init__(daemon=True)
+		self.queue = Queue(maxsize)
+		self.flush_interval = flush
+		self.fsync = fsync
+		self.sender = sender
+		self.debug = debug
+		self.encoders = {}		# (channel, unit): RecordEncoder
+		self.outfiles = {}		# (channel, unit): the file its records go in
+		self.handles = {}		# file name: open file
+		self.last_flush = time.monotonic()
+		self.waits = 0			# times the queue was full
+		self.last_warn = 0
+
+
+	def _put(self, job):
+		'''
+		Queues a job, waiting for room if the queue is full.
+		'''
+		try:
+			self.queue.put_nowait(job)
+		except Full:
+			self.waits += 1
+			if time.monotonic() - self.last_warn > 60:
+				printW('Disk writes are falling behind (%s jobs waiting), waiting for them to catch up'
+					   % (self.queue.qsize()), self.sender)
+				self.last_warn = time.monotonic()
+			self.queue.put(job)
+
+
+	def add(self, key, outfile, header, encoding, t, data):
+		'''
+		Queues samples to be encoded and written.
+
+		:param tuple key: the ``(channel, unit)`` the samples belong to
+		:param str outfile: the file to write them to
+		:param dict header: the ``network``, ``station``, ``location``, ``channel``, and ``sampling_rate``
+		:param str encoding: the miniSEED encoding (see :py:class:`RecordEncoder`)
+		:param float t: the time of the first sample
+		:param numpy.ndarray data: contiguous samples (the array must not change afterwards, so pass a copy of buffer contents)
+		'''
+		self._put(('add', key, outfile, header, encoding, t, data))
+
+
+	def flush_records(self):
+		'''
+		Queues writing the last, partly filled record of every channel.
+		'''
+		self._put(('flush',))
+
+
+	def close_files(self):
+		'''
+		Queues flushing (and syncing, if set) and closing all open files.
+		'''
+		self._put(('close',))
+
+
+	def stop(self, timeout=None):
+		'''
+		Writes everything still queued, closes the files, and stops the thread.
+
+		:param float timeout: the longest time to wait, in seconds
+		'''
+		self._put(('stop',))
+		if self.is_alive():
+			self.join(timeout)
+
+
+	def _handle(self, outfile):
+		'''
+		Returns an open handle to a file, opening it if needed.
+		'''
+		if outfile not in self.handles:
+			self.handles[outfile] = open(outfile, 'ab')
+		return self.handles[outfile]
+
+
+	def _write(self, outfile, recs):
+		'''
+		Appends records to a file.
+		'''
+		if not recs:
+			return
+		self._handle(outfile).write(recs)
+		if self.debug:
+			printM('%s records to %s' % (len(recs) // 512, outfile), self.sender)
+		if self.flush_interval <= 0:
+			self._sync()
+
+
+	def _sync(self):
+		'''
+		Flushes the open files (and syncs them to disk, if set).
+		'''
+		for f in self.handles.values():
+			f.flush()
+			if self.fsync:
+				os.fsync(f.fileno())
+		self.last_flush = time.monotonic()
+
+
+	def _release(self, outfile):
+		'''
+		Flushes (and syncs, if set) and closes one file.
+		'''
+		f = self.handles.pop(outfile, None)
+		if f:
+			f.flush()
+			if self.fsync:
+				os.fsync(f.fileno())
+			f.close()
+
+
+	def _close(self):
+		'''
+		Flushes and closes the open files.
+		'''
+		self._sync()
+		for f in self.handles.values():
+			f.close()
+		self.handles = {}
+
+
+	def _do(self, job):
+		'''
+		Carries out a job from the queue.
+		'''
+		if job[0] == 'add':
+			key, outfile, header, encoding, t, data = job[1:]
+			if key not in self.encoders:
+				self.encoders[key] = RecordEncoder(header['network'], header['station'], header['location'],
+												   header['channel'], header['sampling_rate'], encoding=encoding)
+			enc = self.encoders[key]
+			if (key in self.outfiles) and (self.outfiles[key] != outfile):
+				# the channel has moved on to a new (day's) file, so finish and close the old one
+				self._write(self.outfiles[key], enc.flush())
+				self._release(self.outfiles[key])
+			self.outfiles[key] = outfile
+			self._write(outfile, enc.add(t, data))
+		elif job[0] == 'flush':
+			for key, enc in self.encoders.items():
+				if len(enc.pending):
+					self._write(self.outfiles[key], enc.flush())
+		elif job[0] == 'close':
+			self._close()
+
+
+	def run(self):
+		'''
+		Carries out jobs from the queue until told to stop,
+		flushing open files every ``flush`` seconds.
+		'''
+		while True:
+			try:
+				job = self.queue.get(timeout=self.flush_interval if self.flush_interval > 0 else None)
+			except Empty:
+				job = None
+			try:
+				if job and (job[0] == 'stop'):
+					self._do(('flush',))
+					self._close()
+					break
+				if job:
+					self._do(job)
+				if self.handles and (time.monotonic() - self.last_flush >= self.flush_interval):
+					self._sync()
+			except Exception as e:
+				printE('Could not write data (%s)' % (e), self.sender)
@@ -1,24 +1,53 @@
 import sys
 from threading import Thread
-from rsudp import printM, printW, printE, helpers
+from select import select
+import socket as s
+from rsudp import printM, printW, printE
 import rsudp.raspberryshake as RS
 from rsudp.test import TEST
 
+DONTWAIT = getattr(s, 'MSG_DONTWAIT', 0)	# non-blocking receive flag (not available on Windows)
+
+
+def _named(msg):
+	'''
+	Describes the detector an ``ALARM`` or ``RESET`` message is from, for logging.
+	'''
+	return (' (detector %s)' % msg.name) if msg.name else ''
+
 
 class Producer(Thread):
 	'''
 	Data Producer thread (see :ref:`producer-consumer`) which receives data from the port
 	and puts it on the queue to be passed to the master consumer (:py:class:`rsudp.c_consumer.Consumer`).
-	The producer also looks for flags in each consumer
+	Each data packet is parsed exactly once here, and the resulting
+	:py:class:`rsudp.raspberryshake.Packet` record is what gets passed on to every
+	sub-consumer, so none of them need to decode the raw bytes again.
+	Malformed data packets are counted and dropped.
+	Control messages are likewise passed on as
+	:py:class:`rsudp.raspberryshake.Message` objects
+	(:py:class:`rsudp.raspberryshake.Alarm`, :py:class:`rsudp.raspberryshake.Term`, etc.).
+	The producer also watches for flags in each consumer
 	that indicate whether they are ``alive==False``. If so, the Producer will
 	quit gracefully and put a TERM message on the queue, which should stop all running
 	consumers.
 
+	.. versionchanged:: 1.1.2 the Producer registers itself as the
+		:py:data:`notifier` of each :py:class:`rsudp.raspberryshake.ConsumerThread`,
+		which tells it about alarm, reset, and exit flags the moment they are set.
+		Only other kinds of threads still have their flags checked after each packet.
+
+	.. versionchanged:: 1.1.2 each time it wakes up, the Producer reads every
+		datagram already waiting on the socket (up to ``batch`` of them) and
+		passes them on as one list, so a burst of packets (for example after a
+		wifi dropout) is cleared from the kernel's socket buffer before it can overflow.
+
 	:param queue.Queue queue: The master queue, used to pass data to :py:class:`rsudp.c_consumer.Consumer`
 	:param list threads: The list of :py:class:`threading.Thread` s to monitor for status changes
+	:param int batch: the maximum number of datagrams to read per wakeup
 	'''
 
-	def __init__(self, queue, threads, testing=False):
+	def __init__(self, queue, threads, testing=False, batch=64):
 		"""
 		Initializing Producer thread. 
 		
@@ -30,25 +59,71 @@ class Producer(Thread):
 		self.threads = threads
 		self.stop = False
 		self.testing = testing
+		self.polled = []	# threads that can't notify the producer, so must be checked after each packet
+
+		for thread in self.threads:
+			if isinstance(thread, RS.ConsumerThread):
+				thread.notifier = self._notify
+				if not thread.alive:
+					self.stop = True
+			else:
+				self.polled.append(thread)
 
 		self.firstaddr = ''
 		self.blocked = []
 
+		self.batch = max(int(batch), 1)
+		self.buf = bytearray(4096)			# reused receive buffer
+		self.view = memoryview(self.buf)
+
 		printM('Starting.', self.sender)
 
 
+	def _recv_batch(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Waits for a datagram, then reads any others that are already
+		waiting without blocking, up to ``self.batch`` in total.
+		Datagrams are received into a preallocated buffer
+		and copied out as :py:class:`bytes`.
+
+		:rtype: list
+		:return: a list of ``(data, addr)`` tuples
+		'''
+		sock, view = RS.sock, self.view
+		n, addr = sock.recvfrom_into(self.buf)
+		batch = [(view[:n].tobytes(), addr)]
+		while len(batch) < self.batch:
+			if (not DONTWAIT) and (not select([sock], [], [], 0)[0]):
+				break
+			try:
+				n, addr = sock.recvfrom_into(self.buf, 0, DONTWAIT)
+			except (BlockingIOError, InterruptedError):
+				break
+			batch.append((view[:n].tobytes(), addr))
+		return batch
+
+
 	def _filter_sender(self, data, addr):
 		'''
-		Filter the message sender and put data on the consumer queue.
+		Filter the message sender and return the item to put on the consumer queue.
+
+		:rtype: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message or bytes or NoneType
+		:return: the parsed item, or ``None`` if there is nothing to pass on
 		'''
 		if self.firstaddr == '':
 			self.firstaddr = addr[0]
 			printM('Receiving UDP data from %s' % (self.firstaddr), self.sender)
 		if (self.firstaddr != '') and (addr[0] == self.firstaddr):
-			self.queue.put(data)
-			if data.decode('utf-8') == 'TERM':
-				RS.producer = False
-				self.stop = True
+			if data.startswith(b'{'):
+				return RS.parse_packet(data)
+			else:
+				m = RS.parse_msg(data)
+				if isinstance(m, RS.Term):
+					RS.producer = False
+					self.stop = True
+				return m if m else data
 		else:
 			if addr[0] not in self.blocked:
 				printM('Another IP (%s) is sending UDP data to this port. Ignoring...'
@@ -56,24 +131,61 @@ class Producer(Thread):
 				self.blocked.append(addr[0])
 
 
+	def _notify(self, thread, flag, value):
+		'''
+		.. versionadded:: 1.1.2
+
+		Called by a :py:class:`rsudp.raspberryshake.ConsumerThread` (from its own thread)
+		as soon as it raises one of its flags, so that the
+		``ALARM`` or ``RESET`` message goes out right away.
+
+		:param rsudp.raspberryshake.ConsumerThread thread: the thread raising the flag
+		:param str flag: ``'alarm'``, ``'alarm_reset'``, or ``'alive'``
+		:param value: the new value of the flag
+		'''
+		if flag == 'alarm':
+			# send the ALARM message to the queues
+			msg = value if isinstance(value, RS.Alarm) else RS.Alarm(value)
+			self.queue.put(msg)
+			printM('%s thread has indicated alarm state%s, sending ALARM message to queues'
+					% (thread.sender, _named(msg)), sender=self.sender)
+			# now re-arm the trigger
+			thread._alarm = False
+		elif flag == 'alarm_reset':
+			# send a RESET message
+			msg = value if isinstance(value, RS.Reset) else RS.Reset(value)
+			self.queue.put(msg)
+			printM('%s thread has indicated alarm reset%s, sending RESET message to queues'
+					% (thread.sender, _named(msg)), sender=self.sender)
+			# re-arm the trigger
+			thread._alarm_reset = False
+		elif flag == 'alive':
+			# if a thread stops, set the stop flag
+			self.stop = True
+
+
 	def _tasks(self):
 		'''
-		Execute tasks based on the states of sub-consumers.
+		Execute tasks based on the states of sub-consumers
+		that are not :py:class:`rsudp.raspberryshake.ConsumerThread` objects
+		(and so cannot notify the Producer themselves).
 		'''
-		for thread in self.threads:
+		for thread in self.polled:
 			# for each thread here
 			if thread.alarm:
 				# if there is an alarm in a sub thread, send the ALARM message to the queues
-				self.queue.put(helpers.msg_alarm(thread.alarm))
-				printM('%s thread has indicated alarm state, sending ALARM message to queues'
-						% thread.sender, sender=self.sender)
+				msg = thread.alarm if isinstance(thread.alarm, RS.Alarm) else RS.Alarm(thread.alarm)
+				self.queue.put(msg)
+				printM('%s thread has indicated alarm state%s, sending ALARM message to queues'
+						% (thread.sender, _named(msg)), sender=self.sender)
 				# now re-arm the trigger
 				thread.alarm = False
 			if thread.alarm_reset:
 				# if there's an alarm_reset flag in a sub thread, send a RESET message
-				self.queue.put(helpers.msg_reset(thread.alarm_reset))
-				printM('%s thread has indicated alarm reset, sending RESET message to queues'
-						% thread.sender, sender=self.sender)
+				msg = thread.alarm_reset if isinstance(thread.alarm_reset, RS.Reset) else RS.Reset(thread.alarm_reset)
+				self.queue.put(msg)
+				printM('%s thread has indicated alarm reset%s, sending RESET message to queues'
+						% (thread.sender, _named(msg)), sender=self.sender)
 				# re-arm the trigger
 				thread.alarm_reset = False
 			if not thread.alive:
@@ -89,9 +201,19 @@ class Producer(Thread):
 		"""
 		RS.producer = True
 		while RS.producer:
-			data, addr = RS.sock.recvfrom(4096)
-			self._filter_sender(data, addr)
-			self._tasks()
+			items = []
+			for data, addr in self._recv_batch():
+				p = self._filter_sender(data, addr)
+				if isinstance(p, RS.Term):
+					break			# the TERM message is sent once, below
+				if p is not None:
+					items.append(p)
+				if self.stop:
+					break
+			if items:
+				self.queue.put(items)
+			if self.polled:
+				self._tasks()
 			if self.stop:
 				RS.producer = False
 				break
@@ -99,7 +221,9 @@ class Producer(Thread):
 				TEST['x_data'][1] = True
 
 		print()
+		if RS.BADPKTS:
+			printW('%s malformed data packets were rejected.' % (RS.BADPKTS), self.sender)
 		printM('Sending TERM signal to threads...', self.sender)
-		self.queue.put(helpers.msg_term())
+		self.queue.put(RS.Term())
 		self.stop = True
 		sys.exit()
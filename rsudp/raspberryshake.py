@@ -1,7 +1,10 @@
 import numpy as np
 import os, platform
+import math
 import socket as s
 import signal
+from collections import namedtuple
+from time import monotonic
 from obspy import UTCDateTime
 from obspy.core.stream import Stream
 from obspy import read_inventory, read
@@ -14,11 +17,14 @@ from . import __version__
 
 initd, sockopen = False, False
 qsize = 2048 			# max queue size
+overrun = 'drop'		# what to do when a consumer falls qsize messages behind ('drop' or 'block')
 port = 8888				# default listening port
+rcvbuf = 0				# socket receive buffer size in bytes (0 uses the OS default)
 to = 10					# socket test timeout
 firstaddr = ''			# the first address data is received from
 inv = False				# station inventory
 INVWARN = False			# warning when inventory attachment fails
+BADPKTS = 0				# number of malformed data packets rejected by parse_packet
 region = False
 producer = False 		# flag for producer status
 stn = 'Z0000'			# station name
@@ -100,7 +106,7 @@ def handler(signum, frame, ip=ip):
 	raise IOError('No data received')
 
 
-def initRSlib(dport=port, rsstn='Z0000', timeout=10):
+def initRSlib(dport=port, rsstn='Z0000', timeout=10, rbuf=0):
 	'''
 	.. role:: pycode(code)
 		:language: python
@@ -124,12 +130,13 @@ def initRSlib(dport=port, rsstn='Z0000', timeout=10):
 	:param int dport: The local port the Raspberry Shake is sending UDP data packets to. Defaults to :pycode:`8888`.
 	:param str rsstn: The name of the station (something like :pycode:`'RCB43'` or :pycode:`'S0CDE'`)
 	:param int timeout: The number of seconds for :py:func:`rsudp.raspberryshake.set_params` to wait for data before an error is raised (zero for unlimited wait)
+	:param int rbuf: The size in bytes to request for the socket's receive buffer (zero for the OS default; added in version 1.1.2)
 
 	:rtype: str
 	:return: The instrument channel as a string
 
 	'''
-	global port, stn, to, initd, port
+	global port, stn, to, initd, port, rcvbuf
 	global producer
 	sender = 'RS lib'
 	printM('Initializing rsudp v %s.' % (__version__), sender)
@@ -165,6 +172,12 @@ def initRSlib(dport=port, rsstn='Z0000', timeout=10):
 	except Exception as e:
 		printE('Details - %s' % e)
 
+	try:						# set socket receive buffer size
+		rcvbuf = int(rbuf) if rbuf else 0
+	except ValueError as e:
+		printW('Invalid socket receive buffer size %s, using the OS default. Details: %s' % (rbuf, e))
+		rcvbuf = 0
+
 	initd = True				# if initialization goes correctly, set initd to true
 	openSOCK()					# open a socket
 	printM('Waiting for UDP data on port %s...' % (port), sender)
@@ -190,6 +203,11 @@ def openSOCK(host=''):
 		HP = '%s:%s' % ('localhost',port)
 		printM("Opening socket on %s (HOST:PORT)"
 				% HP, 'openSOCK')
+		if rcvbuf:
+			# a larger kernel buffer absorbs bursts of packets (e.g. after a wifi dropout)
+			sock.setsockopt(s.SOL_SOCKET, s.SO_RCVBUF, rcvbuf)
+			printM('Socket receive buffer set to %s bytes (requested %s)'
+					% (sock.getsockopt(s.SOL_SOCKET, s.SO_RCVBUF), rcvbuf), 'openSOCK')
 		try:
 			sock.bind((host, port))
 			sockopen = True
@@ -277,10 +295,12 @@ def getCHN(DP):
 		'EHZ'
 
 	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse channel information from
-	:type DP: bytes
+	:type DP: bytes or rsudp.raspberryshake.Packet
 	:rtype: str
 	:return: Returns the instrument channel as a string.
 	'''
+	if isinstance(DP, Packet):
+		return DP.cha
 	return str(DP.decode('utf-8').split(",")[0][1:]).strip("\'")
 	
 def getTIME(DP):
@@ -305,10 +325,12 @@ def getTIME(DP):
 		UTCDateTime(2020, 2, 21, 19, 58, 50, 292000)
 
 	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse time information from
-	:type DP: bytes
+	:type DP: bytes or rsudp.raspberryshake.Packet
 	:rtype: float
 	:return: Timestamp in decimal seconds since 1970-01-01 00:00:00Z
 	'''
+	if isinstance(DP, Packet):
+		return DP.time
 	return float(DP.split(b",")[1])
 
 def getSTREAM(DP):
@@ -330,12 +352,313 @@ def getSTREAM(DP):
 		 18481, 15916, 13836, 13073, 14462, 17628, 19388]
 
 	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse stream information from
-	:type DP: bytes
+	:type DP: bytes or rsudp.raspberryshake.Packet
 	:rtype: list
 	:return: List of data samples in the packet
 	'''
+	if isinstance(DP, Packet):
+		return DP.data.tolist()
 	return list(map(int, DP.decode('utf-8').replace('}','').split(',')[2:]))
 
+class Packet(namedtuple('Packet', ['cha', 'time', 'data', 'raw'])):
+	'''
+	.. versionadded:: 1.1.2
+
+	A compact, immutable record of a parsed Raspberry Shake data packet,
+	as returned by :py:func:`rsudp.raspberryshake.parse_packet`.
+
+	.. code-block:: python
+
+		>>> p = rs.parse_packet(d)
+		>>> p.cha, p.time, p.data[:3]
+		('EHZ', 1582315130.292, array([14168, 14927, 16112], dtype=int32))
+
+	Since version 1.1.2, the :py:class:`rsudp.p_producer.Producer` parses each
+	data packet once and puts these records on the queue instead of raw bytes.
+
+	:ivar str cha: the instrument channel
+	:ivar float time: timestamp of the first sample in decimal seconds since 1970-01-01 00:00:00Z
+	:ivar numpy.ndarray data: the samples in the packet as an ``int32`` array
+	:ivar bytes raw: the packet as it was received (used to forward it unchanged)
+	'''
+	__slots__ = ()
+
+
+def parse_packet(DP):
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	Parse a data packet in a single pass, returning its channel, timestamp,
+	and samples together as a :py:class:`rsudp.raspberryshake.Packet`.
+	This is the preferred way to decode data packets, since the separate
+	:py:func:`rsudp.raspberryshake.getCHN`, :py:func:`rsudp.raspberryshake.getTIME`
+	and :py:func:`rsudp.raspberryshake.getSTREAM` functions each decode and split
+	the whole packet again.
+
+	Packets that cannot be parsed, or whose timestamp is not a finite number,
+	are counted in :pycode:`rsudp.raspberryshake.BADPKTS` and rejected (``None`` is returned).
+	A packet that has already been parsed is returned as-is, so consumers
+	can call this on anything they receive from the queue.
+
+	.. code-block:: python
+
+		>>> import rsudp.raspberryshake as rs
+		>>> rs.initRSlib(dport=8888, rsstn='R3BCF')
+		>>> d = rs.getDATA()
+		>>> p = rs.parse_packet(d)
+		>>> p.cha
+		'EHZ'
+		>>> p.time
+		1582315130.292
+		>>> p.data
+		array([14168, 14927, 16112, 17537, 18052, 17477, 15418, 13716, 15604,
+		       17825, 19637, 20985, 17325, 10439, 11510, 17678, 20027, 20207,
+		       18481, 15916, 13836, 13073, 14462, 17628, 19388], dtype=int32)
+
+	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse
+	:type DP: bytes or rsudp.raspberryshake.Packet
+	:rtype: rsudp.raspberryshake.Packet or NoneType
+	:return: The parsed packet, or ``None`` if the packet is malformed
+	'''
+	global BADPKTS
+	if isinstance(DP, Packet):
+		return DP
+	try:
+		head, t, samples = DP.split(b',', 2)
+		cha = head[1:].strip(b"\' ").decode('utf-8')
+		if (not cha) or (head[:1] != b'{'):
+			raise ValueError('no channel in packet')
+		t = float(t)
+		if not math.isfinite(t):
+			raise ValueError('timestamp is not a finite number: %s' % t)
+		return Packet(cha, t, np.array(samples.rstrip(b'} \r\n').split(b','), dtype=np.int32), DP)
+	except (ValueError, OverflowError, UnicodeDecodeError) as e:
+		BADPKTS += 1
+		if BADPKTS == 1:
+			printW('Rejected a malformed data packet (further rejections will be counted silently).', sender='parse_packet')
+			printW('Detail: %s' % e, sender='parse_packet', spaces=True)
+		return None
+
+
+class Message:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	Base class for the control messages passed along the queues
+	alongside :py:class:`rsudp.raspberryshake.Packet` data records.
+	Consumers dispatch on the message type
+	(for example :pycode:`isinstance(d, rs.Term)`)
+	rather than searching the message for a keyword.
+
+	Calling :py:func:`bytes` on a message gives its wire format,
+	which is the same as the one produced by the ``msg_*``
+	functions in :py:mod:`rsudp.helpers`.
+	:py:func:`rsudp.raspberryshake.parse_msg` does the reverse.
+
+	Each message records when it was created
+	(:py:data:`issued`, a :py:func:`time.monotonic` value),
+	so that modules can measure how long it took to act on it
+	(see :py:func:`rsudp.raspberryshake.Message.latency`).
+	Message types with :pycode:`urgent = True`
+	(:py:class:`rsudp.raspberryshake.Alarm` and :py:class:`rsudp.raspberryshake.Reset`)
+	are delivered ahead of any data a module has not read yet
+	(see :py:class:`rsudp.ring.BroadcastRing`).
+	'''
+	__slots__ = ('issued',)
+	_fields = ()
+	kind = b''
+	urgent = False
+
+	def __init__(self):
+		self.issued = monotonic()
+
+	def latency(self):
+		'''
+		Returns the time elapsed since the message was created, in seconds.
+
+		:rtype: float
+		'''
+		return monotonic() - self.issued
+
+	def __bytes__(self):
+		return self.kind
+
+	def __repr__(self):
+		return '%s(%s)' % (self.__class__.__name__,
+						   ', '.join(repr(getattr(self, a)) for a in self._fields))
+
+	def __eq__(self, other):
+		return (type(self) is type(other)) and all(
+			getattr(self, a) == getattr(other, a) for a in self._fields)
+
+	__hash__ = None
+
+
+class DetectorMessage(Message):
+	'''
+	.. versionadded:: 1.1.2
+
+	Base class for the urgent messages a detector sends
+	(:py:class:`rsudp.raspberryshake.Alarm` and :py:class:`rsudp.raspberryshake.Reset`),
+	which only differ in their :py:data:`kind` tag.
+	Their wire format is the tag, the time, and (for one of the named detectors in
+	:py:class:`rsudp.c_alert.Alert`'s detector bank) the detector's name, separated by spaces.
+
+	:param obspy.core.utcdatetime.UTCDateTime time: the time of the alarm or reset
+	:param str name: the name of the detector that sent the message (``None`` for the main detector)
+	'''
+	__slots__ = _fields = ('time', 'name')
+	urgent = True
+
+	def __init__(self, time, name=None):
+		super().__init__()
+		self.time = time
+		self.name = name if name else None
+
+	def __bytes__(self):
+		if self.name:
+			return b'%s %s %s' % (self.kind, bytes(str(self.time), 'utf-8'),
+								   bytes(str(self.name), 'utf-8'))
+		return b'%s %s' % (self.kind, bytes(str(self.time), 'utf-8'))
+
+
+class Alarm(DetectorMessage):
+	'''
+	.. versionadded:: 1.1.2
+
+	The ``ALARM`` message, sent by :py:class:`rsudp.p_producer.Producer`
+	when a thread sets its alarm flag.
+
+	.. code-block:: python
+
+		>>> m = rs.Alarm(UTCDateTime(2020, 1, 1, 0, 0, 0, 599000, precision=3))
+		>>> bytes(m)
+		b'ALARM 2020-01-01T00:00:00.599Z'
+		>>> bytes(rs.Alarm(UTCDateTime(2020, 1, 1, 0, 0, 0, 599000, precision=3), 'regional'))
+		b'ALARM 2020-01-01T00:00:00.599Z regional'
+
+	:param obspy.core.utcdatetime.UTCDateTime time: the time of the alarm
+	:param str name: the name of the detector that sent the message (``None`` for the main detector)
+	'''
+	__slots__ = ()
+	kind = b'ALARM'
+
+
+class Reset(DetectorMessage):
+	'''
+	.. versionadded:: 1.1.2
+
+	The ``RESET`` message, sent by :py:class:`rsudp.p_producer.Producer`
+	when a thread sets its alarm reset flag.
+
+	.. code-block:: python
+
+		>>> m = rs.Reset(UTCDateTime(2020, 1, 1, 0, 0, 0, 599000, precision=3))
+		>>> bytes(m)
+		b'RESET 2020-01-01T00:00:00.599Z'
+		>>> bytes(rs.Reset(UTCDateTime(2020, 1, 1, 0, 0, 0, 599000, precision=3), 'regional'))
+		b'RESET 2020-01-01T00:00:00.599Z regional'
+
+	:param obspy.core.utcdatetime.UTCDateTime time: the time of the reset
+	:param str name: the name of the detector that sent the message (``None`` for the main detector)
+	'''
+	__slots__ = ()
+	kind = b'RESET'
+
+
+class ImgPath(Message):
+	'''
+	.. versionadded:: 1.1.2
+
+	The ``IMGPATH`` message, sent by :py:class:`rsudp.c_plot.Plot`
+	when it saves an event screenshot.
+
+	.. code-block:: python
+
+		>>> m = rs.ImgPath(UTCDateTime(2020, 1, 1, 0, 0, 0, 599000, precision=3),
+		...                '/home/pi/rsudp/screenshots/test.png')
+		>>> bytes(m)
+		b'IMGPATH 2020-01-01T00:00:00.599Z /home/pi/rsudp/screenshots/test.png'
+
+	:param obspy.core.utcdatetime.UTCDateTime time: the time of the event
+	:param str path: the path of the saved image
+	'''
+	__slots__ = _fields = ('time', 'path')
+	kind = b'IMGPATH'
+
+	def __init__(self, time, path):
+		super().__init__()
+		self.time = time
+		self.path = path
+
+	def __bytes__(self):
+		return b'%s %s %s' % (self.kind, bytes(str(self.time), 'utf-8'),
+							  bytes(str(self.path), 'utf-8'))
+
+
+class Term(Message):
+	'''
+	.. versionadded:: 1.1.2
+
+	The ``TERM`` message, the universal signal for rsudp threads to quit.
+	Unlike ``ALARM`` and ``RESET``, it is delivered in order with data,
+	so that modules can finish processing the data sent before it
+	(for example, :py:class:`rsudp.c_write.Write` writes its remaining data on exit).
+
+	.. code-block:: python
+
+		>>> bytes(rs.Term())
+		b'TERM'
+	'''
+	__slots__ = ()
+	kind = b'TERM'
+
+
+def parse_msg(msg):
+	'''
+	.. versionadded:: 1.1.2
+
+	Decode a bytes-formatted queue message (for example one
+	received from the port, or built by :py:func:`rsudp.helpers.msg_alarm`)
+	into a :py:class:`rsudp.raspberryshake.Message`.
+	Messages that are already decoded are returned as-is.
+
+	.. code-block:: python
+
+		>>> rs.parse_msg(b'RESET 2020-01-01T00:00:00.599Z')
+		Reset(UTCDateTime(2020, 1, 1, 0, 0, 0, 599000), None)
+		>>> rs.parse_msg(b'TERM')
+		Term()
+
+	:param msg: the message to decode
+	:type msg: bytes or rsudp.raspberryshake.Message
+	:rtype: rsudp.raspberryshake.Message or NoneType
+	:return: the decoded message, or ``None`` if it is not a control message
+	'''
+	if isinstance(msg, Message):
+		return msg
+	parts = msg.strip().split(b' ', 2)
+	try:
+		if parts[0] == b'TERM':
+			return Term()
+		t = UTCDateTime(parts[1].decode('utf-8'), precision=3)
+		name = parts[2].decode('utf-8') if len(parts) > 2 else None
+		for cls in (Alarm, Reset):
+			if parts[0] == cls.kind:
+				return cls(t, name)
+		if parts[0] == b'IMGPATH':
+			return ImgPath(t, parts[2].decode('utf-8'))
+	except (IndexError, ValueError, UnicodeDecodeError):
+		pass
+	return None
+
+
 def getTR(chn):				# DP transmission rate in msecs
 	'''
 	Get the transmission rate in milliseconds between consecutive packets from the same channel.
@@ -550,23 +873,21 @@ def make_trace(d):
 		>>> print(t)
 		AM.R3BCF.00.EHZ | 2020-02-21T19:58:50.292000Z - 2020-02-21T19:58:50.532000Z | 100.0 Hz, 25 samples
 
-	:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse Trace information from
-	:type d: bytes
-	:rtype: obspy.core.trace.Trace
-	:return: A fully formed Trace object to build a Stream with
+	:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse Trace information from, or a packet already parsed by :py:func:`rsudp.raspberryshake.parse_packet`
+	:type d: bytes or rsudp.raspberryshake.Packet
+	:rtype: obspy.core.trace.Trace or NoneType
+	:return: A fully formed Trace object to build a Stream with, or ``None`` if the packet is malformed
 	'''
 	global INVWARN
-	ch = getCHN(d)						# channel
-	if ch:
-		t = getTIME(d)				# unix epoch time since 1970-01-01 00:00:00Z; "timestamp" in obspy
-		st = getSTREAM(d)				# samples in data packet in list [] format
-		tr = Trace(data=np.ma.MaskedArray(st, dtype=np.int32))	# create empty trace
+	p = parse_packet(d)
+	if p:
+		tr = Trace(data=np.ma.MaskedArray(p.data, dtype=np.int32))	# create empty trace
 		tr.stats.network = net			# assign values
 		tr.stats.location = '00'
 		tr.stats.station = stn
-		tr.stats.channel = ch
+		tr.stats.channel = p.cha
 		tr.stats.sampling_rate = sps
-		tr.stats.starttime = UTCDateTime(t, precision=3)
+		tr.stats.starttime = UTCDateTime(p.time, precision=3)
 		if inv:
 			try:
 				tr.stats.response = inv.get_response(tr.id, tr.stats.starttime)
@@ -590,6 +911,8 @@ def update_stream(stream, d, **kwargs):
 	'''
 	Returns an updated Stream object with new data, merged down to one trace per available channel.
 	Most sub-consumers call this each time they receive data packets in order to keep their obspy stream current.
+	Malformed packets are counted (see :py:func:`rsudp.raspberryshake.parse_packet`)
+	and the stream is returned unchanged.
 
 	In this example, we make a stream object with some RS 1Dv7 data:
 
@@ -608,16 +931,22 @@ def update_stream(stream, d, **kwargs):
 
 
 	:param obspy.core.stream.Stream stream: The stream to update
-	:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse Stream information from
-	:type d: bytes
+	:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse Stream information from, or a packet already parsed by :py:func:`rsudp.raspberryshake.parse_packet`
+	:type d: bytes or rsudp.raspberryshake.Packet
 	:rtype: obspy.core.stream.Stream
 	:return: A seismic data stream
 	'''
-	while True:
-		try:
-			return stream.append(make_trace(d)).merge(**kwargs)
-		except TypeError:
-			pass
+	global BADPKTS
+	tr = make_trace(d)
+	if tr is None:
+		return stream
+	try:
+		return stream.append(tr).merge(**kwargs)
+	except TypeError:
+		# the trace could not be merged; drop it rather than retrying forever
+		stream.remove(tr)
+		BADPKTS += 1
+		return stream
 
 
 def copy(orig):
@@ -681,21 +1010,133 @@ class ConsumerThread(Thread):
 	.. code-block:: python
 
 		self.sender = 'ConsumerThread'  # module name used in logging
-		self.alarm = False              # the Producer reads this to set the ``ALARM`` state
-		self.alarm_reset = False        # the Producer reads this to set the ``RESET`` state
+		self.alarm = False              # set this to a UTCDateTime to send an ``ALARM`` message
+		self.alarm_reset = False        # set this to a UTCDateTime to send a ``RESET`` message
 		self.alive = True               # this is used to keep the main ``for`` loop running
 
+	.. versionchanged:: 1.1.2
+
+		:py:data:`alarm`, :py:data:`alarm_reset`, and :py:data:`alive` are now properties.
+		Setting one of them calls the :py:data:`notifier` function registered
+		by the :py:class:`rsudp.p_producer.Producer`, which sends the
+		``ALARM`` or ``RESET`` message (or begins shutting down) right away,
+		instead of the Producer checking every thread's flags each time it
+		receives a packet. Once the message is sent, the flag is set back to ``False``.
+		The flags can also be set to an :py:class:`rsudp.raspberryshake.Alarm`
+		or :py:class:`rsudp.raspberryshake.Reset` message (for example one with a detector name),
+		which is then sent as it is.
+
+	.. versionadded:: 1.1.2
+
+		Lightweight modules can also run as coroutines on a single event loop
+		when the asyncio runtime (:py:mod:`rsudp.aio`) is enabled, instead of in their own thread.
+		To allow this, a module handles each queue item in a ``process(d)`` method
+		and sets the :py:data:`aio` class attribute to ``'inline'``
+		(``process`` never blocks, so it is called on the event loop) or ``'executor'``
+		(``process`` may block, so control messages are handled in a worker thread).
+		Anything the module needs before handling its first item (for example opening a socket)
+		goes in :py:func:`setup`, which the runtime calls first.
+		Modules that leave :py:data:`aio` set to ``False`` always run in their own thread.
+
+	.. versionadded:: 1.1.2
+
+		When the thread's ``run`` method returns (or raises an exception),
+		the module's :py:class:`rsudp.ring.RingReader` (its :py:data:`queue`) is detached from the ring,
+		so that a module that has stopped reading can't hold back the others
+		when the ``'block'`` overrun policy is in use.
+
 	For more information on creating your own consumer threads,
 	see :ref:`add_your_own`.
 
 	'''
+	aio = False			# how the asyncio runtime runs this module (False, 'inline', or 'executor')
+	notifier = None		# called as notifier(thread, flag, value) when a flag is raised
+	_alarm = False
+	_alarm_reset = False
+	_alive = True
+
 	def __init__(self):
 		super().__init__()
 		self.sender = 'ConsumerThread'	# used in logging
-		self.alarm = False				# the producer reads this
-		self.alarm_reset = False		# the producer reads this
+		self.alarm = False				# the producer is notified when this is set
+		self.alarm_reset = False		# the producer is notified when this is set
 		self.alive = True				# this is used to keep the main for loop running
 
+	def start(self):
+		'''
+		Starts the thread. The module's ``run`` method is called in the new thread,
+		and its queue is detached from the broadcast ring when ``run`` ends.
+		'''
+		run = self.run
+		def _run():
+			try:
+				run()
+			finally:
+				self.detach()
+		self.run = _run
+		super().start()
+
+	def detach(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Detaches the module's queue from the broadcast ring, if it reads from one
+		(see :py:func:`rsudp.ring.BroadcastRing.remove`).
+		'''
+		q = getattr(self, 'queue', None)
+		if getattr(q, 'ring', None) is not None:
+			q.close()
+
+	def setup(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Called by the asyncio runtime (:py:mod:`rsudp.aio`) before a module
+		with an :py:data:`aio` mode handles its first queue item.
+		Does nothing by default.
+		'''
+		pass
+
+	@property
+	def alarm(self):
+		'''
+		The time of the latest alarm, or ``False``.
+		'''
+		return self._alarm
+
+	@alarm.setter
+	def alarm(self, value):
+		self._alarm = value
+		if value and self.notifier:
+			self.notifier(self, 'alarm', value)
+
+	@property
+	def alarm_reset(self):
+		'''
+		The time of the latest alarm reset, or ``False``.
+		'''
+		return self._alarm_reset
+
+	@alarm_reset.setter
+	def alarm_reset(self, value):
+		self._alarm_reset = value
+		if value and self.notifier:
+			self.notifier(self, 'alarm_reset', value)
+
+	@property
+	def alive(self):
+		'''
+		Whether the thread is running. Setting this to ``False``
+		tells the Producer to shut rsudp down.
+		'''
+		return self._alive
+
+	@alive.setter
+	def alive(self, value):
+		self._alive = value
+		if (not value) and self.notifier:
+			self.notifier(self, 'alive', value)
+
 
 if __name__ == '__main__':
 	pass
@@ -0,0 +1,553 @@
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+from scipy.fft import next_fast_len
+from obspy import UTCDateTime
+from obspy.core.trace import Trace
+from obspy.core.inventory.response import PolynomialResponseStage
+from obspy.signal.invsim import cosine_sac_taper, invert_spectrum
+from obspy.signal.util import _npts2nfft
+import rsudp.raspberryshake as rs
+from rsudp.buffer import ChannelBuffer
+
+
+class ResponseCache:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A cache of inverse instrument responses in the frequency domain.
+
+	:py:func:`obspy.core.trace.Trace.remove_response` evaluates the
+	instrument response, the ``pre_filt`` taper, and the water level
+	every time it is called, even though they only depend on the channel,
+	the output units, the sampling rate, and the FFT length.
+	This class evaluates that product once for each combination
+	and keeps it, so that removing the response from a window of data
+	becomes one forward FFT, a multiplication, and one inverse FFT.
+	The results are the same as those of
+	:py:func:`obspy.core.trace.Trace.remove_response`
+	(with ``taper=False`` and ``zero_mean=True``).
+
+	The cache is shared between threads, and is cleared if the inventory
+	(:pycode:`rsudp.raspberryshake.inv`) changes.
+	:py:data:`hits` and :py:data:`misses` count how often a response
+	was found in the cache and how often it had to be evaluated.
+
+	.. code-block:: python
+
+		>>> from rsudp.response import CACHE
+		>>> CACHE.remove_response(trace, output='VEL', pre_filt=[0.1, 0.6, 95, 100], water_level=4.5)
+		>>> CACHE.hits, CACHE.misses
+		(0, 1)
+
+	:param int maxsize: the number of responses to keep (least recently used ones are dropped first)
+	'''
+
+	def __init__(self, maxsize=32):
+		'''
+		Initializes the cache.
+		'''
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self._inv = None
+		self._cache = OrderedDict()
+		self._lock = Lock()
+
+
+	def clear(self):
+		'''
+		Empties the cache and resets the counters.
+		'''
+		with self._lock:
+			self._cache.clear()
+			self.hits, self.misses = 0, 0
+
+
+	def _evaluate(self, response, delta, nfft, output, pre_filt, water_level):
+		'''
+		Evaluates the inverse response, as in :py:func:`obspy.core.trace.Trace.remove_response`.
+		'''
+		freq_response, freqs = response.get_evalresp_response(delta, nfft, output=output)
+		if water_level is None:
+			freq_response[0] = 0.0
+			freq_response[1:] = 1.0 / freq_response[1:]
+		else:
+			invert_spectrum(freq_response, water_level)
+		if pre_filt:
+			freq_response *= cosine_sac_taper(freqs, flimit=pre_filt)
+		return freq_response
+
+
+	def get(self, trace, nfft, output='VEL', pre_filt=None, water_level=60, inventory=None):
+		'''
+		Returns the inverse response for a trace, from the cache if possible.
+
+		:param obspy.core.trace.Trace trace: the trace (its id, sampling rate, and start time are used)
+		:param int nfft: the FFT length
+		:param str output: ``'DISP'``, ``'VEL'``, or ``'ACC'``
+		:param list pre_filt: the four corner frequencies of the frequency domain taper
+		:param float water_level: the water level in dB
+		:param inventory: the inventory to use (defaults to :pycode:`rsudp.raspberryshake.inv`)
+		:type inventory: obspy.core.inventory.inventory.Inventory
+		:rtype: numpy.ndarray
+		:return: the (shared, so do not modify it) complex inverse response, or ``None`` if the response can't be evaluated this way
+		'''
+		inv = inventory if inventory else rs.inv
+		key = (trace.id, output, trace.stats.sampling_rate, nfft,
+			   tuple(pre_filt) if pre_filt else None, water_level)
+		with self._lock:
+			if inv is not self._inv:
+				self._cache.clear()
+				self._inv = inv
+			if key in self._cache:
+				self._cache.move_to_end(key)
+				self.hits += 1
+				return self._cache[key]
+		response = inv.get_response(trace.id, trace.stats.starttime)
+		if (not response.response_stages) or isinstance(response.response_stages[0],
+														 PolynomialResponseStage):
+			return None		# polynomial responses are not evaluated in the frequency domain
+		inverse = self._evaluate(response, trace.stats.delta, nfft, output, pre_filt, water_level)
+		with self._lock:
+			self.misses += 1
+			self._cache[key] = inverse
+			while len(self._cache) > self.maxsize:
+				self._cache.popitem(last=False)
+		return inverse
+
+
+	def remove_response(self, trace, output='VEL', pre_filt=None, water_level=60, inventory=None):
+		'''
+		Removes the instrument response from a trace in place, using the cached
+		inverse response. Equivalent to :pycode:`trace.remove_response(inventory,
+		output=output, pre_filt=pre_filt, water_level=water_level, taper=False)`.
+
+		:param obspy.core.trace.Trace trace: the trace to deconvolve
+		:param str output: ``'DISP'``, ``'VEL'``, or ``'ACC'``
+		:param list pre_filt: the four corner frequencies of the frequency domain taper
+		:param float water_level: the water level in dB
+		:param inventory: the inventory to use (defaults to :pycode:`rsudp.raspberryshake.inv`)
+		:type inventory: obspy.core.inventory.inventory.Inventory
+		:rtype: obspy.core.trace.Trace
+		:return: the trace
+		'''
+		data = trace.data.astype(np.float64)
+		npts = len(data)
+		nfft = _npts2nfft(npts)
+		inverse = self.get(trace, nfft, output=output, pre_filt=pre_filt,
+						   water_level=water_level, inventory=inventory)
+		if inverse is None:
+			return trace.remove_response(inventory=inventory if inventory else rs.inv,
+										 output=output, pre_filt=pre_filt,
+										 water_level=water_level, taper=False)
+		data -= data.mean()
+		spec = np.fft.rfft(data, n=nfft)
+		spec *= inverse
+		spec[-1] = abs(spec[-1]) + 0.0j
+		trace.data = np.fft.irfft(spec)[0:npts]
+		return trace
+
+
+CACHE = ResponseCache()		# the cache shared by all consumers
+
+
+class Deconvolver:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A deconvolution service shared by the consumers that convert windows of data to physical units
+	(:py:class:`rsudp.c_plot.Plot` and :py:class:`rsudp.c_rsam.RSAM`).
+
+	Each of these consumers used to deconvolve its own copy of the raw data,
+	so with both set to ``VEL``, the same samples were deconvolved twice over.
+	Instead, the service keeps one buffer of raw counts for each channel,
+	fed with the windows the consumers ask about,
+	and the latest deconvolved window for each channel and unit.
+	A consumer whose window is covered by it (for example RSAM's short window,
+	right after Plot has asked for the same data with its longer one)
+	gets a view of the part that matches its own window,
+	so the data is neither deconvolved nor held in memory a second time.
+	Otherwise, the service deconvolves the consumer's window, extended to the newest
+	sample any consumer has seen, so that the consumers that are behind can use it.
+	A window is never deconvolved more than once for the same unit,
+	and no consumer's window is deconvolved with less context than it asked for.
+
+	``CHAN`` requests share the ``VEL`` (geophone) or ``ACC`` (accelerometer)
+	results of the channel they are for.
+
+	Deconvolution happens outside the service's own lock, under a lock for the channel and unit,
+	so only requests for the same channel and unit wait for each other
+	(and the ones that wait then use the window that was just deconvolved).
+	:py:data:`computed` and :py:data:`served` count how many windows were
+	deconvolved, and how many requests were answered from a window that
+	had already been deconvolved.
+
+	.. code-block:: python
+
+		>>> from rsudp.response import DECONVOLVER
+		>>> vel = DECONVOLVER.get(raw_trace, 'VEL', deconvolve=my_function)
+
+	.. warning::
+
+		The data of the traces returned by :py:func:`rsudp.response.Deconvolver.get`
+		is shared with other consumers and is read-only.
+		Copy it before modifying it in place.
+
+	:param float slack: how many seconds of data to keep in each raw buffer beyond the longest window asked for
+	'''
+
+	def __init__(self, slack=10):
+		'''
+		Initializes the service.
+		'''
+		self.slack = slack
+		self.computed = 0
+		self.served = 0
+		self._buffers = {}		# channel: ChannelBuffer of raw counts
+		self._results = {}		# (channel, unit): (buffer, first index, deconvolved trace)
+		self._locks = {}		# (channel, unit): Lock held while deconvolving
+		self._lock = Lock()		# protects the buffers, results, and counters
+
+
+	def clear(self):
+		'''
+		Forgets all data and resets the counters.
+		'''
+		with self._lock:
+			self._buffers.clear()
+			self._results.clear()
+			self._locks.clear()
+			self.computed, self.served = 0, 0
+
+
+	def _feed(self, trace):
+		'''
+		Copies the samples of a raw trace that the channel's buffer does not have yet into it,
+		replacing the buffer with a longer one if the trace does not fit.
+		'''
+		cha = trace.stats.channel
+		sps = trace.stats.sampling_rate
+		buf = self._buffers.get(cha)
+		if (buf is None) or (buf.sps != sps) or (buf.capacity < trace.stats.npts):
+			buf = ChannelBuffer(cha, seconds=trace.stats.npts / sps + self.slack,
+								sps=sps, dtype=trace.data.dtype)
+			self._buffers[cha] = buf
+			for key in [k for k in self._results if k[0] == cha]:
+				del self._results[key]
+		t = float(trace.stats.starttime)
+		if buf.t0 is not None:
+			start = buf.index(t)
+			if buf.tail <= start <= buf.head:
+				# the consumers see the same packets, so only the newest samples need copying
+				skip = buf.head - start
+				if skip >= trace.stats.npts:
+					return buf
+				buf.append(buf.time(buf.head), trace.data[skip:])
+				return buf
+		buf.append(t, trace.data)
+		return buf
+
+
+	@staticmethod
+	def _header(stats, starttime=None):
+		'''
+		Copies the parts of a trace header that identify the data
+		(much faster than copying the whole header).
+		'''
+		return {'network': stats.network, 'station': stats.station,
+				'location': stats.location, 'channel': stats.channel,
+				'sampling_rate': stats.sampling_rate,
+				'starttime': starttime if starttime else stats.starttime}
+
+
+	def get(self, trace, unit, deconvolve):
+		'''
+		Returns a raw trace converted to physical units,
+		from the shared deconvolved window if it covers the trace,
+		or after deconvolving a new window if it does not.
+
+		:param obspy.core.trace.Trace trace: the raw trace (in counts, without gaps)
+		:param str unit: the unit to convert to (for example ``'VEL'``); requests for the same channel and unit share results
+		:param deconvolve: a function that deconvolves a trace in place, used when a new window is needed
+		:type deconvolve: function
+		:rtype: obspy.core.trace.Trace
+		:return: a new trace with the same times as ``trace``, whose data is a read-only view of the shared window
+		'''
+		key = (trace.stats.channel, unit)
+		with self._lock:
+			lock = self._locks.setdefault(key, Lock())
+		with lock:
+			with self._lock:
+				buf = self._feed(trace)
+				start = buf.index(trace.stats.starttime)
+				end = start + trace.stats.npts
+				owner, first, result = self._results.get(key, (None, None, None))
+				new = not ((owner is buf) and (first <= start) and (first + result.stats.npts >= end))
+				if not new:
+					self.served += 1
+				else:
+					window = buf.trace(start=start, fill_value='latest')
+					first = buf.index(window.stats.starttime)
+					if first > start:
+						# the buffer was just replaced and does not hold this window, so deconvolve it on its own
+						result = Trace(data=trace.data.copy(), header=self._header(trace.stats))
+						first, owner = start, None
+					else:
+						result = Trace(data=window.data.copy(),
+									   header=self._header(trace.stats, window.stats.starttime))
+						owner = buf
+					result.stats.units = None
+			if new:
+				# a new window: deconvolve it without holding up requests for other channels and units
+				deconvolve(result)
+				result.data.setflags(write=False)
+				with self._lock:
+					self.computed += 1
+					if (owner is not None) and (self._buffers.get(key[0]) is owner):
+						self._results[key] = (owner, first, result)
+		out = Trace(data=result.data[start - first:end - first], header=self._header(trace.stats))
+		out.stats.units = result.stats.units
+		return out
+
+
+DECONVOLVER = Deconvolver()		# the service shared by all consumers
+
+
+class StreamDeconvolver:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	Converts one channel to physical units as a continuous stream,
+	by overlap-save block convolution with the channel's inverse instrument response.
+
+	Deconvolving a sliding window (as :py:func:`rsudp.helpers.deconvolve` does)
+	recomputes the same samples every time the window moves,
+	and the edge effects change from one window to the next.
+	This class turns the inverse response (with the same ``pre_filt`` taper and water level)
+	into a finite impulse response ``seconds`` long, and convolves the data with it
+	one block at a time, so each sample is processed about once and the output is
+	one continuous series, suitable for archiving (see :py:class:`rsudp.c_write.Write`).
+
+	The price is latency: the impulse response is centred, so the output
+	lags the input by half of ``seconds``, plus up to one block while samples are collected.
+	:py:class:`rsudp.c_alert.Alert` uses a 10 second impulse response and blocks of one packet,
+	so that its triggers are delayed by about 5 seconds.
+	Over a long record, the output agrees with
+	:py:func:`obspy.core.trace.Trace.remove_response` to about 1% (RMS) with the default settings.
+
+	The filter starts from the first sample's value (as if it had always been there),
+	so the DC offset of raw counts does not cause a transient.
+	The response is the one in effect at the time of the first sample,
+	so archived data is converted with the response it was recorded with.
+
+	Packets are put back in time order: a packet that does not follow on from the previous one
+	is held until the missing samples arrive, and samples that were already received are ignored.
+	Only when ``reorder`` seconds of later data have arrived without the missing samples
+	is the gap taken to be real; the samples before it are then flushed and the filter starts again.
+
+	.. code-block:: python
+
+		>>> from rsudp.response import StreamDeconvolver
+		>>> vel = StreamDeconvolver('AM.R3BCF.00.EHZ', output='VEL', sps=100)
+		>>> for p in packets:
+		...     for t, data in vel.process(p.data, p.time):
+		...         print(t, len(data))
+
+	:param str seed_id: the channel's SEED id (for example ``'AM.R3BCF.00.EHZ'``), to look up its response
+	:param str output: ``'DISP'``, ``'VEL'``, ``'ACC'``, or ``'GRAV'`` (acceleration in units of Earth gravity)
+	:param float sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	:param float seconds: the length of the impulse response (rounded up to a power of two samples)
+	:param float block: the least number of seconds of data to convolve at a time (rounded up to an efficient FFT length)
+	:param list pre_filt: the four corner frequencies of the frequency domain taper (defaults to the ones :py:func:`rsudp.helpers.deconvolve` uses)
+	:param float water_level: the water level in dB
+	:param inventory: the inventory to use (defaults to :pycode:`rsudp.raspberryshake.inv`)
+	:type inventory: obspy.core.inventory.inventory.Inventory
+	:param float reorder: how many seconds of later data to wait for missing samples before treating them as a gap
+	:raise ValueError: if the output is not recognized, or the inventory has no such channel
+	'''
+
+	def __init__(self, seed_id, output='VEL', sps=None, seconds=40, block=10,
+				 pre_filt=None, water_level=4.5, inventory=None, reorder=1):
+		'''
+		Designs the blocks (the impulse response is worked out when the first samples arrive).
+		'''
+		if output not in ('DISP', 'VEL', 'ACC', 'GRAV'):
+			raise ValueError("output must be 'DISP', 'VEL', 'ACC', or 'GRAV', not '%s'" % (output))
+		self.seed_id = seed_id
+		self.output = output
+		self.sps = sps if sps else rs.sps
+		self.delta = 1. / self.sps
+		self.inventory = inventory if inventory else rs.inv
+		self.pre_filt = pre_filt if pre_filt else [0.1, 0.6, 0.95*self.sps, self.sps]
+		self.water_level = water_level
+		net, stn, loc, cha = seed_id.split('.')
+		if not len(self.inventory.select(network=net, station=stn, location=loc, channel=cha)):
+			raise ValueError('the inventory has no channel %s' % (seed_id))
+
+		# taps: a power of two, centred on the impulse (evaluated at 4x the resolution to limit aliasing)
+		self.taps = 1 << int(np.ceil(np.log2(seconds * self.sps)))
+		self.delay = self.taps // 2
+		# overlap-save: each FFT of nfft samples yields nfft - taps + 1 new output samples
+		self.nfft = next_fast_len(self.taps - 1 + int(np.ceil(block * self.sps)))
+		self.block = self.nfft - self.taps + 1
+		self.reorder = int(round(reorder * self.sps))
+		self._h = None			# the impulse response's FFT, from the response at the first sample's time
+		self.reset()
+
+
+	def _design(self, t):
+		'''
+		Evaluates the inverse response in effect at time ``t`` and turns it into the impulse response.
+		'''
+		response = self.inventory.get_response(self.seed_id, UTCDateTime(t))
+		inverse = CACHE._evaluate(response, self.delta, 4 * self.taps,
+								  'ACC' if self.output == 'GRAV' else self.output,
+								  self.pre_filt, self.water_level)
+		h = np.fft.irfft(inverse, 4 * self.taps)
+		h = np.concatenate((h[-self.delay:], h[:self.taps - self.delay]))
+		# cutting the impulse response short leaves it a little gain at 0 Hz, which the
+		# pre_filt taper should have removed, and which would turn the DC offset of raw counts
+		# into an offset in the output; take it out smoothly over the length of the filter
+		w = np.hanning(self.taps)
+		h -= h.sum() * w / w.sum()
+		if self.output == 'GRAV':
+			h /= rs.g
+		self._h = np.fft.rfft(h, self.nfft)
+
+
+	def reset(self):
+		'''
+		Forgets the filter state and any samples not yet processed.
+		'''
+		self._restart()
+		self._held = []			# packets waiting for the samples before them, as (time, data)
+
+
+	def _restart(self):
+		'''
+		Forgets the filter state, so that the next samples start it again.
+		'''
+		self._x = None			# the last taps - 1 samples processed, followed by the pending ones
+		self._pending = 0		# samples received but not yet processed
+		self._skip = self.delay	# outputs that belong to the samples the filter started from
+		self.t0 = None			# time of the first sample since the last restart
+		self.received = 0		# samples received since the last restart
+		self.sent = 0			# samples output since the last restart
+
+
+	def _convolve(self):
+		'''
+		Convolves the next full block and returns the output samples that belong to real data.
+		'''
+		y = np.fft.irfft(np.fft.rfft(self._x[:self.nfft]) * self._h, self.nfft)[self.taps - 1:]
+		self._x = self._x[self.block:]
+		self._pending -= self.block
+		if self._skip:
+			k = min(self._skip, len(y))
+			y = y[k:]
+			self._skip -= k
+		y = y[:self.received - self.sent]
+		self.sent += len(y)
+		return y
+
+
+	def _feed(self, data):
+		'''
+		Adds samples that follow on from the ones received so far, and convolves any full blocks.
+		'''
+		out = []
+		self._x = np.concatenate((self._x, data))
+		self._pending += len(data)
+		self.received += len(data)
+		while self._pending >= self.block:
+			ts = self.t0 + self.sent * self.delta
+			y = self._convolve()
+			if len(y):
+				out.append((ts, y))
+		return out
+
+
+	def _drain(self, hold=True):
+		'''
+		Feeds the held packets that follow on from the samples received so far.
+		If there are samples missing, waits for them (if ``hold`` is ``True``)
+		unless more than ``reorder`` samples have arrived after them,
+		in which case the output is flushed up to the gap and the filter starts again after it.
+		'''
+		out = []
+		while self._held:
+			self._held.sort(key=lambda p: p[0])
+			t, data = self._held[0]
+			if self.t0 is None:
+				self.t0 = t
+				self._x = np.full(self.taps - 1, data[0])
+			i = int(round((t - self.t0) * self.sps)) - self.received	# samples missing before this packet
+			if i <= 0:
+				self._held.pop(0)
+				if len(data) > -i:
+					out += self._feed(data[-i:])
+				continue
+			ahead = max(int(round((th - self.t0) * self.sps)) - self.received + len(dh)
+						for th, dh in self._held)
+			if hold and (ahead <= self.reorder):
+				break
+			out += self._finish()	# a real gap
+		return out
+
+
+	def process(self, data, t):
+		'''
+		Adds the samples of a packet, and returns any output that is ready.
+
+		:param numpy.ndarray data: the new samples (counts)
+		:param float t: time of the first sample in decimal seconds since 1970-01-01 00:00:00Z
+		:rtype: list
+		:return: a list of ``(time, data)`` pairs of continuous output (usually empty, sometimes one block)
+		'''
+		data = np.asarray(data, dtype=np.float64)
+		if not len(data):
+			return []
+		if self._h is None:
+			self._design(t)
+		self._held.append((float(t), data))
+		return self._drain()
+
+
+	def _finish(self):
+		'''
+		Outputs all samples received since the last restart
+		(as if the last sample continued unchanged), and restarts the filter.
+		'''
+		out = []
+		while (self.t0 is not None) and (self.sent < self.received):
+			ts = self.t0 + self.sent * self.delta
+			self._x = np.concatenate((self._x, np.full(self.block, self._x[-1])))
+			self._pending += self.block
+			y = self._convolve()
+			if len(y):
+				out.append((ts, y))
+		self._restart()
+		return out
+
+
+	def flush(self):
+		'''
+		Outputs all samples received so far, including any held back waiting for missing samples
+		(as if the last sample before each gap continued unchanged), and resets the filter.
+		Call this at shutdown.
+
+		:rtype: list
+		:return: a list of ``(time, data)`` pairs of continuous output
+		'''
+		out = self._drain(hold=False)
+		return out + self._finish()
@@ -0,0 +1,339 @@
+import asyncio
+from threading import Lock, Condition
+from collections import deque
+from queue import Empty
+import time
+from rsudp import printW
+import rsudp.raspberryshake as rs
+
+
+class BroadcastRing:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A single-writer, multi-reader broadcast ring.
+	This replaces the per-destination :py:class:`queue.Queue` copies that
+	:py:class:`rsudp.c_consumer.Consumer` used to fill: every message is
+	stored once, and each sub-consumer reads it through its own
+	:py:class:`rsudp.ring.RingReader` cursor.
+	Putting a message costs one lock acquisition
+	no matter how many readers there are.
+
+	Each reader can subscribe to a set of channels and control message types
+	(see :py:func:`rsudp.ring.BroadcastRing.reader`).
+	The writer only wakes readers that want the message it has just written,
+	and moves readers that are waiting for new messages past
+	the ones they have not subscribed to.
+	``TERM`` messages are always delivered to every reader.
+
+	Urgent control messages (``ALARM`` and ``RESET``, see
+	:py:class:`rsudp.raspberryshake.Message`) do not take up a place in the ring.
+	Instead, they go into a short priority queue in each subscribed reader,
+	which the reader empties before reading any more data,
+	so an alarm never waits behind a backlog of data packets.
+
+	What happens when a reader falls ``size`` messages behind
+	depends on the ``overrun`` policy:
+
+	- ``'drop'`` (the default): the writer keeps going and the slow
+	  reader skips ahead to the oldest message still in the ring.
+	  The skipped messages are counted in :py:data:`RingReader.dropped`.
+	  This means a slow consumer (for example one waiting to retry an upload)
+	  can never hold back data ingest for the others.
+	- ``'block'``: the writer waits until the slowest reader has caught up,
+	  which is how the old per-destination queues behaved.
+
+	.. code-block:: python
+
+		>>> from rsudp.ring import BroadcastRing
+		>>> ring = BroadcastRing(size=4)
+		>>> r = ring.reader()
+		>>> for i in range(6):
+		...     ring.put(i)
+		>>> r.get(), r.dropped
+		(2, 2)
+
+	:param int size: the number of messages the ring holds (defaults to :pycode:`rsudp.raspberryshake.qsize`)
+	:param str overrun: the overrun policy, ``'drop'`` or ``'block'`` (defaults to :pycode:`rsudp.raspberryshake.overrun`)
+	:raise ValueError: if the overrun policy is not recognized
+	'''
+
+	def __init__(self, size=None, overrun=None):
+		'''
+		Allocates the ring.
+		'''
+		self.size = size if size else rs.qsize
+		self.overrun = overrun if overrun else rs.overrun
+		if self.overrun not in ('drop', 'block'):
+			raise ValueError("overrun policy must be 'drop' or 'block', not '%s'" % (self.overrun))
+		self._items = [None] * self.size
+		self.head = 0		# sequence number of the next message to be written
+		self.readers = []
+		self._removed_dropped = 0	# messages skipped by readers that have since been removed
+		self._lock = Lock()
+		self._writable = Condition(self._lock)
+
+
+	def reader(self, name=None, channels=None, messages=None):
+		'''
+		Creates a new reader, starting at the next message to be written.
+
+		.. code-block:: python
+
+			>>> # data from EHZ only, plus ALARM and TERM messages
+			>>> r = ring.reader(channels=['EHZ'], messages=(rs.Alarm,))
+
+		:param str name: the name to use in overrun warnings (for example the consumer's ``sender``)
+		:param channels: the channels to receive data packets from (``None`` for all, an empty list for none)
+		:type channels: list or NoneType
+		:param messages: the control message types to receive (``None`` for all). :py:class:`rsudp.raspberryshake.Term` is always received.
+		:type messages: tuple or NoneType
+		:rtype: rsudp.ring.RingReader
+		'''
+		with self._lock:
+			r = RingReader(self, self.head, name=name, channels=channels, messages=messages)
+			self.readers.append(r)
+		return r
+
+
+	def remove(self, reader):
+		'''
+		Detaches a reader, so that it no longer holds back the writer
+		under the ``'block'`` policy.
+		:py:class:`rsudp.raspberryshake.ConsumerThread` does this when a module's thread exits,
+		so a module that stops reading (or crashes) cannot stop the ring.
+
+		:param rsudp.ring.RingReader reader: the reader to detach
+		'''
+		with self._lock:
+			if reader in self.readers:
+				self.readers.remove(reader)
+				self._removed_dropped += reader.dropped
+			self._writable.notify_all()
+
+
+	def _put(self, item):
+		'''
+		Writes one message. The lock must be held.
+		'''
+		if getattr(item, 'urgent', False):
+			for r in self.readers:
+				if r.wants(item):
+					r._urgent.append(item)
+					r._ready.notify()
+					if r.waker:
+						r.waker()
+			return
+		if self.overrun == 'block':
+			while self.readers and (self.head - min(r.cursor for r in self.readers) >= self.size):
+				self._writable.wait()
+		self._items[self.head % self.size] = item
+		for r in self.readers:
+			if r.wants(item):
+				r._ready.notify()
+				if r.waker:
+					r.waker()
+			elif r.cursor == self.head:
+				r.cursor += 1	# the reader is caught up, so it can skip this message right away
+		self.head += 1
+
+
+	def put(self, item):
+		'''
+		Writes a message to the ring and wakes any waiting readers.
+		Must only be called from one thread.
+
+		:param item: the message to broadcast
+		'''
+		with self._lock:
+			self._put(item)
+
+
+	def put_many(self, items):
+		'''
+		Writes several messages to the ring in order,
+		taking the lock only once.
+		Must only be called from the same thread as :py:func:`put`.
+
+		:param list items: the messages to broadcast
+		'''
+		with self._lock:
+			for item in items:
+				self._put(item)
+
+
+	@property
+	def dropped(self):
+		'''
+		The total number of messages skipped by all readers.
+
+		:rtype: int
+		'''
+		return self._removed_dropped + sum(r.dropped for r in self.readers)
+
+
+class RingReader:
+	'''
+	.. versionadded:: 1.1.2
+
+	One sub-consumer's read cursor into a :py:class:`rsudp.ring.BroadcastRing`.
+	Created by :py:func:`rsudp.ring.BroadcastRing.reader`.
+
+	Readers have the parts of the :py:class:`queue.Queue` interface that
+	consumers use (:py:func:`get`, :py:func:`get_nowait`, :py:func:`task_done`,
+	:py:func:`qsize`, and :py:func:`empty`),
+	so they can be passed to a consumer in place of a queue.
+
+	:param rsudp.ring.BroadcastRing ring: the ring to read from
+	:param int cursor: the sequence number of the first message to read
+	:param str name: the name to use in overrun warnings
+	:param list channels: the channels to receive data packets from (``None`` for all)
+	:param tuple messages: the control message types to receive (``None`` for all)
+	'''
+
+	def __init__(self, ring, cursor, name=None, channels=None, messages=None):
+		'''
+		Initializes the reader.
+		'''
+		self.ring = ring
+		self.cursor = cursor	# sequence number of the next message to read
+		self.dropped = 0		# messages skipped because this reader fell too far behind
+		self.name = name if name else 'RingReader'
+		self.channels = None if channels is None else frozenset(channels)
+		self.messages = None if messages is None else tuple(messages) + (rs.Term,)
+		self._urgent = deque()	# urgent control messages, read before anything in the ring
+		self._ready = Condition(ring._lock)
+		self.waker = None		# called by the writer when there is something to read (see aget)
+		self._event = None
+
+
+	def wants(self, item):
+		'''
+		Whether this reader is subscribed to a message.
+
+		:param item: the message
+		:rtype: bool
+		'''
+		if isinstance(item, rs.Packet):
+			return (self.channels is None) or (item.cha in self.channels)
+		return (self.messages is None) or isinstance(item, self.messages)
+
+
+	def get(self, block=True, timeout=None):
+		'''
+		Returns the next message, waiting for one if necessary.
+
+		:param bool block: whether to wait for a message if there are none
+		:param float timeout: the maximum number of seconds to wait (``None`` waits forever)
+		:raise queue.Empty: if no message is available
+		'''
+		ring = self.ring
+		skipped = 0
+		with ring._lock:
+			if block and (timeout is not None):
+				end = time.monotonic() + timeout
+			while True:
+				if self._urgent:
+					item = self._urgent.popleft()
+					break
+				if self.cursor == ring.head:
+					if ring.overrun == 'block':
+						ring._writable.notify()	# in case messages this reader skipped were holding back the writer
+					if not block:
+						raise Empty
+					if timeout is None:
+						self._ready.wait()
+					else:
+						remaining = end - time.monotonic()
+						if remaining <= 0:
+							raise Empty
+						self._ready.wait(remaining)
+					continue
+				if ring.head - self.cursor > ring.size:
+					# the writer has lapped this reader; skip to the oldest message still held
+					skipped += ring.head - ring.size - self.cursor
+					self.cursor = ring.head - ring.size
+				item = ring._items[self.cursor % ring.size]
+				self.cursor += 1
+				if self.wants(item):
+					break
+			if ring.overrun == 'block':
+				ring._writable.notify()
+		if skipped:
+			if not self.dropped:
+				printW('Fell behind and skipped %s messages (further overruns will be counted silently).'
+						% (skipped), sender=self.name)
+			self.dropped += skipped
+		return item
+
+
+	async def aget(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Coroutine version of :py:func:`get`, for readers used by coroutines
+		in the asyncio runtime (:py:mod:`rsudp.aio`).
+		Waits without blocking the event loop.
+
+		.. note::
+
+			This only works if the ring is written from the event loop's own thread,
+			and with the ``'drop'`` overrun policy
+			(a blocked writer would block the event loop).
+		'''
+		if self._event is None:
+			self._event = asyncio.Event()
+			self.waker = self._event.set
+		while True:
+			try:
+				return self.get(block=False)
+			except Empty:
+				# the writer runs on this thread, so nothing can be written in between
+				self._event.clear()
+			await self._event.wait()
+
+
+	def close(self):
+		'''
+		Detaches the reader from its ring (see :py:func:`rsudp.ring.BroadcastRing.remove`).
+		'''
+		self.ring.remove(self)
+
+
+	def get_nowait(self):
+		'''
+		Returns the next message without waiting.
+
+		:raise queue.Empty: if no message is available
+		'''
+		return self.get(block=False)
+
+
+	def task_done(self):
+		'''
+		Does nothing. Present for compatibility with :py:class:`queue.Queue`,
+		since messages do not need to be marked as processed.
+		'''
+		pass
+
+
+	def qsize(self):
+		'''
+		The number of messages waiting to be read
+		(this may include some that the reader has not subscribed to and will skip).
+
+		:rtype: int
+		'''
+		return min(self.ring.head - self.cursor, self.ring.size) + len(self._urgent)
+
+
+	def empty(self):
+		'''
+		Whether there are no messages waiting to be read.
+
+		:rtype: bool
+		'''
+		return (self.ring.head == self.cursor) and (not self._urgent)
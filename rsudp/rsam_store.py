@@ -0,0 +1,353 @@
+import os, sys
+import json
+import getopt
+import numpy as np
+from obspy import UTCDateTime
+from rsudp import printW, printE, settings_loc
+from rsudp import helpers
+
+SENDER = 'RSAMStore'
+
+# the on-disk record: the time (of the measurement, or of the start of a rollup period),
+# the number of measurements it summarizes, and the RSAM values
+RECORD = np.dtype([('time', '<f8'), ('n', '<u4'), ('mean', '<f4'),
+				   ('median', '<f4'), ('min', '<f4'), ('max', '<f4')])
+
+# rollup tiers: name and period in seconds, from finest to coarsest
+TIERS = (('1m', 60), ('10m', 600), ('1h', 3600))
+
+
+class _Rollup:
+	'''
+	The measurements collected so far for one rollup period.
+	'''
+	__slots__ = ('start', 'n', 'mean', 'median', 'min', 'max')
+
+	def __init__(self, start):
+		self.start = start
+		self.n = 0
+		self.mean, self.median = 0., 0.
+		self.min, self.max = np.inf, -np.inf
+
+	def add(self, rec):
+		n = int(rec['n'])
+		self.n += n
+		self.mean += float(rec['mean']) * n
+		self.median += float(rec['median']) * n
+		self.min = min(self.min, float(rec['min']))
+		self.max = max(self.max, float(rec['max']))
+
+	def record(self):
+		return np.array((self.start, self.n, self.mean / self.n, self.median / self.n,
+						 self.min, self.max), dtype=RECORD)
+
+
+class RSAMStore:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	An append-only on-disk time series of RSAM values for one channel,
+	with rollups to 1 minute, 10 minutes, and 1 hour kept up to date as values arrive.
+
+	Each tier is a file of fixed-width binary records (:py:data:`RECORD`, 28 bytes each)
+	named ``<station>.<channel>.<tier>.rsam``, where the tier is ``raw``, ``1m``, ``10m``, or ``1h``.
+	Because the records are fixed-width and in time order, a time range is found by binary search
+	on a memory map of the file, without reading the rest of it,
+	and a query over weeks of data can read one of the rollup tiers instead of every measurement.
+
+	A rollup record has the time its period starts, the number of measurements in it,
+	the weighted mean of their means and medians, and the lowest minimum and highest maximum.
+	Periods are written when the first value of the next period arrives,
+	so a rollup tier lags by up to one period; when the store is opened again,
+	periods that were still open are rebuilt from the tier below.
+
+	.. code-block:: python
+
+		>>> store = RSAMStore('/home/pi/rsudp/rsam', 'R3BCF', 'EHZ')
+		>>> store.append(UTCDateTime.now(), [1254.3, 1180.0, 2, 5390])
+		>>> store.query(UTCDateTime.now() - 86400*30, max_points=1000)['mean']
+		array([1201.6, 1188.9, ...], dtype=float32)
+
+	:param str directory: the directory to keep the files in
+	:param str stn: the station name
+	:param str cha: the channel name
+	:param bool readonly: ``True`` to only query the store (does not open the files for writing or rebuild open periods)
+	'''
+	def __init__(self, directory, stn, cha, readonly=False):
+		'''
+		Opens the store, and rebuilds any open rollup periods.
+		'''
+		self.directory = os.path.abspath(os.path.expanduser(directory))
+		self.stn, self.cha = stn, cha
+		self.tiers = ['raw'] + [t[0] for t in TIERS]
+		self.readonly = readonly
+		self.pending = [None] * len(TIERS)	# the open period of each rollup tier
+		self.files = {}
+		self.last = -np.inf					# time of the newest raw record
+		if not readonly:
+			os.makedirs(self.directory, exist_ok=True)
+			for tier in self.tiers:
+				self._trim(tier)
+				self.files[tier] = open(self.path(tier), 'ab')
+			self._recover()
+
+
+	def path(self, tier='raw'):
+		'''
+		Returns the location of a tier's file.
+
+		:param str tier: ``'raw'``, ``'1m'``, ``'10m'``, or ``'1h'``
+		:rtype: str
+		'''
+		return os.path.join(self.directory, '%s.%s.%s.rsam' % (self.stn, self.cha, tier))
+
+
+	def _trim(self, tier):
+		'''
+		Cuts off a partly written record at the end of a file (if writing was interrupted).
+		'''
+		loc = self.path(tier)
+		if os.path.exists(loc):
+			size = os.path.getsize(loc)
+			if size % RECORD.itemsize:
+				printW('Removing a partial record from the end of %s' % (loc), SENDER)
+				with open(loc, 'r+b') as f:
+					f.truncate(size - size % RECORD.itemsize)
+
+
+	def records(self, tier='raw'):
+		'''
+		Returns all the records of a tier, memory-mapped (read-only, and nothing is read until it is used).
+
+		:param str tier: ``'raw'``, ``'1m'``, ``'10m'``, or ``'1h'``
+		:rtype: numpy.ndarray
+		'''
+		loc = self.path(tier)
+		n = (os.path.getsize(loc) // RECORD.itemsize) if os.path.exists(loc) else 0
+		if n == 0:
+			return np.zeros(0, dtype=RECORD)
+		return np.memmap(loc, dtype=RECORD, mode='r', shape=(n,))
+
+
+	def _write(self, tier, rec):
+		'''
+		Appends a record to a tier's file.
+		'''
+		f = self.files[tier]
+		f.write(rec.tobytes())
+		f.flush()
+
+
+	def _add(self, level, rec, cascade=True):
+		'''
+		Adds a record from the tier below to the open period of a rollup tier,
+		writing out the period (and passing it up to the next tier) if the record starts a new one.
+		'''
+		name, period = TIERS[level]
+		start = np.floor(float(rec['time']) / period) * period
+		p = self.pending[level]
+		if p and (p.start != start):
+			out = p.record()
+			self._write(name, out)
+			p = None
+			if cascade and (level + 1 < len(TIERS)):
+				self._add(level + 1, out)
+		if p is None:
+			p = self.pending[level] = _Rollup(start)
+		p.add(rec)
+
+
+	def _recover(self):
+		'''
+		Rebuilds the open period of each rollup tier from the records in the tier below
+		that are newer than its last written period.
+		'''
+		raw = self.records('raw')
+		if len(raw):
+			self.last = float(raw['time'][-1])
+		for level, (name, period) in enumerate(TIERS):
+			below = self.records(self.tiers[level])
+			done = self.records(name)
+			since = (float(done['time'][-1]) + period) if len(done) else -np.inf
+			for rec in below[np.searchsorted(below['time'], since):]:
+				self._add(level, rec, cascade=False)
+
+
+	def append(self, t, rsam):
+		'''
+		Stores an RSAM measurement and updates the rollups.
+		Measurements that are not newer than the last one stored are ignored.
+
+		:param t: the time of the measurement
+		:type t: float or obspy.core.utcdatetime.UTCDateTime
+		:param list rsam: ``[mean, median, min, max]``
+		:rtype: bool
+		:return: ``True`` if the measurement was stored
+		'''
+		t = float(t)
+		if t <= self.last:
+			return False
+		rec = np.array((t, 1) + tuple(rsam[:4]), dtype=RECORD)
+		self._write('raw', rec)
+		self.last = t
+		self._add(0, rec)
+		return True
+
+
+	def choose_tier(self, start=None, end=None, max_points=2000):
+		'''
+		Returns the finest tier with no more than ``max_points`` records between two times
+		(or the coarsest tier, if they all have more).
+
+		:rtype: str
+		'''
+		for tier in self.tiers:
+			recs = self.records(tier)
+			a, b = self._range(recs, start, end)
+			if b - a <= max_points:
+				return tier
+		return self.tiers[-1]
+
+
+	@staticmethod
+	def _range(recs, start, end):
+		a = np.searchsorted(recs['time'], float(start), side='left') if start is not None else 0
+		b = np.searchsorted(recs['time'], float(end), side='left') if end is not None else len(recs)
+		return a, b
+
+
+	def query(self, start=None, end=None, tier=None, max_points=2000):
+		'''
+		Returns the records between two times.
+
+		:param start: the start of the time range (defaults to the first record)
+		:type start: float or obspy.core.utcdatetime.UTCDateTime
+		:param end: the end of the time range (defaults to the last record)
+		:type end: float or obspy.core.utcdatetime.UTCDateTime
+		:param str tier: ``'raw'``, ``'1m'``, ``'10m'``, or ``'1h'`` (chosen with :py:func:`choose_tier` if not given)
+		:param int max_points: the number of records to aim for when choosing the tier
+		:rtype: numpy.ndarray
+		:return: a structured array of :py:data:`RECORD` (copied from the file)
+		'''
+		tier = tier if tier else self.choose_tier(start, end, max_points)
+		recs = self.records(tier)
+		a, b = self._range(recs, start, end)
+		return np.array(recs[a:b])
+
+
+	def close(self):
+		'''
+		Closes the files. Open rollup periods are rebuilt the next time the store is opened.
+		'''
+		for f in self.files.values():
+			f.close()
+		self.files = {}
+
+
+def main():
+	'''
+	When run from the command line, prints stored RSAM values as CSV.
+
+	For example, to print hourly RSAM for the last 30 days of channel EHZ
+	(the tier is chosen automatically if ``-t`` is not given):
+
+	.. code-block:: bash
+
+		rs-rsam -c EHZ -s 2024-01-01 -t 1h
+
+	'''
+
+	hlp_txt = '''
+########################################################
+##            R A S P B E R R Y  S H A K E            ##
+##                 Stored RSAM Query                  ##
+##                                                    ##
+## Prints stored RSAM values between two times as     ##
+## CSV (time,n,mean,median,min,max).                  ##
+##                                                    ##
+## Options:                                           ##
+##   -c  channel (default: the only channel stored)   ##
+##   -S  station (default: the only station stored)   ##
+##   -s  start time (default: the first record)       ##
+##   -e  end time (default: the last record)          ##
+##   -t  tier: raw, 1m, 10m or 1h (default: the       ##
+##       finest with no more than -n records)         ##
+##   -n  maximum number of records (default 2000)     ##
+##   -d  directory (default: output_dir/rsam from     ##
+##       the settings file)                           ##
+##                                                    ##
+########################################################
+##                                                    ##
+##    $ rs-rsam -c EHZ -s 2024-01-01 -t 1h            ##
+##                                                    ##
+########################################################
+
+	'''
+
+	cha, stn, start, end, tier, n, directory = None, None, None, None, None, 2000, None
+	try:
+		opts, args = getopt.getopt(sys.argv[1:], 'hc:S:s:e:t:n:d:',
+								   ['help', 'channel=', 'station=', 'start=', 'end=',
+									'tier=', 'max-points=', 'directory='])
+		for o, a in opts:
+			if o in ('-h', '--help'):
+				print(hlp_txt)
+				exit(0)
+			if o in ('-c', '--channel'):
+				cha = a
+			if o in ('-S', '--station'):
+				stn = a
+			if o in ('-s', '--start'):
+				start = UTCDateTime(a)
+			if o in ('-e', '--end'):
+				end = UTCDateTime(a)
+			if o in ('-t', '--tier'):
+				tier = a
+			if o in ('-n', '--max-points'):
+				n = int(a)
+			if o in ('-d', '--directory'):
+				directory = a
+	except Exception as e:
+		print('ERROR: %s' % e)
+		print(hlp_txt)
+		exit(2)
+
+	if not directory:
+		if os.path.exists(os.path.expanduser(settings_loc)):
+			output_dir = helpers.read_settings(settings_loc)['settings']['output_dir']
+		else:
+			output_dir = json.loads(helpers.default_settings(verbose=False))['settings']['output_dir']
+		directory = os.path.join(os.path.expanduser(output_dir), 'rsam')
+	if tier and (tier not in ['raw'] + [t[0] for t in TIERS]):
+		printE('Unknown tier %s' % (tier), SENDER)
+		exit(2)
+
+	# find the station and channel from the file names if they were not given
+	names = set()
+	if os.path.isdir(os.path.expanduser(directory)):
+		for f in os.listdir(os.path.expanduser(directory)):
+			parts = f.split('.')
+			if (len(parts) == 4) and (parts[2] == 'raw') and (parts[3] == 'rsam'):
+				if ((not stn) or (parts[0] == stn)) and ((not cha) or (cha.upper() in parts[1])):
+					names.add((parts[0], parts[1]))
+	if len(names) != 1:
+		printE('%s stored RSAM series in %s match this station and channel%s' % (
+				len(names), directory,
+				(' (%s)' % ', '.join('%s.%s' % s for s in sorted(names))) if names else ''), SENDER)
+		exit(1)
+	stn, cha = names.pop()
+
+	store = RSAMStore(directory, stn, cha, readonly=True)
+	tier = tier if tier else store.choose_tier(start, end, n)
+	print('# %s.%s tier=%s' % (stn, cha, tier))
+	print('time,n,mean,median,min,max')
+	for rec in store.query(start, end, tier=tier):
+		print('%s,%s,%s,%s,%s,%s' % (UTCDateTime(float(rec['time'])).isoformat(), rec['n'], rec['mean'],
+									 rec['median'], rec['min'], rec['max']))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,301 @@
+from collections import namedtuple
+import numpy as np
+from scipy.signal import lfilter
+import rsudp.raspberryshake as rs
+
+
+Trigger = namedtuple('Trigger', ['on', 'time', 'ratio'])
+Trigger.__doc__ = '''
+.. versionadded:: 1.1.2
+
+A trigger state change reported by :py:func:`rsudp.stalta.StaLta.update`.
+
+:param bool on: ``True`` if the trigger turned on, ``False`` if it reset
+:param float time: time of the sample that changed the state, in decimal seconds since 1970-01-01 00:00:00Z
+:param float ratio: the STA/LTA ratio at that sample
+'''
+
+
+class StaLta:
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	.. versionadded:: 1.1.2
+
+	A streaming recursive STA/LTA (short term average over long term average) trigger.
+
+	This computes the same characteristic function as
+	:py:func:`obspy.signal.trigger.recursive_sta_lta`, but keeps the
+	recursive averages between calls, so each call to
+	:py:func:`rsudp.stalta.StaLta.update` only processes the new samples
+	(for example the 25 samples in a packet) instead of the whole LTA window.
+	Trigger on and reset events are found in the same pass, sample by sample,
+	like :py:func:`obspy.signal.trigger.trigger_onset`.
+
+	As in obspy, the ratio is zero for the first ``lta`` seconds of data
+	while the long term average warms up.
+
+	.. code-block:: python
+
+		>>> from rsudp.stalta import StaLta
+		>>> trig = StaLta(sta=5, lta=30, thresh=1.6, reset=1.55, sps=100)
+		>>> for p in packets:
+		...     for t in trig.update(p.data, p.time):
+		...         print('on' if t.on else 'off', t.time)
+
+	:param float sta: short term average duration in seconds
+	:param float lta: long term average duration in seconds
+	:param float thresh: the ratio above which the trigger turns on
+	:param float reset: the ratio below which the trigger resets
+	:param int sps: samples per second (defaults to :pycode:`rsudp.raspberryshake.sps`)
+	'''
+
+	def __init__(self, sta=5, lta=30, thresh=1.6, reset=1.55, sps=None):
+		'''
+		Sets up the averaging coefficients.
+		'''
+		self.sps = sps if sps else rs.sps
+		self.thresh = thresh
+		self.reset = reset
+		self.nsta = int(sta * self.sps)
+		self.nlta = int(lta * self.sps)
+		csta, clta = 1. / self.nsta, 1. / self.nlta
+		self._sta_ba = ([csta], [1., csta - 1.])	# sta[i] = csta * x[i]**2 + (1 - csta) * sta[i-1]
+		self._lta_ba = ([clta], [1., clta - 1.])
+		self.clear()
+
+
+	def clear(self):
+		'''
+		Resets the averages and trigger state, as if no data had been received.
+		'''
+		self._sta_zi = np.zeros(1)
+		self._lta_zi = np.array([(1. - self._lta_ba[0][0]) * 1e-99])	# as in obspy, avoids dividing by zero
+		self.samples = 0		# samples processed so far
+		self.ratio = np.zeros(0)	# the ratios of the samples from the latest update
+		self.exceed = False		# whether the trigger is on
+		self.max = 0.			# the highest ratio since the trigger turned on
+
+
+	def update(self, data, t):
+		'''
+		Processes new samples.
+
+		:param numpy.ndarray data: the new samples
+		:param float t: time of the first sample in decimal seconds since 1970-01-01 00:00:00Z
+		:rtype: list
+		:return: a list of :py:class:`rsudp.stalta.Trigger` state changes (usually empty)
+		'''
+		sq = np.square(np.asarray(data, dtype=np.float64))
+		sta, self._sta_zi = lfilter(*self._sta_ba, sq, zi=self._sta_zi)
+		lta, self._lta_zi = lfilter(*self._lta_ba, sq, zi=self._lta_zi)
+		ratio = sta / lta
+		warm = self.nlta - self.samples
+		if warm > 0:
+			ratio[:warm] = 0.
+		self.samples += len(sq)
+		self.ratio = ratio
+
+		events = []
+		i, n = 0, len(ratio)
+		while i < n:
+			if self.exceed:
+				idx = np.flatnonzero(ratio[i:] < self.reset)
+				if not len(idx):
+					self.max = max(self.max, float(ratio[i:].max()))
+					break
+				j = i + idx[0]
+				if j > i:
+					self.max = max(self.max, float(ratio[i:j].max()))
+				i = j
+				self.exceed = False
+				events.append(Trigger(False, float(t + i / self.sps), float(ratio[i])))
+			else:
+				idx = np.flatnonzero(ratio[i:] > self.thresh)
+				if not len(idx):
+					break
+				i += idx[0]
+				self.exceed = True
+				self.max = float(ratio[i])
+				events.append(Trigger(True, float(t + i / self.sps), float(ratio[i])))
+			i += 1
+		return events
+
+
+class Coincidence:
+	'''
+	.. versionadded:: 1.1.2
+
+	Votes on the trigger states of several detectors
+	(for example a :py:class:`rsudp.stalta.StaLta` for each channel of an RS4D),
+	in the manner of :py:func:`obspy.signal.trigger.coincidence_trigger`.
+	Each detector runs on its own; only their state changes are passed here.
+
+	A detector votes from the moment it triggers until it resets,
+	and for at least ``window`` seconds after it triggered,
+	so that detectors whose triggers are short but close together in time
+	still count as coincident.
+	The coincidence trigger turns on as soon as the sum of the weights of the
+	voting detectors reaches ``thresh``, and resets when it falls below it.
+
+	.. code-block:: python
+
+		>>> from rsudp.stalta import StaLta, Coincidence
+		>>> vote = Coincidence(thresh=2, window=5)
+		>>> changes = vote.update({'EHZ': ehz.update(d1, t), 'ENZ': enz.update(d2, t)}, now=t)
+
+	:param float thresh: the sum of weights needed to trigger
+	:param float window: the minimum number of seconds a detector votes for after triggering
+	:param dict weights: the weight of each detector by name (detectors not listed have a weight of 1)
+	'''
+
+	def __init__(self, thresh=2, window=0, weights=None):
+		'''
+		Initializes the vote.
+		'''
+		self.thresh = thresh
+		self.window = window
+		self.weights = dict(weights) if weights else {}
+		self.voting = {}		# name: trigger time, for each detector currently voting
+		self.ending = {}		# name: time the vote ends, for detectors that have reset
+		self.exceed = False		# whether the coincidence trigger is on
+		self.max = 0.			# the highest sum since the coincidence trigger turned on
+
+
+	@property
+	def sum(self):
+		'''
+		The sum of the weights of the detectors currently voting.
+
+		:rtype: float
+		'''
+		return sum(self.weights.get(name, 1.) for name in self.voting)
+
+
+	def _expire(self, t, changes):
+		'''
+		Ends the votes of reset detectors whose window has passed by time ``t``.
+		'''
+		for name, end in sorted(self.ending.items(), key=lambda x: x[1]):
+			if end > t:
+				break
+			del self.ending[name]
+			del self.voting[name]
+			if self.exceed and (self.sum < self.thresh):
+				self.exceed = False
+				changes.append(Trigger(False, end, self.sum))
+
+
+	def update(self, triggers, now=None):
+		'''
+		Counts the votes after new detector state changes.
+
+		:param dict triggers: name: list of :py:class:`rsudp.stalta.Trigger` state changes, for each detector that has processed new data
+		:param float now: the time up to which all detectors have processed data (votes whose window ends before this are counted out)
+		:rtype: list
+		:return: a list of :py:class:`rsudp.stalta.Trigger` coincidence state changes, where ``ratio`` is the sum of weights
+		'''
+		changes = []
+		events = sorted(((name, e) for name, evs in triggers.items() for e in evs),
+						key=lambda x: x[1].time)
+		for name, e in events:
+			self._expire(e.time, changes)
+			if e.on:
+				self.voting[name] = e.time
+				self.ending.pop(name, None)
+			elif name in self.voting:
+				self.ending[name] = max(e.time, self.voting[name] + self.window)
+				self._expire(e.time, changes)
+			s = self.sum
+			if self.exceed:
+				self.max = max(self.max, s)
+			elif s >= self.thresh:
+				self.exceed = True
+				self.max = s
+				changes.append(Trigger(True, e.time, s))
+		if now is not None:
+			self._expire(now, changes)
+		return changes
+
+
+class Detector:
+	'''
+	.. versionadded:: 1.1.2
+
+	One named trigger configuration in :py:class:`rsudp.c_alert.Alert`'s detector bank:
+	a :py:class:`rsudp.stalta.StaLta` for each channel it watches,
+	and a :py:class:`rsudp.stalta.Coincidence` vote if there is more than one.
+	Detectors do not filter data themselves, so that detectors that use the same
+	filter ``band`` can share the output of one filter.
+
+	:param str name: the detector's name (sent with its ``ALARM`` and ``RESET`` messages; an empty string for none)
+	:param list chans: the channels to watch (the first is the main channel)
+	:param float sta: short term average duration in seconds
+	:param float lta: long term average duration in seconds
+	:param float thresh: the ratio above which a channel triggers
+	:param float reset: the ratio below which a channel resets
+	:param int sps: samples per second
+	:param band: identifies the filtered data the detector runs on (for example ``('bandpass', (0.7, 2.0))``, or ``None`` for unfiltered data)
+	:param float coinc_sum: the sum of channel weights needed to trigger (if there is more than one channel)
+	:param float coinc_window: the minimum number of seconds a channel's trigger counts towards the sum
+	:param dict coinc_weights: the weight of each channel's trigger
+	'''
+
+	def __init__(self, name, chans, sta=5, lta=30, thresh=1.6, reset=1.55, sps=None,
+				 band=None, coinc_sum=2, coinc_window=5, coinc_weights=None):
+		'''
+		Sets up the triggers.
+		'''
+		self.name = name
+		self.cha = chans[0]
+		self.sta, self.lta = sta, lta
+		self.thresh, self.reset = thresh, reset
+		self.band = band
+		self.triggers = {c: StaLta(sta=sta, lta=lta, thresh=thresh, reset=reset, sps=sps)
+						 for c in chans}
+		self.trigger = self.triggers[self.cha]
+		self.coincidence = None
+		if len(chans) > 1:
+			self.coincidence = Coincidence(thresh=coinc_sum, window=coinc_window,
+										   weights=coinc_weights)
+		self.exceed = False		# whether the detector is in alarm state
+
+
+	@property
+	def max(self):
+		'''
+		The highest STA/LTA ratio on any channel since that channel last triggered.
+
+		:rtype: float
+		'''
+		return max(t.max for t in self.triggers.values())
+
+
+	def update(self, cha, data, t):
+		'''
+		Passes new (filtered) samples to a channel's trigger.
+
+		:param str cha: the channel
+		:param numpy.ndarray data: the new samples
+		:param float t: time of the first sample in decimal seconds since 1970-01-01 00:00:00Z
+		:rtype: list
+		:return: a list of :py:class:`rsudp.stalta.Trigger` state changes for the channel
+		'''
+		return self.triggers[cha].update(data, t)
+
+
+	def vote(self, triggers, now=None):
+		'''
+		Decides which channel state changes are detector state changes.
+		With one channel, these are that channel's state changes;
+		otherwise, they are the coincidence vote's.
+
+		:param dict triggers: the state changes for each channel
+		:param float now: the time up to which all channels have processed data
+		:rtype: list
+		:return: a list of :py:class:`rsudp.stalta.Trigger` state changes
+		'''
+		if not self.coincidence:
+			return triggers.get(self.cha, [])
+		return self.coincidence.update(triggers, now=now)
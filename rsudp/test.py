@@ -48,6 +48,7 @@ TEST = {
 	'c_telegramimg':		['Telegram image              ', False],
 	'c_forward':			['forwarding                  ', False],
 	'c_rsam':				['RSAM transmission           ', False],
+	'c_groundmotion':		['ground motion report        ', False],
 	'c_custom':				['custom code execution       ', False],
 }
 
@@ -86,6 +87,7 @@ def make_test_settings(settings, inet=False):
 	 ``settings['rsam']['enabled']``          ``True``
 	 ``settings['rsam']['debug']``            ``True``
 	 ``settings['rsam']['interval']``         ``10``
+	 ``settings['groundmotion']['enabled']``  ``True``
 	======================================== ===================
 
 	.. note::
@@ -135,6 +137,9 @@ def make_test_settings(settings, inet=False):
 	settings['rsam']['quiet'] = False
 	settings['rsam']['interval'] = 10
 
+	settings['groundmotion']['enabled'] = True
+	settings['groundmotion']['quiet'] = False
+
 	return settings
 
 
@@ -22,6 +22,8 @@ setuptools.setup(
     entry_points = {
         'console_scripts': [
             'rs-packetloss=rsudp.packetloss:main',
+            'rs-evaluate=rsudp.evaluate:main',
+            'rs-rsam=rsudp.rsam_store:main',
             'rs-client=rsudp.client:main',
             'rs-test=rsudp.client:test',
             'packetize=rsudp.packetize:main',
@@ -0,0 +1,28 @@
+import pytest
+from obspy import read_inventory, UTCDateTime
+import rsudp.raspberryshake as rs
+
+
+@pytest.fixture
+def inventory():
+	'''
+	obspy's example inventory, cut down to the current epoch of a short-period
+	station (BW.RJOB, 3-component geophone at 200 Hz), with Shake-style location codes.
+	'''
+	inv = read_inventory().select(network='BW', station='RJOB', time=UTCDateTime(2020, 1, 1))
+	for cha in inv[0][0]:
+		cha.location_code = '00'
+	return inv
+
+@pytest.fixture
+def station(inventory, monkeypatch):
+	'''
+	Sets up rsudp's station globals as if it were receiving data from BW.RJOB.
+	'''
+	monkeypatch.setattr(rs, 'inv', inventory)
+	monkeypatch.setattr(rs, 'net', 'BW')
+	monkeypatch.setattr(rs, 'stn', 'RJOB')
+	monkeypatch.setattr(rs, 'chns', ['EHZ', 'EHN', 'EHE'])
+	monkeypatch.setattr(rs, 'sps', 100)
+	monkeypatch.setattr(rs, 'tf', 250)
+	return inventory
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from obspy import UTCDateTime
+from obspy.core.trace import Trace
+import rsudp.raspberryshake as rs
+from rsudp.c_alert import Alert
+from rsudp.stalta import StaLta
+
+SPS = 100
+T0 = float(UTCDateTime(2020, 1, 1))
+PARAMS = {'sta': 1, 'lta': 30, 'thresh': 3, 'reset': 2}
+
+
+def record(seconds=600, seed=3):
+	'''
+	Ten minutes of noise on a DC offset, with a local and a more distant event.
+	'''
+	rng = np.random.default_rng(seed)
+	x = rng.normal(0, 200, seconds * SPS)
+	k = np.arange(30 * SPS)
+	env = np.exp(-k / (5. * SPS)) * (1 - np.exp(-k / 20.))
+	for t, amp, f in ((200, 3000, 5), (400, 1500, 2)):
+		x[t*SPS:t*SPS + len(k)] += amp * env * np.sin(2 * np.pi * f * k / SPS)
+	return (x + 16000).astype(np.int32)
+
+
+def run_alert(data, **params):
+	'''
+	Feeds a record to Alert one packet at a time, and returns its alarms and resets.
+	'''
+	events = []
+	def notify(thread, flag, value):
+		events.append((flag == 'alarm', float(value)))
+		setattr(thread, '_%s' % flag, False)
+	alert = Alert(q=None, debug=False, cha='EHZ', **params)
+	alert.notifier = notify
+	for i in range(0, len(data), 25):
+		alert._append('EHZ', T0 + i / SPS, data[i:i+25])
+		alert._compute()
+	return events
+
+
+def whole_record(data, output, inventory):
+	'''
+	Deconvolves the whole record at once, and runs the STA/LTA over all of it.
+	'''
+	tr = Trace(data=data.astype(np.float64))
+	tr.stats.update({'network': 'BW', 'station': 'RJOB', 'location': '00', 'channel': 'EHZ',
+					 'sampling_rate': SPS, 'starttime': UTCDateTime(T0)})
+	tr.remove_response(inventory, output=output, pre_filt=[0.1, 0.6, 0.95*SPS, SPS],
+					   water_level=4.5, taper=False)
+	trig = StaLta(sps=SPS, **PARAMS)
+	return [(ev.on, ev.time) for ev in trig.update(tr.data, T0)]
+
+
+@pytest.mark.parametrize('output', ['VEL', 'ACC', 'DISP'])
+def test_deconvolved_triggers_match_whole_record(station, output):
+	data = record()
+	ref = whole_record(data, output, station)
+	assert [on for on, t in ref] == [True, False, True, False]
+	events = run_alert(data, deconv=output, **PARAMS)
+	assert [on for on, t in events] == [on for on, t in ref]
+	for (on, t), (ron, rt) in zip(events, ref):
+		assert abs(t - rt) < 0.1
+
+
+def test_counts_triggers_match_one_shot(station):
+	# (without a filter, the DC offset of raw counts would swamp the events)
+	data = record() - 16000
+	trig = StaLta(sps=SPS, **PARAMS)
+	ref = [(ev.on, ev.time) for ev in trig.update(data.astype(np.float64), T0)]
+	assert [on for on, t in ref] == [True, False, True, False]
+	events = run_alert(data, **PARAMS)
+	assert [on for on, t in events] == [on for on, t in ref]
+	for (on, t), (ron, rt) in zip(events, ref):
+		assert abs(t - rt) < 0.011		# alarm times are rounded to 10 ms
+
+
+def tones(seconds=300, seed=4):
+	'''
+	Noise with a 2 Hz event at 100 s and a 15 Hz event at 200 s.
+	'''
+	rng = np.random.default_rng(seed)
+	x = rng.normal(0, 100, seconds * SPS)
+	k = np.arange(20 * SPS)
+	env = np.exp(-k / (4. * SPS)) * (1 - np.exp(-k / 20.))
+	for t, f in ((100, 2), (200, 15)):
+		x[t*SPS:t*SPS + len(k)] += 2000 * env * np.sin(2 * np.pi * f * k / SPS)
+	return (x + 16000).astype(np.int32)
+
+
+def messages(data, **params):
+	'''
+	Feeds a record to Alert one packet at a time, and returns the flags it raised and their values.
+	'''
+	flags = []
+	def notify(thread, flag, value):
+		flags.append((flag, value))
+		setattr(thread, '_%s' % flag, False)
+	alert = Alert(q=None, debug=False, cha='EHZ', **params)
+	alert.notifier = notify
+	for i in range(0, len(data), 25):
+		alert._append('EHZ', T0 + i / SPS, data[i:i+25])
+		alert._compute()
+	return alert, flags
+
+
+def test_detectors_in_different_bands_fire_and_reset_on_their_own(station):
+	alert, flags = messages(tones(), sta=1, lta=30, thresh=4, reset=2, bp=[0.5, 40],
+							detectors=[{'name': 'low', 'highpass': 1, 'lowpass': 4},
+									   {'name': 'high', 'highpass': 10, 'lowpass': 25}])
+	assert len(alert.bands) == 3
+	named = [(flag, v.name, float(v.time) - T0) for flag, v in flags if isinstance(v, (rs.Alarm, rs.Reset))]
+	# each named detector raises its own ALARM and RESET, for the event in its band only
+	for name, t in (('low', 100), ('high', 200)):
+		mine = [(flag, dt) for flag, n, dt in named if n == name]
+		assert [flag for flag, dt in mine] == ['alarm', 'alarm_reset']
+		assert t < mine[0][1] < t + 2
+		assert mine[1][1] > mine[0][1]
+	assert all(n in ('low', 'high') for flag, n, dt in named)
+	# the main detector's messages are plain times, as before, and it sees both events
+	main = [(flag, float(v) - T0) for flag, v in flags if not isinstance(v, (rs.Alarm, rs.Reset))]
+	assert [flag for flag, dt in main] == ['alarm', 'alarm_reset'] * 2
+	assert 100 < main[0][1] < 102 and 200 < main[2][1] < 202
+
+
+def test_detectors_share_a_band(station):
+	data = tones()
+	params = dict(sta=1, lta=30, reset=2, bp=[1, 4])
+	alert, flags = messages(data, thresh=4, detectors=[{'name': 'twin', 'threshold': 4},
+														{'name': 'deaf', 'threshold': 1000}], **params)
+	# one set of filters serves all three detectors
+	assert len(alert.bands) == 1
+	assert len(set(det.band for det in alert.detectors)) == 1
+	twin = [(flag, float(v.time)) for flag, v in flags if isinstance(v, (rs.Alarm, rs.Reset))]
+	main = [(flag, float(v)) for flag, v in flags if not isinstance(v, (rs.Alarm, rs.Reset))]
+	# a detector with the same settings as the main one fires at the same times; one that can't fire doesn't
+	assert [v.name for flag, v in flags if isinstance(v, (rs.Alarm, rs.Reset))] == ['twin', 'twin']
+	assert twin == main
+	# and the main detector is the same as it is when running alone
+	_, ref = messages(data, thresh=4, **params)
+	assert main == [(flag, float(v)) for flag, v in ref]
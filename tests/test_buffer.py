@@ -0,0 +1,83 @@
+import numpy as np
+from rsudp.buffer import ChannelBuffer, to_stream
+
+
+def test_wraparound_keeps_newest_samples():
+	buf = ChannelBuffer('EHZ', seconds=1, sps=100)
+	data = np.arange(350, dtype=np.int32)
+	for i in range(0, 350, 25):
+		buf.append(1000. + i / 100., data[i:i+25])
+	assert len(buf) == 100
+	assert buf.tail == 250
+	values, mask, start = buf.view()
+	assert start == 250
+	assert not mask.any()
+	np.testing.assert_array_equal(values, data[250:])
+	# the trace starts at the oldest sample still held
+	assert abs(float(buf.trace().stats.starttime) - 1002.5) < 1e-6
+
+
+def test_latest_fill_never_shows_stale_samples():
+	buf = ChannelBuffer('EHZ', seconds=1, sps=100)
+	buf.append(0., np.arange(100, dtype=np.int32))
+	buf.append(1.5, np.full(25, 5, dtype=np.int32))	# samples 100 to 149 are missing
+	# the storage under the gap still holds samples from the first append
+	tr = buf.trace(start=110, fill_value='latest')
+	np.testing.assert_array_equal(tr.data, [5] * 65)
+	# with no good sample at all, the gap stays masked
+	tr = buf.trace(start=110, end=140, fill_value='latest')
+	assert np.ma.count_masked(tr.data) == 30
+	# a gap after good samples repeats the last of them
+	tr = buf.trace(start=90, fill_value='latest')
+	np.testing.assert_array_equal(tr.data, list(range(90, 100)) + [99] * 50 + [5] * 25)
+
+
+def test_views_are_contiguous_across_the_wrap():
+	buf = ChannelBuffer('EHZ', seconds=1, sps=100)
+	data = np.arange(170, dtype=np.int32)
+	buf.append(0., data)
+	values, mask, start = buf.view(140, 165)
+	assert start == 140
+	np.testing.assert_array_equal(values, data[140:165])
+	# and asking for more than is held is clipped to what is there
+	values, mask, start = buf.view(0, 1000)
+	assert (start, len(values)) == (70, 100)
+
+
+def test_gaps_are_masked_and_filled_late():
+	buf = ChannelBuffer('EHZ', seconds=2, sps=100)
+	buf.append(0., np.ones(25, dtype=np.int32))
+	buf.append(0.5, np.full(25, 3, dtype=np.int32))	# 25 samples missing
+	values, mask, start = buf.view()
+	assert len(values) == 75
+	assert mask[25:50].all() and not mask[:25].any() and not mask[50:].any()
+
+	tr = buf.trace()
+	assert np.ma.count_masked(tr.data) == 25
+	np.testing.assert_array_equal(buf.trace(fill_value=0).data[25:50], 0)
+	np.testing.assert_array_equal(buf.trace(fill_value='latest').data[25:50], 1)
+
+	# the late packet lands in its place
+	assert buf.append(0.25, np.full(25, 2, dtype=np.int32))
+	values, mask, start = buf.view()
+	assert not mask.any()
+	np.testing.assert_array_equal(values, [1]*25 + [2]*25 + [3]*25)
+
+
+def test_samples_too_old_are_dropped():
+	buf = ChannelBuffer('EHZ', seconds=1, sps=100)
+	buf.append(0., np.zeros(200, dtype=np.int32))
+	assert not buf.append(0.5, np.ones(25, dtype=np.int32))
+	assert buf.dropped == 25
+	assert buf.append(0.9, np.ones(20, dtype=np.int32))	# partly in the window
+	assert buf.dropped == 35
+	values, mask, start = buf.view()
+	np.testing.assert_array_equal(values[:10], 1)
+
+
+def test_to_stream_skips_empty_buffers():
+	a = ChannelBuffer('EHZ', seconds=1, sps=100)
+	b = ChannelBuffer('ENZ', seconds=1, sps=100)
+	a.append(0., np.arange(10, dtype=np.int32))
+	st = to_stream({'EHZ': a, 'ENZ': b})
+	assert len(st) == 1 and st[0].stats.channel == 'EHZ'
@@ -0,0 +1,24 @@
+import rsudp.raspberryshake as rs
+from rsudp import helpers
+from rsudp.client import _match_channels
+
+
+class Module:
+	def __init__(self, cha):
+		self.chans = []
+		helpers.set_channels(self, cha)
+
+
+def test_channel_settings(monkeypatch):
+	monkeypatch.setattr(rs, 'chns', ['EHZ', 'ENZ', 'ENN', 'ENE'])
+	# a single channel given as a string is one channel, not a list of letters
+	assert _match_channels('EHZ') == ['EHZ']
+	assert Module('EHZ').chans == ['EHZ']
+	assert _match_channels(['HZ']) == ['EHZ']
+	assert _match_channels('Z') == ['EHZ', 'ENZ']
+	assert Module(['Z']).chans == ['EHZ', 'ENZ']
+	assert _match_channels(['EN']) == ['ENZ', 'ENN', 'ENE']
+	# everything, or nothing that matches, means all channels
+	assert _match_channels('all') is None
+	assert _match_channels(['HDF']) is None
+	assert Module(['HDF']).chans == rs.chns
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from obspy import UTCDateTime, Stream
+from obspy.core.trace import Trace
+import rsudp.raspberryshake as rs
+from rsudp import evaluate
+
+SPS = 100
+T0 = UTCDateTime(2020, 1, 1, 23, 55)
+PARAMS = {'sta': 1, 'lta': 30, 'thresh': 3, 'reset': 2, 'bp': [1, 20], 'cha': 'EHZ'}
+
+
+def test_parse_sweep():
+	assert evaluate.parse_sweep('sta=3,5; thresh=1.6,2.0;') == {'sta': [3., 5.], 'thresh': [1.6, 2.]}
+	assert evaluate.parse_sweep('') == {}
+
+
+def test_read_events(tmp_path):
+	loc = tmp_path / 'quakes.txt'
+	loc.write_text('# local events\n'
+				   '2024-01-07T02:51:40 M1.4\n'
+				   '\n'
+				   '2024-01-03T14:22:08.5, M2.1 12 km NE\n'
+				   '2024-01-05T00:00:00\n')
+	events = evaluate.read_events(str(loc))
+	assert events == [(UTCDateTime(2024, 1, 3, 14, 22, 8, 500000), 'M2.1 12 km NE'),
+					  (UTCDateTime(2024, 1, 5), ''),
+					  (UTCDateTime(2024, 1, 7, 2, 51, 40), 'M1.4')]
+
+
+def test_compare():
+	t = UTCDateTime(2024, 1, 1)
+	events = [(t, 'a'), (t + 100, 'b'), (t + 1000, 'c')]
+	triggers = [{'name': '', 'on': t + 102, 'off': None},	# b
+				{'name': '', 'on': t - 5, 'off': None},		# a, just before the event time
+				{'name': '', 'on': t + 30, 'off': None},		# also near a, but a is already taken
+				{'name': '', 'on': t + 500, 'off': None}]		# nothing
+	c = evaluate.compare(triggers, events, before=10, after=60)
+	assert [(ev[1], float(tr['on'] - t)) for ev, tr in c['detected']] == [('a', -5), ('b', 102)]
+	assert [ev[1] for ev in c['missed']] == ['c']
+	assert sorted(float(tr['on'] - t) for tr in c['false']) == [30, 500]
+	assert c['precision'] == 0.5
+	assert c['recall'] == pytest.approx(2 / 3.)
+	assert evaluate.compare([], events)['precision'] == 0.
+
+
+def record(seconds=600, seed=3):
+	'''
+	Ten minutes of noise spanning midnight, with an event on either side of it.
+	'''
+	rng = np.random.default_rng(seed)
+	x = rng.normal(0, 200, seconds * SPS)
+	k = np.arange(30 * SPS)
+	env = np.exp(-k / (5. * SPS)) * (1 - np.exp(-k / 20.))
+	for t, amp, f in ((200, 3000, 5), (400, 1500, 2)):
+		x[t*SPS:t*SPS + len(k)] += amp * env * np.sin(2 * np.pi * f * k / SPS)
+	tr = Trace(data=(x + 16000).astype(np.int32))
+	tr.stats.update({'network': 'AM', 'station': 'R3BCF', 'location': '00', 'channel': 'EHZ',
+					 'sampling_rate': SPS, 'starttime': T0})
+	return tr
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+	'''
+	The record written to one file per day, as Write would, with rsudp's globals restored afterwards.
+	'''
+	for name in ('chns', 'numchns', 'sps', 'tf', 'tr', 'net', 'stn', 'inv'):
+		monkeypatch.setattr(rs, name, getattr(rs, name, None))
+	tr = record()
+	midnight = UTCDateTime(2020, 1, 2)
+	tr.slice(endtime=midnight - 0.001).write(str(tmp_path / 'AM.R3BCF.00.EHZ.D.2020.001'), format='MSEED')
+	tr.slice(starttime=midnight).write(str(tmp_path / 'AM.R3BCF.00.EHZ.D.2020.002'), format='MSEED')
+	(tmp_path / 'AM.R3BCF.00.xml').write_text('')
+	return tr, str(tmp_path)
+
+
+def test_scan_and_days(archive):
+	tr, loc = archive
+	files, headers = evaluate.scan([loc])
+	assert [f[2][-3:] for f in files] == ['001', '002']
+	assert files[0][0] == T0
+	assert not len(headers[0].data)
+	assert evaluate.scan([loc], channels=['HDF']) == ([], Stream())
+	st = list(evaluate.days(files))
+	assert len(st) == 2
+	assert st[1][0].stats.starttime == UTCDateTime(2020, 1, 2)
+	np.testing.assert_array_equal(np.concatenate([s[0].data for s in st]), tr.data)
+
+
+def test_replay_reads_one_day_at_a_time(archive):
+	tr, loc = archive
+	files, headers = evaluate.scan([loc])
+	evaluate.setup(headers)
+	assert (rs.chns, rs.sps, rs.stn) == (['EHZ'], SPS, 'R3BCF')
+	result = evaluate.run(files, PARAMS)
+	# the same as replaying the whole record from memory
+	ref = evaluate.run(Stream([tr]), PARAMS)
+	assert result['samples'] == ref['samples'] == tr.stats.npts
+	assert result['seconds'] == pytest.approx(600)
+	assert [(t['on'], t['off']) for t in result['triggers']] == \
+		   [(t['on'], t['off']) for t in ref['triggers']]
+	# both events are found, one on each day
+	c = evaluate.compare(result['triggers'], [(T0 + 200, ''), (T0 + 400, '')], before=0, after=5)
+	assert c['recall'] == 1 and c['precision'] == 1
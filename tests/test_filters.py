@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy.signal import sosfilt, sosfilt_zi
+from obspy.core.trace import Trace
+from rsudp.filters import StreamFilter, Integrator, Differentiator, design, from_bp
+
+SPS = 100
+
+
+def record(seed=0):
+	rng = np.random.default_rng(seed)
+	return rng.normal(16000, 300, 60 * SPS)
+
+
+def chunked(f, x, sizes=(25, 1, 7, 300)):
+	out, i, k = [], 0, 0
+	while i < len(x):
+		n = sizes[k % len(sizes)]
+		out.append(f.filter(x[i:i+n]))
+		i += n
+		k += 1
+	return np.concatenate(out)
+
+
+@pytest.mark.parametrize('kind,freq', [('bandpass', (0.7, 2.0)), ('highpass', 1.), ('lowpass', 10.)])
+def test_chunked_equals_one_shot_sosfilt(kind, freq):
+	x = record()
+	sos = design(kind, freq, SPS)
+	ref = sosfilt(sos, x, zi=sosfilt_zi(sos) * x[0])[0]
+	np.testing.assert_allclose(chunked(StreamFilter(kind, freq, sps=SPS), x), ref, rtol=1e-9, atol=1e-9)
+
+
+def test_design_matches_obspy():
+	x = record()
+	tr = Trace(data=x.copy())
+	tr.stats.sampling_rate = SPS
+	tr.filter('bandpass', freqmin=0.7, freqmax=2.0, corners=4, zerophase=False)
+	np.testing.assert_allclose(sosfilt(design('bandpass', (0.7, 2.0), SPS), x), tr.data, rtol=1e-9, atol=1e-9)
+
+
+def test_starts_without_a_transient_and_resets():
+	f = StreamFilter('highpass', 1., sps=SPS)
+	# a DC offset is in the steady state from the first sample
+	assert np.abs(f.filter(np.full(500, 16000.))).max() < 1e-6
+	f.reset()
+	assert np.abs(f.filter(np.full(500, -3000.))).max() < 1e-6
+
+
+def test_designs_are_shared():
+	assert StreamFilter('lowpass', 10., sps=SPS).sos is StreamFilter('lowpass', 10., sps=SPS).sos
+
+
+def test_from_bp():
+	assert from_bp([0, 50], sps=SPS) is None
+	assert from_bp([0.7, 2.0], sps=SPS).kind == 'bandpass'
+	assert from_bp([0.7, 50], sps=SPS).kind == 'highpass'
+	assert from_bp([0, 2.0], sps=SPS).kind == 'lowpass'
+	with pytest.raises(ValueError):
+		StreamFilter('bandstop', (1., 2.), sps=SPS)
+
+
+def test_integrator_and_differentiator_chunked():
+	x = record() - 16000
+	ref = np.concatenate(([0.], np.cumsum((x[1:] + x[:-1]) / 2.) / SPS))
+	np.testing.assert_allclose(chunked(Integrator(sps=SPS), x), ref, rtol=1e-9, atol=1e-9)
+	d = chunked(Differentiator(sps=SPS), x)
+	np.testing.assert_allclose(d, np.diff(x, prepend=x[0]) * SPS)
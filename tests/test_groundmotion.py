@@ -0,0 +1,71 @@
+from queue import Queue
+import numpy as np
+import pytest
+from obspy import UTCDateTime
+import rsudp.raspberryshake as rs
+from rsudp.c_groundmotion import intensity, ChannelMotion, GroundMotion
+
+SPS = 100
+T0 = float(UTCDateTime(2020, 1, 1))
+
+
+def test_intensity_at_the_breakpoints():
+	# Worden et al. (2012): the two segments of each equation meet (to within rounding) at the breakpoints
+	assert intensity(10 ** 1.57 / 100., 0) == pytest.approx(4.21, abs=0.01)
+	assert intensity(0, 10 ** 0.53 / 100.) == pytest.approx(4.56, abs=0.01)
+	# and on either side of them
+	assert intensity(1., 0) == pytest.approx(-1.60 + 3.70 * 2)			# 100 cm/s2
+	assert intensity(0.1, 0) == pytest.approx(1.78 + 1.55 * 1)			# 10 cm/s2
+	assert intensity(0, 0.1) == pytest.approx(2.89 + 3.16 * 1)			# 10 cm/s
+	assert intensity(0, 0.01) == pytest.approx(3.78 + 1.47 * 0)			# 1 cm/s
+	# the larger of the two estimates, between 1 and 10
+	assert intensity(1., 0.1) == pytest.approx(6.05)
+	assert intensity(0, 0) == 1.
+	assert intensity(1e-6, 1e-7) == 1.
+	assert intensity(100., 10.) == 10.
+
+
+def sine(f, amp, seconds=60, sens=1.):
+	t = np.arange(seconds * SPS) / SPS
+	return amp * sens * np.sin(2 * np.pi * f * t)
+
+
+@pytest.mark.parametrize('kind', ['VEL', 'ACC'])
+@pytest.mark.parametrize('f', [1., 5.])
+def test_peaks_of_a_sine(kind, f):
+	sens = 3.9e8 if kind == 'VEL' else 3.8e5
+	m = ChannelMotion('EHZ' if kind == 'VEL' else 'ENZ', sens, kind=kind, sps=SPS)
+	amp = 1e-3
+	data = sine(f, amp, sens=sens)
+	w = 2 * np.pi * f
+	for i in range(0, len(data), 25):
+		if i == 30 * SPS:
+			m.clear()		# after the filters have settled
+		m.update(data[i:i+25], T0 + i / SPS)
+	# a sinusoidal velocity v sin(wt) has acceleration w v and displacement v / w (and likewise for acceleration)
+	pga, pgv, pgd = (amp * w, amp, amp / w) if kind == 'VEL' else (amp, amp / w, amp / w ** 2)
+	assert m.pga == pytest.approx(pga, rel=0.02)
+	assert m.pgv == pytest.approx(pgv, rel=0.02)
+	assert m.pgd == pytest.approx(pgd, rel=0.02)
+
+
+def test_thresholds_raise_and_reset_named_alarms(station):
+	gm = GroundMotion(q=Queue(), cha=['EHZ'], thresholds={'PGV': 1e-4, 'MMI': 9}, reset=5, warmup=10, quiet=True)
+	flags = []
+	def notify(thread, flag, value):
+		flags.append((flag, value))
+		setattr(thread, '_%s' % flag, False)
+	gm.notifier = notify
+	sens = gm.motions['EHZ'].sensitivity
+	rng = np.random.default_rng(0)
+	data = rng.normal(0, 1e-6, 60 * SPS) * sens
+	data[2*SPS:4*SPS] += sine(2, 1e-3, 2, sens)		# during the warm-up: ignored
+	data[20*SPS:25*SPS] += sine(2, 1e-3, 5, sens)
+	for i in range(0, len(data), 25):
+		gm.process(rs.Packet('EHZ', T0 + i / SPS, (data[i:i+25] + 16000).astype(np.int32), b''))
+	assert [flag for flag, v in flags] == ['alarm', 'alarm_reset']
+	alarm, reset = flags[0][1], flags[1][1]
+	assert (alarm.name, reset.name) == ('PGV', 'PGV')
+	assert 20 <= float(alarm.time) - T0 < 20.5
+	# five seconds after the last exceedance
+	assert 30 <= float(reset.time) - T0 < 31
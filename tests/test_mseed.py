@@ -0,0 +1,104 @@
+import io
+import numpy as np
+from obspy import read, UTCDateTime
+from obspy.core.trace import Trace
+from rsudp.mseed import RecordEncoder
+
+T0 = UTCDateTime(2020, 2, 21, 19, 58, 50, 292000)
+
+
+def counts(n, seed=0):
+	# a random walk compresses like real data, so records hold a varying number of samples
+	return np.cumsum(np.random.default_rng(seed).integers(-300, 300, n)).astype(np.int32)
+
+
+def sequences(recs):
+	return [int(recs[i:i+6]) for i in range(0, len(recs), 512)]
+
+
+def samples(recs):
+	return [int.from_bytes(recs[i+30:i+32], 'big') for i in range(0, len(recs), 512)]
+
+
+def whole(data, **kwargs):
+	tr = Trace(data=data, header={'network': 'AM', 'station': 'R3BCF', 'location': '00',
+								  'channel': 'EHZ', 'sampling_rate': 100, 'starttime': T0})
+	out = io.BytesIO()
+	tr.write(out, format='MSEED', reclen=512, byteorder='>', **kwargs)
+	return out.getvalue()
+
+
+def test_only_full_records_until_flushed():
+	enc = RecordEncoder('AM', 'R3BCF', '00', 'EHZ', 100)
+	data = counts(20000)
+	out = b''
+	for i in range(0, len(data), 25):
+		recs = enc.add(float(T0) + i / 100., data[i:i+25])
+		assert len(recs) % 512 == 0
+		out += recs
+		# whatever hasn't been packed is still pending
+		assert sum(samples(out)) + len(enc.pending) == i + 25
+	assert len(enc.pending)
+	last = enc.flush()
+	# libmseed waits for as many samples as a record could ever hold, so this can be more than one
+	assert last and (len(last) % 512 == 0)
+	assert not len(enc.pending)
+	out += last
+	# as well filled as encoding the whole series at once (Steim frames can split a little differently)
+	ours, ref = samples(out), samples(whole(data, encoding='STEIM2'))
+	assert len(ours) == len(ref)
+	assert max(abs(a - b) for a, b in zip(ours[:-1], ref[:-1])) <= 5
+	assert enc.records == len(out) // 512
+	st = read(io.BytesIO(out))
+	assert len(st) == 1
+	assert st[0].stats.starttime == T0
+	assert st[0].id == 'AM.R3BCF.00.EHZ'
+	np.testing.assert_array_equal(st[0].data, data)
+
+
+def test_sequence_numbers_carry_over():
+	enc = RecordEncoder('AM', 'R3BCF', '00', 'EHZ', 100)
+	data = counts(30000, seed=1)
+	out = b''
+	for i in range(0, len(data), 1000):
+		out += enc.add(float(T0) + i / 100., data[i:i+1000])
+	out += enc.flush()
+	n = len(out) // 512
+	assert n > 5
+	assert sequences(out) == list(range(1, n + 1))
+	# and on after a flush
+	more = enc.add(float(T0) + 1000., counts(5000, seed=2)) + enc.flush()
+	assert sequences(more)[0] == n + 1
+
+
+def test_gap_flushes_pending_samples():
+	enc = RecordEncoder('AM', 'R3BCF', '00', 'EHZ', 100)
+	a, b = counts(300, seed=3), counts(300, seed=4)
+	assert enc.add(T0, a) == b''
+	# a gap of one second ends the first run in a partly filled record
+	out = enc.add(float(T0) + 4., b)
+	assert len(out) == 512
+	assert samples(out) == [300]
+	assert abs(enc.t - (float(T0) + 4.)) < 1e-6
+	out += enc.flush()
+	st = read(io.BytesIO(out))
+	assert len(st) == 2
+	np.testing.assert_array_equal(st[0].data, a)
+	np.testing.assert_array_equal(st[1].data, b)
+	assert st[1].stats.starttime == T0 + 4.
+	# a jitter of less than half a sample is not a gap
+	assert enc.add(T0, a) == b''
+	assert enc.add(float(T0) + 3.003, b) == b''
+	assert len(enc.pending) == 600
+
+
+def test_float32_records():
+	enc = RecordEncoder('AM', 'R3BCF', '00', 'HDF', 100, encoding='FLOAT32')
+	data = np.sin(np.arange(1000) / 10.).astype(np.float32) * 1e-6
+	out = enc.add(T0, data)
+	# a FLOAT32 record holds 114 samples, so 8 are full
+	assert samples(out) == [114] * 8
+	out += enc.flush()
+	st = read(io.BytesIO(out))
+	assert st[0].data.dtype == np.float32
+	np.testing.assert_array_equal(st[0].data, data)
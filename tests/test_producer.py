@@ -0,0 +1,23 @@
+from queue import Queue
+import rsudp.raspberryshake as rs
+from rsudp.p_producer import Producer
+
+
+def test_term_is_sent_once():
+	q = Queue()
+	prod = Producer(q, [])
+	pkt = b"{'EHZ', 1582315130.292, 14168, 14927, 16112}"
+	batches = [[(pkt, ('10.0.0.2', 8888)), (b'TERM', ('10.0.0.2', 8888)),
+				(pkt, ('10.0.0.2', 8888))]]
+	prod._recv_batch = lambda: batches.pop(0)
+	try:
+		prod.run()
+	except SystemExit:
+		pass
+	items = []
+	while not q.empty():
+		item = q.get()
+		items += item if isinstance(item, list) else [item]
+	# the packet before the TERM is passed on, then a single TERM and nothing after it
+	assert [type(i) for i in items] == [rs.Packet, rs.Term]
+	assert not rs.producer
@@ -0,0 +1,214 @@
+import threading
+import numpy as np
+import pytest
+from obspy import UTCDateTime
+from obspy.core.trace import Trace
+from rsudp.response import ResponseCache, Deconvolver, StreamDeconvolver
+
+PRE_FILT = [0.1, 0.6, 95, 100]
+
+
+def counts(n, sps=100, seed=0):
+	rng = np.random.default_rng(seed)
+	data = (rng.normal(0, 500, n) + 16000).astype(np.int32)
+	tr = Trace(data=data)
+	tr.stats.update({'network': 'BW', 'station': 'RJOB', 'location': '00', 'channel': 'EHZ',
+					 'sampling_rate': sps, 'starttime': UTCDateTime(2020, 1, 1)})
+	return tr
+
+
+@pytest.mark.parametrize('output', ['DISP', 'VEL', 'ACC'])
+def test_cache_matches_remove_response(inventory, output):
+	cache = ResponseCache()
+	tr = counts(3000)
+	ref = tr.copy().remove_response(inventory, output=output, pre_filt=PRE_FILT,
+									water_level=4.5, taper=False)
+	out = cache.remove_response(tr.copy(), output=output, pre_filt=PRE_FILT,
+								water_level=4.5, inventory=inventory)
+	np.testing.assert_allclose(out.data, ref.data, rtol=1e-9, atol=1e-12 * np.abs(ref.data).max())
+
+
+def test_cache_hits_and_eviction(inventory):
+	cache = ResponseCache(maxsize=2)
+	for i in range(3):
+		cache.remove_response(counts(3000, seed=i), output='VEL', pre_filt=PRE_FILT,
+							  water_level=4.5, inventory=inventory)
+	assert (cache.hits, cache.misses) == (2, 1)
+	# a different length needs a different FFT size, and so a different entry
+	cache.remove_response(counts(5000), output='VEL', pre_filt=PRE_FILT, water_level=4.5, inventory=inventory)
+	cache.remove_response(counts(3000), output='ACC', pre_filt=PRE_FILT, water_level=4.5, inventory=inventory)
+	assert cache.misses == 3 and len(cache._cache) == 2
+	# the least recently used entry (VEL at 3000 samples) was dropped
+	cache.remove_response(counts(3000), output='VEL', pre_filt=PRE_FILT, water_level=4.5, inventory=inventory)
+	assert cache.misses == 4
+
+
+def test_cache_is_cleared_when_the_inventory_changes(inventory):
+	cache = ResponseCache()
+	cache.remove_response(counts(3000), output='VEL', pre_filt=PRE_FILT, water_level=4.5, inventory=inventory)
+	other = inventory.copy()
+	cache.remove_response(counts(3000), output='VEL', pre_filt=PRE_FILT, water_level=4.5, inventory=other)
+	assert (cache.hits, cache.misses) == (0, 2)
+
+
+def stream(sd, data, t0, packet=25, gap=None):
+	'''
+	Passes data through a StreamDeconvolver in packets (skipping the ``gap`` slice),
+	and returns its output placed at its sample times.
+	'''
+	out = np.full(len(data), np.nan)
+	chunks = []
+	for i in range(0, len(data), packet):
+		if gap and (gap.start <= i < gap.stop):
+			continue
+		chunks += sd.process(data[i:i+packet], t0 + i / sd.sps)
+	chunks += sd.flush()
+	for t, y in chunks:
+		k = int(round((t - t0) * sd.sps))
+		assert np.isnan(out[k:k+len(y)]).all()		# no sample is output twice
+		out[k:k+len(y)] = y
+	return out, chunks
+
+
+# (not ACC: with a water level, obspy's inverse of a geophone's acceleration response
+# is scaled by the lowest frequency in the FFT, so it depends on the length of the trace)
+@pytest.mark.parametrize('output', ['VEL', 'DISP'])
+@pytest.mark.parametrize('seconds,block', [(40, 10), (10, 0.25)])
+def test_stream_deconvolver_matches_whole_trace(inventory, output, seconds, block):
+	tr = counts(30000)
+	ref = tr.copy().remove_response(inventory, output=output, pre_filt=PRE_FILT,
+									water_level=4.5, taper=False).data
+	sd = StreamDeconvolver('BW.RJOB.00.EHZ', output=output, sps=100, seconds=seconds,
+						   block=block, inventory=inventory)
+	out, chunks = stream(sd, tr.data, float(tr.stats.starttime))
+	assert not np.isnan(out).any()
+	# the output is one continuous series
+	for (t, y), (t2, y2) in zip(chunks, chunks[1:]):
+		assert abs(t + len(y) / 100. - t2) < 1e-6
+	# away from the ends of the whole-trace reference (where its FFT wraps around)
+	m = slice(3000, -3000)
+	assert np.std(out[m] - ref[m]) / np.std(ref[m]) < 0.02
+
+
+def test_stream_deconvolver_output_is_in_time_and_restarts_after_gaps(inventory):
+	sps, t0 = 100, float(UTCDateTime(2020, 1, 1))
+	data = np.full(20000, 16000, dtype=np.int32)
+	data[5000] += 10000		# an impulse
+	sd = StreamDeconvolver('BW.RJOB.00.EHZ', output='VEL', sps=sps, seconds=10,
+						   block=0.25, inventory=inventory)
+	out, chunks = stream(sd, data, t0, gap=slice(10000, 10500))
+	# the response to the impulse peaks at the impulse, not delay samples later
+	assert abs(np.nanargmax(np.abs(out[:10000])) - 5000) < 10
+	# nothing is output for the gap, and everything either side of it is
+	assert np.isnan(out[10000:10500]).all()
+	assert not np.isnan(out[:10000]).any() and not np.isnan(out[10500:]).any()
+	# the DC offset of the counts is removed, and the output starts again with no transient
+	assert np.abs(out[:4000]).max() < 1e-3 * np.abs(out[:10000]).max()
+	assert np.abs(out[10500:]).max() < 1e-3 * np.abs(out[:10000]).max()
+
+
+def test_stream_deconvolver_outputs_every_packet_with_a_short_block(inventory):
+	sd = StreamDeconvolver('BW.RJOB.00.EHZ', output='VEL', sps=100, seconds=10,
+						   block=0.25, inventory=inventory)
+	data = counts(5000).data
+	t0 = float(UTCDateTime(2020, 1, 1))
+	lag = []
+	for i in range(0, len(data), 25):
+		for t, y in sd.process(data[i:i+25], t0 + i / 100.):
+			lag.append((i + 25) / 100. - (t - t0 + len(y) / 100.))
+	# once the impulse response is full, output keeps up with the input, delay samples behind
+	assert max(lag) < (sd.delay + sd.block) / 100.
+
+
+def test_stream_deconvolver_puts_packets_back_in_order(inventory):
+	tr = counts(6000)
+	t0 = float(tr.stats.starttime)
+	def deconvolver():
+		return StreamDeconvolver('BW.RJOB.00.EHZ', output='VEL', sps=100, seconds=10,
+								 block=0.25, inventory=inventory)
+	ref, chunks = stream(deconvolver(), tr.data, t0)
+	sd = deconvolver()
+	order = list(range(0, 6000, 25))
+	# swap some neighbouring packets, hold one back by half a second, and repeat another
+	order[10], order[11] = order[11], order[10]
+	order.insert(102, order.pop(100))
+	order.insert(150, order[149])
+	chunks = []
+	for i in order:
+		chunks += sd.process(tr.data[i:i+25], t0 + i / 100.)
+	chunks += sd.flush()
+	out = np.concatenate([y for t, y in chunks])
+	# the filter never restarted, so the output is the same as in order
+	assert abs(chunks[0][0] - t0) < 1e-6
+	for (t, y), (t2, y2) in zip(chunks, chunks[1:]):
+		assert abs(t + len(y) / 100. - t2) < 1e-6
+	np.testing.assert_allclose(out, ref, rtol=1e-9, atol=1e-12 * np.abs(ref).max())
+
+
+def test_stream_deconvolver_uses_the_response_at_the_data_time(inventory):
+	old = inventory.copy()
+	old[0][0].select(channel='EHZ')[0].end_date = UTCDateTime(2015, 1, 1)
+	sd = StreamDeconvolver('BW.RJOB.00.EHZ', output='VEL', sps=100, inventory=old)
+	# archived data from while the channel was in service can be converted
+	sd.process(counts(100).data, float(UTCDateTime(2012, 1, 1)))
+	# but there is no response for data from after it
+	with pytest.raises(Exception):
+		StreamDeconvolver('BW.RJOB.00.EHZ', output='VEL', sps=100,
+						  inventory=old).process(counts(100).data, float(UTCDateTime(2020, 1, 1)))
+	with pytest.raises(ValueError):
+		StreamDeconvolver('BW.RJOB.00.ENZ', output='VEL', sps=100, inventory=old)
+
+
+def raw(cha, start, n, seed=0):
+	tr = counts(n, seed=seed)
+	tr.stats.channel = cha
+	tr.stats.starttime += start
+	return tr
+
+
+def times_two(tr):
+	tr.data = tr.data * 2.
+
+
+def test_deconvolver_shares_covered_windows():
+	dec = Deconvolver()
+	long = raw('EHZ', 0, 3000)
+	out = dec.get(long, 'VEL', times_two)
+	np.testing.assert_array_equal(out.data, long.data * 2.)
+	# a shorter window at the end of the same data is served from the first result
+	short = raw('EHZ', 0, 3000)
+	short.data = short.data[-500:]
+	short.stats.starttime += 25.
+	out = dec.get(short, 'VEL', times_two)
+	assert (dec.computed, dec.served) == (1, 1)
+	np.testing.assert_array_equal(out.data, short.data * 2.)
+	assert not out.data.flags.writeable
+	# other units are deconvolved separately
+	dec.get(short, 'ACC', times_two)
+	assert dec.computed == 2
+
+
+def test_deconvolver_only_serializes_the_same_channel_and_unit():
+	dec = Deconvolver()
+	started, release = threading.Event(), threading.Event()
+	def slow(tr):
+		started.set()
+		release.wait(5)
+		times_two(tr)
+	t = threading.Thread(target=dec.get, args=(raw('EHZ', 0, 1000), 'VEL', slow), daemon=True)
+	t.start()
+	assert started.wait(5)
+	# another channel doesn't wait for the slow deconvolution
+	done = threading.Event()
+	threading.Thread(target=lambda: (dec.get(raw('EHN', 0, 1000), 'VEL', times_two), done.set()),
+					 daemon=True).start()
+	assert done.wait(2)
+	# the same channel and unit waits, then uses the result
+	same = threading.Thread(target=dec.get, args=(raw('EHZ', 0, 1000), 'VEL', times_two), daemon=True)
+	same.start()
+	same.join(0.2)
+	assert same.is_alive()
+	release.set()
+	t.join(5)
+	same.join(5)
+	assert (dec.computed, dec.served) == (2, 1)
@@ -0,0 +1,117 @@
+import threading
+import time
+from queue import Empty
+import numpy as np
+import pytest
+import rsudp.raspberryshake as rs
+from rsudp.ring import BroadcastRing
+
+
+def packet(cha, i):
+	return rs.Packet(cha, float(i), np.array([i], dtype=np.int32), b'')
+
+
+def test_drop_mode_skips_to_oldest_message():
+	ring = BroadcastRing(size=4, overrun='drop')
+	slow, fast = ring.reader(), ring.reader()
+	for i in range(10):
+		ring.put(i)
+		assert fast.get() == i
+	assert [slow.get() for i in range(4)] == [6, 7, 8, 9]
+	assert slow.dropped == 6 and fast.dropped == 0
+	assert ring.dropped == 6
+	with pytest.raises(Empty):
+		slow.get_nowait()
+
+
+def test_block_mode_waits_for_slowest_reader():
+	ring = BroadcastRing(size=4, overrun='block')
+	r = ring.reader()
+	for i in range(4):
+		ring.put(i)
+	writer = threading.Thread(target=ring.put, args=(4,), daemon=True)
+	writer.start()
+	writer.join(0.2)
+	assert writer.is_alive()		# the ring is full
+	assert r.get() == 0
+	writer.join(1)
+	assert not writer.is_alive()
+	assert [r.get() for i in range(4)] == [1, 2, 3, 4]
+	assert r.dropped == 0
+
+
+def test_remove_unblocks_writer():
+	ring = BroadcastRing(size=4, overrun='block')
+	stuck, live = ring.reader(), ring.reader()
+	got = []
+	def read():
+		while True:
+			d = live.get()
+			got.append(d)
+			if isinstance(d, rs.Term):
+				break
+	reader = threading.Thread(target=read, daemon=True)
+	reader.start()
+	writer = threading.Thread(target=ring.put_many, args=(list(range(20)) + [rs.Term()],), daemon=True)
+	writer.start()
+	writer.join(0.2)
+	assert writer.is_alive()		# held back by the reader that stopped reading
+	ring.remove(stuck)
+	writer.join(1)
+	reader.join(1)
+	assert not writer.is_alive()
+	assert got[:20] == list(range(20))
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_consumer_thread_detaches_on_exit():
+	ring = BroadcastRing(size=4, overrun='block')
+
+	class Crashes(rs.ConsumerThread):
+		def __init__(self, q):
+			super().__init__()
+			self.queue = q
+		def run(self):
+			self.queue.get()
+			raise RuntimeError('crashed')
+
+	t = Crashes(ring.reader())
+	t.start()
+	ring.put(0)
+	t.join(1)
+	assert ring.readers == []
+	for i in range(10):		# would block forever if the reader were still attached
+		ring.put(i)
+
+
+def test_urgent_messages_go_ahead_of_data():
+	ring = BroadcastRing(size=16)
+	r = ring.reader()
+	t = time.time()
+	ring.put_many([packet('EHZ', 0), packet('EHZ', 1)])
+	alarm = rs.Alarm(t)
+	ring.put(alarm)
+	ring.put(packet('EHZ', 2))
+	assert r.get() is alarm
+	assert [r.get().time for i in range(3)] == [0., 1., 2.]
+
+
+def test_urgent_messages_do_not_take_a_place_or_block():
+	ring = BroadcastRing(size=2, overrun='block')
+	r = ring.reader()
+	ring.put_many([0, 1])
+	ring.put(rs.Reset(0.))		# the ring is full, but this doesn't wait
+	assert ring.head == 2
+	assert isinstance(r.get(), rs.Reset)
+	assert r.get() == 0
+
+
+def test_subscriptions():
+	ring = BroadcastRing(size=16)
+	ehz = ring.reader(channels=['EHZ'], messages=(rs.Alarm,))
+	ring.put_many([packet('ENZ', 0), packet('EHZ', 1), rs.Reset(0.), rs.Alarm(0.), rs.Term()])
+	got = [ehz.get() for i in range(3)]
+	assert isinstance(got[0], rs.Alarm)
+	assert got[1].cha == 'EHZ'
+	assert isinstance(got[2], rs.Term)		# always delivered
+	assert ehz.empty()
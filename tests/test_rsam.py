@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from rsudp.c_rsam import SpectralBands
+
+SPS = 100
+BANDS = [[0.5, 2], [2, 5], [5, 10], [10, 20]]
+
+
+def tone(f, amp, seconds=10, phase=0.3):
+	t = np.arange(int(seconds * SPS)) / SPS
+	return amp * np.sin(2 * np.pi * f * t + phase)
+
+
+@pytest.mark.parametrize('f,band', [(1.2, 0), (3.3, 1), (7., 2), (14.6, 3)])
+def test_a_pure_tone_is_only_in_its_band(f, band):
+	ssam = SpectralBands(BANDS, SPS)
+	# on a DC offset, like raw counts
+	amps = ssam.amplitudes(tone(f, 1000.) + 16000)
+	# the RMS of a sine is its amplitude over the square root of two
+	assert amps[band] == pytest.approx(1000. / np.sqrt(2), rel=0.02)
+	for i, a in enumerate(amps):
+		if i != band:
+			assert a < 1e-3 * amps[band]
+
+
+def test_tones_in_different_bands_and_window_lengths():
+	ssam = SpectralBands(BANDS, SPS)
+	assert ssam.names == ['0.5-2', '2-5', '5-10', '10-20']
+	amps = ssam.amplitudes(tone(3.3, 1000.) + tone(14.6, 200., phase=1.))
+	assert amps[1] == pytest.approx(1000. / np.sqrt(2), rel=0.02)
+	assert amps[3] == pytest.approx(200. / np.sqrt(2), rel=0.02)
+	assert amps[0] < 1. and amps[2] < 1.
+	# the bins are worked out again for a window of a different length
+	amps = ssam.amplitudes(tone(7., 500., seconds=6.4))
+	assert ssam.n == 640
+	assert amps[2] == pytest.approx(500. / np.sqrt(2), rel=0.02)
+	assert max(amps[0], amps[1], amps[3]) < 1e-3 * amps[2]
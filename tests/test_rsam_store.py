@@ -0,0 +1,112 @@
+import numpy as np
+from rsudp.rsam_store import RSAMStore, RECORD
+
+
+def fill(store, start, end, step=10.):
+	'''
+	Appends a measurement every ``step`` seconds, with the mean equal to the time in minutes.
+	'''
+	for t in np.arange(start, end, step):
+		store.append(t, [t / 60., t / 60. + 1, t % 7, 100 + t % 7])
+
+
+def test_rollups_summarize_the_tier_below(tmp_path):
+	store = RSAMStore(str(tmp_path), 'R3BCF', 'EHZ')
+	fill(store, 0, 7200)
+	raw = store.records('raw')
+	assert len(raw) == 720
+	m = store.records('1m')
+	# the last minute is still open
+	assert len(m) == 119
+	np.testing.assert_allclose(m['time'], np.arange(0, 7140, 60))
+	assert (m['n'] == 6).all()
+	for i in (0, 57, 118):
+		part = raw[i * 6:(i + 1) * 6]
+		np.testing.assert_allclose(m['mean'][i], part['mean'].mean(), rtol=1e-6)
+		np.testing.assert_allclose(m['median'][i], part['median'].mean(), rtol=1e-6)
+		assert m['min'][i] == part['min'].min()
+		assert m['max'][i] == part['max'].max()
+	tm = store.records('10m')
+	assert len(tm) == 11
+	assert (tm['n'] == 60).all()
+	np.testing.assert_allclose(tm['mean'], raw['mean'][:660].reshape(11, 60).mean(axis=1), rtol=1e-6)
+	h = store.records('1h')
+	assert len(h) == 1
+	assert h['n'][0] == 360
+	np.testing.assert_allclose(h['mean'][0], raw['mean'][:360].mean(), rtol=1e-6)
+	assert h['min'][0] == 0 and h['max'][0] == 106
+	store.close()
+
+
+def test_old_measurements_are_ignored(tmp_path):
+	store = RSAMStore(str(tmp_path), 'R3BCF', 'EHZ')
+	assert store.append(10., [1, 1, 1, 1])
+	assert not store.append(10., [2, 2, 2, 2])
+	assert not store.append(5., [2, 2, 2, 2])
+	assert len(store.records('raw')) == 1
+	store.close()
+
+
+def test_reopening_rebuilds_open_periods(tmp_path):
+	whole = RSAMStore(str(tmp_path / 'whole'), 'R3BCF', 'EHZ')
+	fill(whole, 0, 7800)
+	whole.close()
+
+	store = RSAMStore(str(tmp_path / 'split'), 'R3BCF', 'EHZ')
+	fill(store, 0, 3930)
+	store.close()
+	store = RSAMStore(str(tmp_path / 'split'), 'R3BCF', 'EHZ')
+	# measurements from before the restart are still refused
+	assert not store.append(3900., [0, 0, 0, 0])
+	fill(store, 3930, 7800)
+	store.close()
+	for tier in ('raw', '1m', '10m', '1h'):
+		np.testing.assert_array_equal(store.records(tier), whole.records(tier))
+
+
+def test_partial_records_are_removed(tmp_path):
+	store = RSAMStore(str(tmp_path), 'R3BCF', 'EHZ')
+	fill(store, 0, 600)
+	store.close()
+	# writing was interrupted halfway through a record
+	with open(store.path('raw'), 'ab') as f:
+		f.write(np.array((600., 1, 10., 11., 0., 100.), dtype=RECORD).tobytes()[:13])
+	with open(store.path('1m'), 'ab') as f:
+		f.write(b'\x00' * 5)
+	store = RSAMStore(str(tmp_path), 'R3BCF', 'EHZ')
+	assert len(store.records('raw')) == 60
+	assert len(store.records('1m')) == 9
+	fill(store, 600, 720)
+	store.close()
+	raw = store.records('raw')
+	assert len(raw) == 72
+	np.testing.assert_allclose(raw['time'], np.arange(0, 720, 10))
+	m = store.records('1m')
+	assert len(m) == 11
+	assert (m['n'] == 6).all()
+
+
+def test_query_picks_the_finest_tier_that_fits(tmp_path):
+	store = RSAMStore(str(tmp_path), 'R3BCF', 'EHZ')
+	fill(store, 0, 4 * 3600)
+	assert store.choose_tier(0, 3600, max_points=360) == 'raw'
+	assert store.choose_tier(0, 3600, max_points=100) == '1m'
+	assert store.choose_tier(max_points=30) == '10m'
+	assert store.choose_tier(max_points=5) == '1h'
+	# nothing is coarse enough, so the coarsest tier is used
+	assert store.choose_tier(max_points=1) == '1h'
+	# the start is included and the end is not
+	recs = store.query(600, 1200, max_points=100)
+	assert len(recs) == 60
+	assert (recs['time'][0], recs['time'][-1]) == (600, 1190)
+	recs = store.query(600, 1200, tier='1m')
+	np.testing.assert_allclose(recs['time'], np.arange(600, 1200, 60))
+	# the result is a copy, not a view of the file
+	recs['mean'] = -1
+	assert (store.records('1m')['mean'] >= 0).all()
+	# a read-only store queries without writing
+	store.close()
+	ro = RSAMStore(str(tmp_path), 'R3BCF', 'EHZ', readonly=True)
+	assert ro.files == {}
+	assert len(ro.query(tier='1h')) == 3
+	assert len(ro.query(tier='raw', start=4 * 3600)) == 0
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from obspy.signal.trigger import recursive_sta_lta, trigger_onset
+from rsudp.stalta import StaLta, Coincidence, Trigger
+
+SPS = 100
+
+
+def record(seed=0):
+	rng = np.random.default_rng(seed)
+	x = rng.normal(0, 1, 150 * SPS)
+	x[0] = 0.				# obspy starts from the second sample
+	x[6000:7000] *= 8		# an event
+	x[12000:12400] *= 6		# a smaller one
+	return x
+
+
+def chunks(x, sizes):
+	i, k = 0, 0
+	while i < len(x):
+		n = sizes[k % len(sizes)]
+		yield i, x[i:i+n]
+		i += n
+		k += 1
+
+
+def test_ratio_matches_obspy():
+	x = record()
+	trig = StaLta(sta=2, lta=20, thresh=3, reset=1.5, sps=SPS)
+	trig.update(x, 0.)
+	np.testing.assert_allclose(trig.ratio, recursive_sta_lta(x, 2 * SPS, 20 * SPS), rtol=1e-9)
+
+
+def test_chunked_input_equals_one_shot():
+	x = record()
+	one = StaLta(sta=2, lta=20, thresh=3, reset=1.5, sps=SPS)
+	events = one.update(x, 0.)
+	trig = StaLta(sta=2, lta=20, thresh=3, reset=1.5, sps=SPS)
+	ratios, chunked = [], []
+	for i, c in chunks(x, [25, 1, 7, 300, 25]):
+		chunked += trig.update(c, i / SPS)
+		ratios.append(trig.ratio)
+	np.testing.assert_allclose(np.concatenate(ratios), one.ratio, rtol=1e-9)
+	assert chunked == events
+	assert trig.exceed == one.exceed and trig.max == one.max
+
+
+def test_triggers_match_trigger_onset():
+	x = record()
+	trig = StaLta(sta=2, lta=20, thresh=3, reset=1.5, sps=SPS)
+	events = trig.update(x, 0.)
+	onsets = trigger_onset(recursive_sta_lta(x, 2 * SPS, 20 * SPS), 3, 1.5)
+	assert len(onsets) == 2
+	assert [ev.on for ev in events] == [True, False] * len(onsets)
+	for (on, off), (evon, evoff) in zip(onsets, zip(events[::2], events[1::2])):
+		assert int(round(evon.time * SPS)) == on
+		# obspy gives the last sample above the reset level, this gives the first one below it
+		assert int(round(evoff.time * SPS)) == off + 1
+
+
+def test_ratio_is_zero_while_warming_up():
+	x = record()
+	trig = StaLta(sta=2, lta=20, thresh=3, reset=1.5, sps=SPS)
+	trig.update(x[:1500], 0.)
+	trig.update(x[1500:2500], 15.)
+	assert (trig.ratio[:500] == 0).all() and (trig.ratio[500:] > 0).all()
+
+
+def test_coincidence_counts_weights_within_the_window():
+	vote = Coincidence(thresh=2, window=5, weights={'EHZ': 2})
+	# one light channel is not enough, but two within the window are
+	assert vote.update({'ENZ': [Trigger(True, 10., 4.), Trigger(False, 11., 1.)]}) == []
+	on = vote.update({'ENN': [Trigger(True, 14., 4.)]})
+	assert [(c.on, c.time, c.ratio) for c in on] == [(True, 14., 2.)]
+	# the first channel's vote ends 5 s after it triggered
+	off = vote.update({}, now=16.)
+	assert [(c.on, c.time) for c in off] == [(False, 15.)]
+	# the heavy channel is enough on its own
+	on = vote.update({'EHZ': [Trigger(True, 30., 4.)]})
+	assert [(c.on, c.time) for c in on] == [(True, 30.)]
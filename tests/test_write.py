@@ -0,0 +1,67 @@
+import os
+import glob
+from queue import Queue
+import numpy as np
+import pytest
+from obspy import read
+import rsudp.raspberryshake as rs
+from rsudp.c_write import Write
+
+T0 = 1582315130.
+
+
+def packets(data, skip=()):
+	'''
+	Quarter-second packets of EHZ data, leaving out the ones numbered in ``skip``.
+	'''
+	return [rs.Packet('EHZ', T0 + i / 4., data[i*25:(i+1)*25], b'')
+			for i in range(len(data) // 25) if i not in skip]
+
+
+def test_late_samples_fill_gaps_in_written_data(station, tmp_path):
+	os.makedirs(str(tmp_path / 'data'))
+	w = Write(Queue(), str(tmp_path), cha=['EHZ'])
+	w.writer.start()
+	data = np.cumsum(np.random.default_rng(0).integers(-300, 300, 4000)).astype(np.int32)
+	pkts = packets(data)
+	# packets 8 and 9 are held up until after the data around them has been written
+	for p in pkts[:8] + pkts[10:80]:
+		w._append(p)
+	w.write()
+	assert w.written['EHZ'] == 1500
+	for p in pkts[8:10] + pkts[8:9] + pkts[80:]:
+		w._append(p)
+	w.write(flush=True)
+	w.writer.stop()
+	# the packet that came twice is only written once
+	assert w.late == 50
+	files = glob.glob(str(tmp_path / 'data' / '*'))
+	assert len(files) == 1
+	st = read(files[0])
+	st.merge()
+	assert len(st) == 1
+	assert not np.ma.is_masked(st[0].data)
+	np.testing.assert_array_equal(st[0].data, data)
+
+
+def test_deconvolved_file_covers_the_raw_data(station, tmp_path):
+	os.makedirs(str(tmp_path / 'data'))
+	w = Write(Queue(), str(tmp_path), cha=['EHZ'], deconv='VEL')
+	w.writer.start()
+	data = (np.random.default_rng(1).normal(0, 500, 5000) + 16000).astype(np.int32)
+	for i, p in enumerate(packets(data)):
+		w.queue.put(p)
+		w.getq()
+		if i % 40 == 39:
+			w.write()
+	# the deconvolver still holds the last 20 to 30 seconds when the program is told to stop
+	w.queue.put(rs.Term())
+	with pytest.raises(SystemExit):
+		w.getq()
+	w.writer.stop()
+	raw = read(glob.glob(str(tmp_path / 'data' / '*.EHZ.D.*[0-9]'))[0]).merge()
+	vel = read(glob.glob(str(tmp_path / 'data' / '*.EHZ.D.*.VEL'))[0]).merge()
+	assert len(raw) == len(vel) == 1
+	assert vel[0].stats.starttime == raw[0].stats.starttime
+	assert vel[0].stats.npts == raw[0].stats.npts == 5000
+	assert not np.ma.is_masked(vel[0].data)